@@ -0,0 +1,192 @@
+import os
+import re
+import threading
+from collections import namedtuple, OrderedDict
+from flask import Blueprint, request, jsonify
+from sqlalchemy.orm import object_session
+from auth import login_required, role_required
+from extensions import db, listen, on_commit
+from models import PatientHistory
+import refdata
+
+# Allergy and contraindication screening at prescription time. Drug names and
+# the drug_terms table (brand names, drug classes, contraindicated conditions)
+# are compiled into one Aho-Corasick automaton, rebuilt only when either
+# catalog changes. A patient's allergies and notes are scanned once per
+# automaton and text version; the resulting set of drug ids is cached, so a
+# check is a dict lookup plus one primary-key read of the history row.
+# Negations ("no penicillin allergy") are not understood: this flags
+# prescriptions for a second look, it does not clear them.
+
+allergies_bp = Blueprint('allergies', __name__)
+
+Match = namedtuple('Match', 'drug_id term kind')
+
+def fold(word):
+    # Crude plural folding ("statins", "SSRIs"), applied to terms and text alike
+    return word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+
+def normalize(text):
+    # Lowercase words separated by single spaces, padded so every term match
+    # starts and ends on a word boundary
+    return ' ' + ' '.join(map(fold, re.findall(r'[a-z0-9]+', (text or '').lower()))) + ' '
+
+class Automaton:
+    # Aho-Corasick over a set of strings, compiled to a full transition table
+    # so matching is one dict lookup per character of text
+    def __init__(self, patterns):
+        self.delta = [{}]
+        self.out = [()]
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                if ch not in self.delta[node]:
+                    self.delta.append({})
+                    self.out.append(())
+                    self.delta[node][ch] = len(self.delta) - 1
+                node = self.delta[node][ch]
+            self.out[node] += (index,)
+
+        # Breadth-first: fill in failure transitions and merge outputs
+        fail = [0] * len(self.delta)
+        queue = list(self.delta[0].values())
+        for node in queue:
+            for ch, child in self.delta[node].items():
+                queue.append(child)
+                if node:
+                    fail[child] = self.delta[fail[node]].get(ch, 0)
+                    self.out[child] += self.out[fail[child]]
+            if node:
+                for ch, target in self.delta[fail[node]].items():
+                    self.delta[node].setdefault(ch, target)
+
+    def __len__(self):
+        return len(self.delta)
+
+    def find(self, text):
+        # Indexes of every pattern occurring in text
+        delta, out = self.delta, self.out
+        found = set()
+        node = 0
+        for ch in text:
+            node = delta[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+class Matcher:
+    def __init__(self, version, drugs, terms):
+        # pattern -> [(drug_id, original term, kind)]
+        targets = {}
+        for drug in drugs:
+            targets.setdefault(normalize(drug.name), []).append((drug.drug_id, drug.name, 'name'))
+        for term in terms:
+            targets.setdefault(normalize(term.term), []).append((term.drug_id, term.term, term.kind))
+        targets.pop('  ', None)
+
+        self.version = version
+        self.patterns = list(targets)
+        self.targets = [tuple(Match(*target) for target in targets[pattern]) for pattern in self.patterns]
+        self.automaton = Automaton(self.patterns)
+
+    def scan(self, text):
+        return frozenset(match for index in self.automaton.find(normalize(text)) for match in self.targets[index])
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def matcher():
+    global _matcher
+    version = refdata.etag('drugs', 'drug_terms')
+    if _matcher is None or _matcher.version != version:
+        with _matcher_lock:
+            if _matcher is None or _matcher.version != version:
+                _matcher = Matcher(version, refdata.drugs(), refdata.drug_terms())
+    return _matcher
+
+class PatientCache:
+    # patient_id -> (matcher version, history text, matches), least recently used first
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def matches(self, patient_id, text):
+        current = matcher()
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            if entry is not None and entry[0] == current.version and entry[1] == text:
+                self._entries.move_to_end(patient_id)
+                return entry[2]
+        found = current.scan(text)
+        self.store(patient_id, current.version, text, found)
+        return found
+
+    def store(self, patient_id, version, text, found):
+        with self._lock:
+            self._entries[patient_id] = (version, text, found)
+            self._entries.move_to_end(patient_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+cache = PatientCache()
+
+def history_text(allergies, notes):
+    # Family history is about relatives, so only these two fields are screened
+    return f'{allergies or ""}\n{notes or ""}'
+
+def load_histories(patient_ids):
+    rows = db.session.query(
+        PatientHistory.patient_id, PatientHistory.allergies, PatientHistory.notes
+    ).filter(PatientHistory.patient_id.in_(patient_ids))
+    return {patient_id: history_text(allergies, notes) for patient_id, allergies, notes in rows}
+
+def screen(patient_id, drug_id):
+    # Matches in the patient's history that concern this drug
+    return screen_many([(patient_id, drug_id)])[0]
+
+def screen_many(lines):
+    # [(patient_id, drug_id)] -> [[Match]], loading every history in one query
+    texts = load_histories({patient_id for patient_id, _ in lines})
+    results = []
+    for patient_id, drug_id in lines:
+        found = cache.matches(patient_id, texts[patient_id]) if patient_id in texts else ()
+        results.append(sorted((match for match in found if match.drug_id == drug_id), key=lambda m: m.term))
+    return results
+
+def describe(matches):
+    return ', '.join(f'{m.term} ({m.kind})' for m in matches)
+
+@allergies_bp.route('/api/patients/<int:patient_id>/allergy-check')
+@login_required
+@role_required('Doctor')
+def allergy_check(patient_id):
+    drug_id = request.args.get('drug_id', type=int)
+    if drug_id is None or refdata.drugs().get(drug_id) is None:
+        return jsonify(error='Unknown drug'), 400
+    return jsonify(conflicts=[match._asdict() for match in screen(patient_id, drug_id)])
+
+# Refresh cached allergy sets when a history is written. Entries are keyed
+# on the text they were scanned from, so writes this hook misses (bulk
+# statements, other workers) are picked up by the next check anyway.
+def _mark_target(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('allergy_histories', {})[target.patient_id] = history_text(target.allergies, target.notes)
+
+def _committed(session, histories):
+    # No SQL can run here, so use the automaton already built, if any
+    current = _matcher
+    if current is not None:
+        for patient_id, text in histories.items():
+            cache.store(patient_id, current.version, text, current.scan(text))
+
+def init_app(app):
+    global cache
+    app.config.setdefault('ALLERGY_CACHE_SIZE', int(os.getenv('ALLERGY_CACHE_SIZE', 10000)))
+    cache = PatientCache(max_size=app.config['ALLERGY_CACHE_SIZE'])
+    app.register_blueprint(allergies_bp)
+
+    for name in ('after_insert', 'after_update'):
+        listen(PatientHistory, name, _mark_target)
+    on_commit('allergy_histories', _committed)
@@ -0,0 +1,139 @@
+import os
+import time
+import click
+from datetime import date, timedelta
+from flask import Blueprint, current_app
+from sqlalchemy import select, func, text, union_all, or_
+from extensions import db, SCHEMA
+from models import Order, ArchivedOrder
+
+# Order history archival. Completed and Cancelled orders older than
+# ARCHIVE_AFTER_DAYS move from orders to orders_archive in batches of
+# ARCHIVE_BATCH_ROWS, one short transaction each, so the hot table keeps
+# little more than the open queue. On MySQL the archive is RANGE-partitioned
+# by year of request_date. Scheduled orders never move, however old.
+# order_stats is unaffected: the counts cover both tables.
+#
+#   flask archive orders [--older-than 365] [--batch-rows 1000] [--max-batches N]
+#   flask archive status
+
+archive_bp = Blueprint('archive', __name__, cli_group='archive')
+
+ORDERS = Order.__table__
+ARCHIVE = ArchivedOrder.__table__
+ARCHIVED_STATUSES = ('Completed', 'Cancelled')
+
+def order_history(where=None, name='orders'):
+    # orders and orders_archive as one subquery with the orders columns;
+    # where(table) gives the conditions for each side, so both use their indexes
+    sides = []
+    for source in (ORDERS, ARCHIVE):
+        statement = select(*(source.c[c.key] for c in ORDERS.c))
+        if where is not None:
+            statement = statement.where(*where(source))
+        sides.append(statement)
+    return union_all(*sides).subquery(name)
+
+def order_exists(where):
+    # EXISTS over both tables, one probe each, for correlated checks that
+    # order_history() can't express portably (a derived table can't refer to
+    # the outer query)
+    return or_(*(select(source.c.order_id).where(*where(source)).exists() for source in (ORDERS, ARCHIVE)))
+
+def cutoff_date(days=None):
+    days = current_app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    return date.today() - timedelta(days=days)
+
+# MySQL partitions
+def partition_years(conn):
+    rows = conn.execute(text(
+        'SELECT partition_name FROM information_schema.partitions '
+        "WHERE table_schema = :schema AND table_name = 'orders_archive' AND partition_name IS NOT NULL"
+    ), {'schema': SCHEMA})
+    return sorted(int(name[1:]) for (name,) in rows if name != 'pmax')
+
+def partition_clauses(years):
+    return [f'PARTITION p{year} VALUES LESS THAN ({year + 1})' for year in years]
+
+def partition_table(conn):
+    # Years from the oldest order to this one; the first partition also takes anything older
+    oldest = conn.execute(select(func.min(ORDERS.c.request_date))).scalar()
+    first = oldest.year if oldest else date.today().year
+    clauses = partition_clauses(range(first, date.today().year + 1)) + ['PARTITION pmax VALUES LESS THAN MAXVALUE']
+    conn.execute(text(f'ALTER TABLE {SCHEMA}.orders_archive PARTITION BY RANGE (YEAR(request_date)) '
+                      f'({", ".join(clauses)})'))
+
+def add_partitions(conn, through_year):
+    # Split the (empty) catch-all partition so every archived year has its own
+    years = partition_years(conn)
+    missing = range(years[-1] + 1, through_year + 1) if years else ()
+    if missing:
+        clauses = partition_clauses(missing) + ['PARTITION pmax VALUES LESS THAN MAXVALUE']
+        conn.execute(text(f'ALTER TABLE {SCHEMA}.orders_archive REORGANIZE PARTITION pmax '
+                          f'INTO ({", ".join(clauses)})'))
+
+# Moves
+def archive_batch(conn, cutoff, batch_rows):
+    # The newest order never moves: SQLite hands out max(order_id) + 1 as the
+    # next id, which would then repeat an archived one
+    ids = conn.execute(select(ORDERS.c.order_id).where(
+        ORDERS.c.status.in_(ARCHIVED_STATUSES),
+        ORDERS.c.request_date < cutoff,
+        ORDERS.c.order_id < select(func.max(ORDERS.c.order_id)).scalar_subquery(),
+    ).limit(batch_rows).with_for_update(skip_locked=True)).scalars().all()
+    if ids:
+        conn.execute(ARCHIVE.insert().from_select(
+            [c.key for c in ORDERS.c], select(*ORDERS.c).where(ORDERS.c.order_id.in_(ids))
+        ))
+        conn.execute(ORDERS.delete().where(ORDERS.c.order_id.in_(ids)))
+    return len(ids)
+
+def archive_orders(engine, cutoff, batch_rows=1000, max_batches=None):
+    # Returns the number of orders moved
+    if engine.dialect.name == 'mysql':
+        with engine.begin() as conn:
+            add_partitions(conn, cutoff.year)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        with engine.begin() as conn:
+            count = archive_batch(conn, cutoff, batch_rows)
+        moved += count
+        batches += 1
+        if count < batch_rows:
+            break
+    if moved:
+        # Raw statements skip the model events that expire cached counts
+        import counters
+        counters.invalidate(counters.MODEL_TAGS[Order])
+    return moved
+
+# CLI
+@archive_bp.cli.command('orders')
+@click.option('--older-than', type=int, help='Days; defaults to ARCHIVE_AFTER_DAYS.')
+@click.option('--batch-rows', type=int, help='Orders per transaction; defaults to ARCHIVE_BATCH_ROWS.')
+@click.option('--max-batches', type=int, help='Stop after this many batches.')
+def archive_command(older_than, batch_rows, max_batches):
+    """Move old Completed and Cancelled orders to orders_archive."""
+    cutoff = cutoff_date(older_than)
+    start = time.perf_counter()
+    moved = archive_orders(db.engine, cutoff, batch_rows or current_app.config['ARCHIVE_BATCH_ROWS'], max_batches)
+    seconds = time.perf_counter() - start
+    click.echo(f'Archived {moved} orders requested before {cutoff} in {seconds:.1f}s'
+               + (f' ({moved / seconds:.0f} rows/s)' if moved and seconds else ''))
+
+@archive_bp.cli.command('status')
+def status_command():
+    """Show how orders are split between the hot table and the archive."""
+    with db.engine.connect() as conn:
+        for name, source in (('orders', ORDERS), ('orders_archive', ARCHIVE)):
+            count, oldest, newest = conn.execute(select(
+                func.count(), func.min(source.c.request_date), func.max(source.c.request_date)
+            )).one()
+            click.echo(f'{name:<15} {count:>10} rows  {oldest or "-"} .. {newest or "-"}')
+        if conn.dialect.name == 'mysql':
+            click.echo('partitions      ' + ', '.join(map(str, partition_years(conn))) + ', max')
+
+def init_app(app):
+    app.config.setdefault('ARCHIVE_AFTER_DAYS', int(os.getenv('ARCHIVE_AFTER_DAYS', 365)))
+    app.config.setdefault('ARCHIVE_BATCH_ROWS', int(os.getenv('ARCHIVE_BATCH_ROWS', 1000)))
+    app.register_blueprint(archive_bp)
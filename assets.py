@@ -0,0 +1,234 @@
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import urllib.request
+import click
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+from markupsafe import Markup
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Static assets. `flask assets vendor` downloads the third-party CSS/JS into
+# static/vendor; `flask assets build` copies everything under static/ to
+# static/dist with a content hash in each file name, rewrites url()
+# references inside CSS to the hashed names, and writes .gz (and .br when
+# the brotli package is installed) next to every compressible file.
+# Templates link assets through static_url(), which resolves the hashed
+# name from static/dist/manifest.json, falls back to the plain static file,
+# and for vendor files that were never downloaded, to the CDN; for those
+# static_integrity() adds the pinned SRI hash and crossorigin attribute.
+# Hashed files are served precompressed with a one-year immutable
+# Cache-Control. Large HTML responses are gzipped on the fly.
+#
+#   flask assets vendor
+#   flask assets build [--clean]
+
+assets_bp = Blueprint('assets', __name__, cli_group='assets')
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.map', '.txt', '.html'}
+ONE_YEAR = 365 * 24 * 3600
+
+BOOTSTRAP = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist'
+BOOTSTRAP_ICONS = 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font'
+# static path -> (CDN URL, sha384 when the project pins one)
+VENDOR = {
+    'vendor/bootstrap/css/bootstrap.min.css': (f'{BOOTSTRAP}/css/bootstrap.min.css', None),
+    'vendor/bootstrap/js/bootstrap.bundle.min.js': (
+        f'{BOOTSTRAP}/js/bootstrap.bundle.min.js',
+        'FKyoEForCGlyvwx9Hj09JcYn3nv7wiPVlz7YYwJrWVcXK/BmnVDxM+D2scQbITxI'),
+    'vendor/bootstrap-icons/font/bootstrap-icons.min.css': (f'{BOOTSTRAP_ICONS}/bootstrap-icons.min.css', None),
+    'vendor/bootstrap-icons/font/fonts/bootstrap-icons.woff2': (f'{BOOTSTRAP_ICONS}/fonts/bootstrap-icons.woff2', None),
+    'vendor/bootstrap-icons/font/fonts/bootstrap-icons.woff': (f'{BOOTSTRAP_ICONS}/fonts/bootstrap-icons.woff', None),
+}
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+SOURCE_MAP = re.compile(rb'\n?/[*/]# sourceMappingURL=[^\n]*')
+
+# Vendoring
+def download(url, integrity=None):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        data = response.read()
+    if integrity and base64.b64encode(hashlib.sha384(data).digest()).decode() != integrity:
+        raise click.ClickException(f'{url} does not match its pinned sha384')
+    # The .map files are not vendored, so drop the references to them
+    return SOURCE_MAP.sub(b'', data)
+
+def vendor(static_folder):
+    for path, (url, integrity) in VENDOR.items():
+        target = os.path.join(static_folder, *path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(download(url, integrity))
+        yield path
+
+# Build
+def hashed_name(path, data):
+    stem, ext = posixpath.splitext(path)
+    return f'{stem}.{hashlib.sha1(data).hexdigest()[:12]}{ext}'
+
+def source_files(static_folder):
+    # Logical paths under static/, CSS last so the files it references are hashed first
+    paths = []
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder and DIST in dirs:
+            dirs.remove(DIST)
+        for name in files:
+            if name.startswith('.'):
+                continue
+            paths.append(posixpath.join(*os.path.relpath(os.path.join(root, name), static_folder).split(os.sep)))
+    return sorted(paths, key=lambda path: (path.endswith('.css'), path))
+
+def rewrite_css(path, data, manifest):
+    # url(fonts/x.woff2?v=1) -> url(fonts/x.<hash>.woff2); the hash replaces
+    # cache-busting query strings, #fragments are kept
+    def replace(match):
+        quote, target = match.groups()
+        if target.startswith(('data:', 'http:', 'https:', '//', '#', '/')):
+            return match.group(0)
+        clean, _, fragment = target.partition('#')
+        clean = clean.partition('?')[0]
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(path), clean))
+        if resolved not in manifest:
+            return match.group(0)
+        new = posixpath.relpath(manifest[resolved], posixpath.dirname(path))
+        return f'url({quote}{new}{"#" + fragment if fragment else ""}{quote})'
+    return CSS_URL.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+def write_variants(target, data):
+    if posixpath.splitext(target)[1] not in COMPRESSIBLE:
+        return
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(target + suffix, 'wb') as f:
+                f.write(compressed)
+
+def build(static_folder, clean=False):
+    # Returns the manifest; earlier hashed files stay unless clean, so pages
+    # rendered by workers still on the old manifest keep working during a deploy
+    dist = os.path.join(static_folder, DIST)
+    if clean:
+        shutil.rmtree(dist, ignore_errors=True)
+    manifest = {}
+    for path in source_files(static_folder):
+        with open(os.path.join(static_folder, *path.split('/')), 'rb') as f:
+            data = f.read()
+        if path.endswith('.css'):
+            data = rewrite_css(path, data, manifest)
+        manifest[path] = hashed_name(path, data)
+        target = os.path.join(dist, *manifest[path].split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        write_variants(target, data)
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+# Lookup
+_manifest = {}
+_hashed = set()
+_cdn = {}
+
+def load_manifest(static_folder):
+    # Also settles, once, which vendor files have to come from the CDN
+    global _manifest, _hashed, _cdn
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            _manifest = json.load(f)
+    except FileNotFoundError:
+        _manifest = {}
+    _hashed = {f'{DIST}/{name}' for name in _manifest.values()}
+    _cdn = {path: pinned for path, pinned in VENDOR.items()
+            if path not in _manifest and not os.path.exists(os.path.join(static_folder, *path.split('/')))}
+
+def static_url(filename):
+    if filename in _manifest:
+        return url_for('static', filename=f'{DIST}/{_manifest[filename]}')
+    if filename in _cdn:
+        return _cdn[filename][0]
+    return url_for('static', filename=filename)
+
+def static_integrity(filename):
+    # integrity/crossorigin attributes when static_url() points at the CDN
+    integrity = _cdn[filename][1] if filename in _cdn else None
+    if not integrity:
+        return ''
+    return Markup(f'integrity="sha384-{integrity}" crossorigin="anonymous"')
+
+# Serving
+def send_static(filename):
+    if filename not in _hashed:
+        return current_app.send_static_file(filename)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and os.path.exists(safe_join(current_app.static_folder, filename + suffix)):
+            response = send_from_directory(current_app.static_folder, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(current_app.static_folder, filename, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f'public, max-age={ONE_YEAR}, immutable'
+    return response
+
+def compress_html(response):
+    # Dashboards run to tens of KB of markup; the weak ETag keeps conditional
+    # GETs working across encodings
+    if (response.mimetype != 'text/html' or response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers
+            or not request.accept_encodings['gzip']):
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config['GZIP_MIN_BYTES']:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=current_app.config['GZIP_LEVEL']))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# CLI
+@assets_bp.cli.command('vendor')
+def vendor_command():
+    """Download the pinned third-party CSS, JS and fonts into static/vendor."""
+    for path in vendor(current_app.static_folder):
+        click.echo(f'Fetched {path}')
+    load_manifest(current_app.static_folder)
+
+@assets_bp.cli.command('build')
+@click.option('--clean', is_flag=True, help='Remove earlier builds first.')
+def build_command(clean):
+    """Write hashed and precompressed copies of static/ to static/dist."""
+    manifest = build(current_app.static_folder, clean)
+    load_manifest(current_app.static_folder)
+    missing = [path for path in VENDOR if path not in manifest]
+    click.echo(f'Built {len(manifest)} assets' + (' with brotli' if brotli is not None else ' (gzip only; install brotli for .br)'))
+    if missing:
+        click.echo(f'{len(missing)} vendor files not downloaded, served from the CDN: run `flask assets vendor`')
+
+def init_app(app):
+    app.config.setdefault('GZIP_MIN_BYTES', int(os.getenv('GZIP_MIN_BYTES', 1024)))
+    app.config.setdefault('GZIP_LEVEL', int(os.getenv('GZIP_LEVEL', 6)))
+    load_manifest(app.static_folder)
+    app.view_functions['static'] = send_static
+    app.jinja_env.globals['static_url'] = static_url
+    app.jinja_env.globals['static_integrity'] = static_integrity
+    app.after_request(compress_html)
+    app.register_blueprint(assets_bp)
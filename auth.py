@@ -0,0 +1,98 @@
+from collections import namedtuple
+from flask import request, redirect, url_for, flash, session, g, abort, current_app
+from functools import wraps
+from werkzeug.local import LocalProxy
+from extensions import db
+from models import User, Doctor, Patient, Pharmacist
+
+# Identity
+# The user, role and linked doctor/patient/pharmacist are resolved with one
+# joined query at login and kept in the session, so routes never look them up.
+Actor = namedtuple('Actor', 'user_id username role person_id name')
+
+def identity_query():
+    return db.session.query(
+        User, Doctor.name, Patient.name, Pharmacist.name
+    ).outerjoin(
+        Doctor, User.doctor_id == Doctor.doctor_id
+    ).outerjoin(
+        Patient, User.patient_id == Patient.patient_id
+    ).outerjoin(
+        Pharmacist, User.pharmacist_id == Pharmacist.pharmacist_id
+    )
+
+def resolve_identity(row):
+    user, doctor_name, patient_name, pharmacist_name = row
+    person_id = {'Doctor': user.doctor_id, 'Patient': user.patient_id,
+                 'Pharmacist': user.pharmacist_id}.get(user.role)
+    name = {'Doctor': doctor_name, 'Patient': patient_name,
+            'Pharmacist': pharmacist_name}.get(user.role)
+    return Actor(user.user_id, user.username, user.role, person_id, name or user.username)
+
+def find_user(username):
+    # Returns (user, actor) or (None, None)
+    row = identity_query().filter(User.username == username).first()
+    if row is None:
+        return None, None
+    return row[0], resolve_identity(row)
+
+def remember_actor(actor):
+    session['user_id'] = actor.user_id
+    session['username'] = actor.username
+    session['role'] = actor.role
+    session['person_id'] = actor.person_id
+    session['person_name'] = actor.name
+
+def load_actor():
+    if 'actor' in g:
+        return g.actor
+    actor = None
+    if 'user_id' in session:
+        if 'person_name' not in session:
+            # Session from before identities were stored: resolve it once
+            row = identity_query().filter(User.user_id == session['user_id']).first()
+            if row is not None:
+                remember_actor(resolve_identity(row))
+        if 'person_name' in session:
+            actor = Actor(session['user_id'], session['username'], session['role'],
+                          session['person_id'], session['person_name'])
+    g.actor = actor
+    return actor
+
+current_actor = LocalProxy(load_actor)
+
+# Decorators
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_actor:
+            flash('Please log in to access this page.', 'warning')
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def role_required(role):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if 'user_id' not in session:
+                flash('Please log in to access this page.', 'warning')
+                return redirect(url_for('login'))
+            if session.get('role') != role:
+                flash('You do not have permission to access this page.', 'danger')
+                return redirect(request.referrer or url_for('home'))
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def admin_required(f):
+    # Operators listed in ADMIN_USERNAMES, whatever their role
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Please log in to access this page.', 'warning')
+            return redirect(url_for('login'))
+        if session.get('username') not in current_app.config.get('ADMIN_USERNAMES', ()):
+            abort(403)
+        return f(*args, **kwargs)
+    return decorated_function
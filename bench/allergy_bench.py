@@ -0,0 +1,98 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from allergies import Matcher, normalize
+from refdata import DrugRecord, DrugTermRecord
+from reset import load_plan
+
+# Allergy screening throughput over synthetic patient histories: the compiled
+# Aho-Corasick matcher against checking every term per history (substring
+# test and one big word-boundary regex). The vocabulary is the seed catalog
+# plus --extra-terms generated terms, to show how each approach scales with
+# catalog size. No database is needed.
+#
+#   python -m bench.allergy_bench --histories 1000000 --extra-terms 5000
+
+ALLERGENS = ['peanuts', 'shellfish', 'gluten', 'dairy', 'eggs', 'soy', 'latex', 'sesame', 'tree nuts',
+             'penicillin', 'sulfa drugs', 'bee stings', 'pollen', 'N/A', 'none known']
+NOTE_WORDS = ['requires', 'follow', 'up', 'diet', 'preferred', 'carries', 'inhaler', 'history', 'of',
+              'mild', 'reaction', 'to', 'noted', 'avoid', 'daily', 'walks', 'reports', 'dizziness', 'N/A']
+
+def seed_catalog():
+    tables = {name: (columns, rows) for name, columns, rows in load_plan().inserts}
+    _, drug_rows = tables['drug']
+    _, term_rows = tables['drug_terms']
+    drugs = [DrugRecord(**{c: row[c] for c in DrugRecord._fields}) for row in drug_rows]
+    terms = [DrugTermRecord(**{c: row[c] for c in DrugTermRecord._fields}) for row in term_rows]
+    return drugs, terms
+
+def synthetic_terms(rng, count, drug_ids):
+    syllables = ['ab', 'cor', 'dex', 'el', 'fen', 'gra', 'hy', 'lo', 'mir', 'nol', 'pra', 'qui', 'ta', 'vex', 'zo']
+    return [
+        DrugTermRecord(10000 + i, rng.choice(drug_ids), ''.join(rng.choice(syllables) for _ in range(4)), 'synonym')
+        for i in range(count)
+    ]
+
+def histories(rng, count, vocabulary):
+    # Mostly everyday allergens; about 1 in 20 mentions a catalog term
+    for _ in range(count):
+        allergies = ', '.join(rng.sample(ALLERGENS, rng.randint(1, 3)))
+        notes = ' '.join(rng.choice(NOTE_WORDS) for _ in range(rng.randint(3, 12)))
+        if rng.random() < 0.05:
+            notes += f' allergic to {rng.choice(vocabulary)}'
+        yield f'{allergies}\n{notes}'
+
+def substring_scan(patterns):
+    def scan(text):
+        text = normalize(text)
+        return [pattern for pattern in patterns if pattern in text]
+    return scan
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    hits = sum(1 for text in texts if fn(text))
+    return time.perf_counter() - start, hits
+
+def main():
+    parser = argparse.ArgumentParser(description='Allergy screening benchmark')
+    parser.add_argument('--histories', type=int, default=1000000)
+    parser.add_argument('--extra-terms', type=int, default=0)
+    parser.add_argument('--baseline-sample', type=int, default=50000,
+                        help='Histories scanned with the per-term baselines, which are much slower.')
+    parser.add_argument('--seed', type=int, default=2100)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    drugs, terms = seed_catalog()
+    terms += synthetic_terms(rng, args.extra_terms, [drug.drug_id for drug in drugs])
+    vocabulary = [drug.name for drug in drugs] + [term.term for term in terms]
+
+    start = time.perf_counter()
+    matcher = Matcher('bench', drugs, terms)
+    build = time.perf_counter() - start
+    print(f'{len(matcher.patterns)} patterns, {len(matcher.automaton)} automaton states, built in {build * 1000:.1f} ms')
+
+    texts = list(histories(rng, args.histories, vocabulary))
+    sample = texts[:args.baseline_sample]
+    patterns = [pattern.strip() for pattern in matcher.patterns]
+    alternation = re.compile(r'\b(?:' + '|'.join(map(re.escape, sorted(patterns, key=len, reverse=True))) + r')\b')
+
+    rows = [
+        ('aho-corasick', texts, matcher.scan),
+        ('per-term substring', sample, substring_scan(matcher.patterns)),
+        ('regex alternation', sample, lambda text: alternation.findall(normalize(text))),
+    ]
+    print(f'{"method":<20}{"histories":>11}{"seconds":>10}{"us/history":>12}{"histories/s":>14}{"flagged":>9}')
+    for name, inputs, fn in rows:
+        seconds, hits = timed(fn, inputs)
+        print(f'{name:<20}{len(inputs):>11}{seconds:>10.2f}{seconds / len(inputs) * 1e6:>12.2f}'
+              f'{len(inputs) / seconds:>14.0f}{hits:>9}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.run import setup_app, populate, percentile
+
+# Hot-path order queries as order history grows, with every order in the
+# orders table and again after archiving. For each --history size the
+# database gets that many old Completed/Cancelled orders, the queries are
+# timed, the history is archived and they are timed again; the archive is
+# then moved back before the next size.
+#
+#   python -m bench.archive_bench --history 10000 100000 500000
+
+CHUNK = 5000
+
+def add_history(conn, count, start_id, counts, rng):
+    from models import Order
+    statuses = ['Completed'] * 9 + ['Cancelled']
+    oldest = date.today() - timedelta(days=5 * 365)
+    for offset in range(0, count, CHUNK):
+        conn.execute(Order.__table__.insert(), [{
+            'order_id': start_id + i,
+            'request_date': oldest + timedelta(days=rng.randint(0, 4 * 365)),
+            'pharmacy_id': rng.randint(1, counts['pharmacies']),
+            'patient_id': rng.randint(1, counts['patients']),
+            'prescript_id': rng.randint(1, counts['prescriptions']),
+            'pharmacist_id': rng.randint(1, counts['pharmacists']),
+            'status': rng.choice(statuses),
+        } for i in range(offset, min(offset + CHUNK, count))])
+
+def unarchive(conn):
+    from archive import ORDERS, ARCHIVE
+    conn.execute(ORDERS.insert().from_select([c.key for c in ORDERS.c], ARCHIVE.select()))
+    conn.execute(ARCHIVE.delete())
+
+def timings(app, iterations):
+    from extensions import db
+    from models import Order
+    import queries
+    today = date.today()
+    cases = {
+        'queue': lambda: queries.queue_page_query(pharmacist_id=1, include_unassigned=True).limit(50).all(),
+        'dashboard_version': lambda: queries.pharmacist_dashboard_version(1, today),
+        'completed_today': lambda: db.session.query(db.func.count(Order.order_id)).filter(
+            Order.status == 'Completed', Order.request_date == today).scalar(),
+        'recent_orders': lambda: queries.recent_orders_query(1).all(),
+    }
+    results = {}
+    with app.app_context():
+        for name, run in cases.items():
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                run()
+                samples.append((time.perf_counter() - start) * 1000)
+                db.session.expunge_all()
+            results[name] = percentile(samples, 50)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Order archival benchmark')
+    parser.add_argument('--history', type=int, nargs='+', default=[10000, 100000, 300000])
+    parser.add_argument('--scale', type=float, default=0.2, help='Size of the base dataset (bench.datagen).')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--batch-rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=2300)
+    args = parser.parse_args()
+
+    database_uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='pharmacy-archive-'), 'bench.db')
+    app = setup_app(database_uri)
+    from bench.datagen import DEFAULT_COUNTS
+    from extensions import db
+    from models import Order
+    import archive
+    counts = {key: max(1, int(value * args.scale)) for key, value in DEFAULT_COUNTS.items()}
+    populate(app, counts, seed=args.seed, reset=False)
+
+    rng = random.Random(args.seed)
+    # datagen's orders span the last year; archive only the added history
+    cutoff = date.today() - timedelta(days=366)
+    names = ['queue', 'dashboard_version', 'completed_today', 'recent_orders']
+    print(f'{"history":>9} {"layout":<9}{"hot rows":>10}' + ''.join(f'{name:>19}' for name in names)
+          + '   (p50 ms)')
+    added = 0
+    for size in sorted(args.history):
+        with app.app_context():
+            with db.engine.begin() as conn:
+                start_id = conn.execute(db.select(db.func.max(Order.order_id))).scalar() + 1
+                add_history(conn, size - added, start_id, counts, rng)
+            added = size
+        for layout in ('hot', 'archived'):
+            with app.app_context():
+                if layout == 'archived':
+                    start = time.perf_counter()
+                    moved = archive.archive_orders(db.engine, cutoff, args.batch_rows)
+                    seconds = time.perf_counter() - start
+                hot_rows = db.session.query(Order).count()
+            result = timings(app, args.iterations)
+            print(f'{size:>9} {layout:<9}{hot_rows:>10}' + ''.join(f'{result[name]:>19.2f}' for name in names))
+        print(f'{"":>9} archived {moved} rows in {seconds:.1f}s ({moved / seconds:.0f} rows/s)')
+        with app.app_context(), db.engine.begin() as conn:
+            unarchive(conn)
+
+if __name__ == '__main__':
+    main()
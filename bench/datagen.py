@@ -0,0 +1,126 @@
+import random
+from datetime import date, timedelta
+from extensions import db
+import order_stats
+from models import (Doctor, Pharmacist, Patient, User, PatientHistory,
+                    Prescription, Drug, Pharmacy, Order)
+
+# Seeded synthetic data generator for benchmarks.
+# Every bench user logs in with the password "bench":
+# patient_<n>, doctor_<n> and pharmacist_<n>.
+
+DEFAULT_COUNTS = {
+    'doctors': 50,
+    'pharmacists': 20,
+    'pharmacies': 10,
+    'drugs': 200,
+    'patients': 2000,
+    'prescriptions': 5000,
+    'orders': 10000,
+}
+
+# Realistic mix: most orders are done, a working backlog is still Scheduled
+STATUS_MIX = (('Completed', 0.70), ('Scheduled', 0.22), ('Cancelled', 0.08))
+HISTORY_RATE = 0.8
+BATCH_SIZE = 5000
+PASSWORD = 'bench'
+
+FIRST = ['Nolan', 'Jeremy', 'Payton', 'Samantha', 'Marcus', 'Emily', 'James', 'Sofia',
+         'David', 'Isabella', 'Ryan', 'Aisha', 'Tyler', 'Mia', 'Nathan', 'Hiro', 'Elena',
+         'Gabriela', 'Nikolai', 'Priya', 'Arjun', 'Clara', 'Michael', 'Sophia', 'Daniel']
+LAST = ['Le', 'Matloub', 'Lin', 'Wang', 'Chen', 'Rodriguez', 'Patterson', 'Gonzalez', 'Kim',
+        'Martinez', 'OSullivan', 'Patel', 'Brooks', 'Thompson', 'Lee', 'Tanaka', 'Petrova',
+        'Santos', 'Ivanov', 'Raman', 'Johansson', 'OBrien', 'Basa', 'Barbati', 'Esposito']
+DRUG_STEMS = ['Lisino', 'Metfor', 'Atorva', 'Sertra', 'Omepra', 'Levothy', 'Hydroxy', 'Amlodi',
+              'Albute', 'Gabapen', 'Losar', 'Escitalo', 'Montelu', 'Pantopra', 'Fluoxe']
+DRUG_SUFFIXES = ['pril', 'min', 'statin', 'line', 'zole', 'xine', 'zine', 'pine', 'rol', 'tin']
+AILMENTS = ['High blood pressure', 'Type 2 diabetes', 'High cholesterol', 'Depression',
+            'Acid reflux', 'Hypothyroidism', 'Allergic reactions', 'Asthma', 'Nerve pain', 'GERD']
+ALLERGIES = ['N/A', 'Peanuts', 'Shellfish', 'Penicillin', 'Latex', 'Dairy', 'Gluten', 'Eggs', 'Soy']
+
+def person_name(rng):
+    return f'{rng.choice(FIRST)} {rng.choice(LAST)}'
+
+def birthday(rng, start_year, end_year):
+    start = date(start_year, 1, 1)
+    return start + timedelta(days=rng.randrange((date(end_year, 1, 1) - start).days))
+
+def insert(model, rows):
+    table = model.__table__
+    for i in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[i:i + BATCH_SIZE])
+
+def generate(seed=1500, **counts):
+    counts = {**DEFAULT_COUNTS, **counts}
+    rng = random.Random(seed)
+    today = date.today()
+
+    insert(Doctor, [
+        {'doctor_id': i, 'name': person_name(rng), 'dob': birthday(rng, 1960, 1995)}
+        for i in range(1, counts['doctors'] + 1)
+    ])
+    insert(Pharmacist, [
+        {'pharmacist_id': i, 'name': person_name(rng), 'dob': birthday(rng, 1960, 1998)}
+        for i in range(1, counts['pharmacists'] + 1)
+    ])
+    insert(Pharmacy, [
+        {'pharmacy_id': i, 'name': f'{rng.choice(LAST)} Pharmacy #{i}', 'address': f'{i} Main Street'}
+        for i in range(1, counts['pharmacies'] + 1)
+    ])
+    insert(Drug, [
+        {'drug_id': i, 'name': f'{rng.choice(DRUG_STEMS)}{rng.choice(DRUG_SUFFIXES)}-{i}',
+         'common_ailment': rng.choice(AILMENTS)}
+        for i in range(1, counts['drugs'] + 1)
+    ])
+    insert(Patient, [
+        {'patient_id': i, 'name': person_name(rng), 'dob': birthday(rng, 1940, 2010),
+         'doctor_id': rng.randint(1, counts['doctors']), 'primary_address': f'{i} Holly Circle'}
+        for i in range(1, counts['patients'] + 1)
+    ])
+    insert(PatientHistory, [
+        {'patient_id': i, 'allergies': rng.choice(ALLERGIES), 'family_history': 'N/A', 'notes': 'N/A'}
+        for i in range(1, counts['patients'] + 1) if rng.random() < HISTORY_RATE
+    ])
+
+    users = []
+    for role, key, count in (('Patient', 'patient_id', counts['patients']),
+                             ('Doctor', 'doctor_id', counts['doctors']),
+                             ('Pharmacist', 'pharmacist_id', counts['pharmacists'])):
+        users.extend(
+            {'username': f'{role.lower()}_{i}', 'upassword': PASSWORD, 'role': role, key: i}
+            for i in range(1, count + 1)
+        )
+    for user_id, user in enumerate(users, 1):
+        user.setdefault('patient_id', None)
+        user.setdefault('doctor_id', None)
+        user.setdefault('pharmacist_id', None)
+        user['user_id'] = user_id
+    insert(User, users)
+
+    prescriptions = [
+        {'prescript_id': i, 'patient_id': rng.randint(1, counts['patients']),
+         'doctor_id': rng.randint(1, counts['doctors']), 'drug_id': rng.randint(1, counts['drugs']),
+         'dosage': rng.choice([5, 10, 20, 25, 50, 75, 100])}
+        for i in range(1, counts['prescriptions'] + 1)
+    ]
+    insert(Prescription, prescriptions)
+
+    statuses = [status for status, _ in STATUS_MIX]
+    weights = [weight for _, weight in STATUS_MIX]
+    orders = []
+    for i in range(1, counts['orders'] + 1):
+        prescription = prescriptions[rng.randrange(len(prescriptions))]
+        orders.append({
+            'order_id': i,
+            'request_date': today - timedelta(days=rng.randint(0, 365)),
+            'pharmacy_id': rng.randint(1, counts['pharmacies']),
+            'patient_id': prescription['patient_id'],
+            'prescript_id': prescription['prescript_id'],
+            'pharmacist_id': rng.randint(1, counts['pharmacists']),
+            'status': rng.choices(statuses, weights)[0],
+        })
+    insert(Order, orders)
+    order_stats.rebuild(db.session.connection())
+
+    db.session.commit()
+    return counts
@@ -0,0 +1,85 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.run import setup_app, populate, fixtures, login, percentile
+
+# Dashboard wall-clock latency with fanout disabled (serial queries) and
+# enabled, against a local SQLite file with a fixed delay injected before
+# every statement to stand in for the network round trip to MySQL.
+#
+#   python -m bench.fanout_bench --latency-ms 2 5 10
+
+DASHBOARDS = [
+    ('doctor_dashboard', 'doctor', '/doctor_dashboard'),
+    ('patient_dashboard', 'patient', '/patient_dashboard'),
+    ('pharmacist_dashboard', 'pharmacist', '/pharmacist_dashboard'),
+]
+
+def inject_latency(engine, seconds):
+    from sqlalchemy import event
+
+    def delay(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(seconds)
+
+    event.listen(engine, 'before_cursor_execute', delay)
+    return lambda: event.remove(engine, 'before_cursor_execute', delay)
+
+def measure(client, path, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}')
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial vs concurrent dashboard queries')
+    parser.add_argument('--latency-ms', type=float, nargs='+', default=[0, 2, 5])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--scale', type=float, default=0.2)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ['FANOUT_WORKERS'] = str(args.workers)
+    database_uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='pharmacy-fanout-'), 'bench.db')
+    app = setup_app(database_uri)
+
+    from extensions import db
+    from bench.datagen import DEFAULT_COUNTS
+    counts = {key: max(1, int(value * args.scale)) for key, value in DEFAULT_COUNTS.items()}
+    populate(app, counts, seed=1500, reset=False)
+    data = fixtures(app)
+    with app.app_context():
+        engine = db.engine
+
+    clients = {}
+    for _, role, _ in DASHBOARDS:
+        clients[role] = app.test_client()
+        login(clients[role], role, data['logins'].get(role, 1))
+        # Consume the login flash so every measured response is a full render
+        clients[role].get(f'/{role}_dashboard')
+
+    print(f'{"dashboard":<22}{"latency":>9}{"serial p50":>12}{"fanout p50":>12}{"serial p95":>12}{"fanout p95":>12}{"speedup":>9}')
+    for latency_ms in args.latency_ms:
+        remove = inject_latency(engine, latency_ms / 1000)
+        try:
+            for name, role, path in DASHBOARDS:
+                app.config['FANOUT_WORKERS'] = 0
+                serial = measure(clients[role], path, args.iterations)
+                app.config['FANOUT_WORKERS'] = args.workers
+                concurrent = measure(clients[role], path, args.iterations)
+                speedup = percentile(serial, 50) / percentile(concurrent, 50)
+                print(f'{name:<22}{latency_ms:>7.1f}ms{percentile(serial, 50):>12.2f}{percentile(concurrent, 50):>12.2f}'
+                      f'{percentile(serial, 95):>12.2f}{percentile(concurrent, 95):>12.2f}{speedup:>8.2f}x')
+        finally:
+            remove()
+
+if __name__ == '__main__':
+    main()
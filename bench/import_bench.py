@@ -0,0 +1,77 @@
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.run import setup_app, populate
+
+# Bulk import throughput: generates a clinic's patients (referencing doctors
+# by name) and prescriptions (patients by id, drugs by name) as CSV and
+# imports them into a fresh SQLite database at several chunk sizes. About
+# 2% of the rows are invalid, so validation and the error path are included.
+#
+#   python -m bench.import_bench --patients 200000 --chunk-rows 500 2000 10000
+
+def patients_csv(rng, count, doctors):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['name', 'dob', 'doctor', 'primary_address'])
+    for i in range(count):
+        doctor = 'Unknown Doctor' if rng.random() < 0.01 else rng.choice(doctors)
+        dob = 'not a date' if rng.random() < 0.01 else f'{rng.randint(1930, 2020)}-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}'
+        writer.writerow([f'Patient {i}', dob, doctor, f'{rng.randint(1, 9999)} Elm St'])
+    return out.getvalue().encode()
+
+def prescriptions_csv(rng, count, patient_ids, drugs):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['patient_id', 'doctor_id', 'drug', 'dosage'])
+    for _ in range(count):
+        dosage = 0 if rng.random() < 0.02 else rng.choice([5, 10, 20, 50])
+        writer.writerow([rng.choice(patient_ids), 1, rng.choice(drugs), dosage])
+    return out.getvalue().encode()
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import benchmark')
+    parser.add_argument('--patients', type=int, default=50000)
+    parser.add_argument('--prescriptions', type=int, default=50000)
+    parser.add_argument('--chunk-rows', type=int, nargs='+', default=[500, 2000, 10000])
+    parser.add_argument('--seed', type=int, default=2500)
+    args = parser.parse_args()
+
+    database_uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='pharmacy-import-'), 'bench.db')
+    app = setup_app(database_uri)
+    from bench.datagen import DEFAULT_COUNTS
+    from extensions import db
+    from models import Doctor, Drug, Patient
+    import importer
+    counts = {key: max(1, int(value * 0.05)) for key, value in DEFAULT_COUNTS.items()}
+    populate(app, counts, seed=args.seed, reset=False)
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        # Only uniquely named doctors and drugs can be referenced by name
+        doctors = [name for name, n in db.session.query(Doctor.name, db.func.count()).group_by(Doctor.name) if n == 1]
+        drugs = [name for name, n in db.session.query(Drug.name, db.func.count()).group_by(Drug.name) if n == 1]
+        patient_ids = [row[0] for row in db.session.query(Patient.patient_id)]
+    files = {
+        'patients': patients_csv(rng, args.patients, doctors),
+        'prescriptions': prescriptions_csv(rng, args.prescriptions, patient_ids, drugs),
+    }
+
+    print(f'{"dataset":<15}{"chunk rows":>11}{"records":>10}{"inserted":>10}{"rejected":>10}{"seconds":>9}{"records/s":>11}')
+    for chunk_rows in args.chunk_rows:
+        for dataset, data in files.items():
+            with app.app_context():
+                result = importer.run_import(db.engine, dataset, io.BytesIO(data), 'csv',
+                                             f'bench:{dataset}:{chunk_rows}', chunk_rows)
+            print(f'{dataset:<15}{chunk_rows:>11}{result.records:>10}{result.inserted:>10}{result.failed:>10}'
+                  f'{result.seconds:>9.2f}{importer.rate(result):>11.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Route benchmark: fills a database with bench.datagen, drives every route
+# through the Flask test client and reports latency percentiles and queries
+# per request. Results can be saved as a JSON baseline and compared later.
+#
+#   python -m bench.run --scale 1 --save local
+#   python -m bench.run --compare bench/baselines/local.json
+#   python -m bench.run --database-uri mysql+pymysql://user:pw@localhost/pharmacy_testing --reset
+
+BASELINE_DIR = os.path.join(ROOT, 'bench', 'baselines')
+
+# (name, role, method, path); paths are filled from the generated data
+SCENARIOS = [
+    ('home', None, 'GET', '/'),
+    ('search', None, 'GET', '/search?q={search_term}'),
+    ('typeahead', None, 'GET', '/search/typeahead?q={search_prefix}'),
+    ('prescriptions', None, 'GET', '/prescriptions/{patient_name}'),
+    ('new_prescription', 'doctor', 'GET', '/new_prescription'),
+    ('patient_history_api', 'doctor', 'GET', '/api/patients/1/history'),
+    ('doctor_dashboard', 'doctor', 'GET', '/doctor_dashboard'),
+    ('patient_dashboard', 'patient', 'GET', '/patient_dashboard'),
+    ('pharmacist_dashboard', 'pharmacist', 'GET', '/pharmacist_dashboard'),
+    ('pharmacist_queue', 'pharmacist', 'GET', '/pharmacist/queue'),
+    ('pharmacist_queue_rows', 'pharmacist', 'GET', '/pharmacist/queue/rows'),
+    ('pharmacist_history', 'pharmacist', 'GET', '/pharmacist/history/{patient_id}'),
+    ('order_refill', 'patient', 'POST', '/refill/{prescript_id}'),
+    ('process_order', 'pharmacist', 'POST', '/order/process/{scheduled_order_id}'),
+    ('process_batch', 'pharmacist', 'POST', '/order/process_batch'),
+    ('prescription_batch', 'doctor', 'POST', '/prescription/batch'),
+]
+
+def take(ids, count):
+    return [ids.pop() for _ in range(min(count, len(ids)))]
+
+# JSON bodies for the POST scenarios that take one, built per request
+BODIES = {
+    'process_batch': lambda data: {'order_ids': take(data['scheduled'], 5)},
+    'prescription_batch': lambda data: {'drug_id': 1, 'dosage': 10, 'override_allergies': True,
+                                        'patient_ids': [data['logins']['patient']] * 3},
+}
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+def setup_app(database_uri):
+    os.environ['DATABASE_URI'] = database_uri
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.chdir(ROOT)
+    from app import create_app
+    return create_app()
+
+def populate(app, counts, seed, reset):
+    from extensions import db
+    from bench import datagen
+    import migrations
+    with app.app_context():
+        if reset:
+            migrations.drop_all(db.engine)
+        migrations.upgrade(db.engine)
+        return datagen.generate(seed=seed, **counts)
+
+def fixtures(app):
+    from extensions import db
+    from models import Patient, Prescription, Order
+    with app.app_context():
+        # Log the patient in as the owner of prescription 1 so refills are allowed
+        patient_id = db.session.query(Prescription.patient_id).filter_by(prescript_id=1).scalar()
+        patient = db.session.query(Patient.name).filter_by(patient_id=patient_id).scalar()
+        scheduled = [row[0] for row in db.session.query(Order.order_id).filter_by(status='Scheduled')]
+    return {
+        'patient_name': patient,
+        'search_term': patient.split(' ')[0].lower(),
+        'search_prefix': patient[:2].lower(),
+        'prescript_id': 1,
+        'patient_id': patient_id,
+        'logins': {'patient': patient_id},
+        'scheduled': scheduled,
+    }
+
+def login(client, role, number=1):
+    from bench.datagen import PASSWORD
+    client.post('/login', data={'username': f'{role}_{number}', 'upassword': PASSWORD})
+
+def drive(app, iterations, warmup):
+    from extensions import db
+    from queries import count_queries, assert_query_budget, ROUTE_QUERY_BUDGETS
+    data = fixtures(app)
+    clients = {}
+    results = {}
+    overruns = {}
+
+    with app.app_context():
+        engine = db.engine
+
+    for name, role, method, path in SCENARIOS:
+        if role not in clients:
+            clients[role] = app.test_client()
+            if role:
+                login(clients[role], role, data['logins'].get(role, 1))
+        client = clients[role]
+
+        latencies = []
+        query_counts = []
+        errors = 0
+        for i in range(warmup + iterations):
+            if '{scheduled_order_id}' in path:
+                if not data['scheduled']:
+                    break
+                url = path.format(scheduled_order_id=data['scheduled'].pop())
+            else:
+                url = path.format(**data)
+
+            body = BODIES[name](data) if name in BODIES else None
+            with count_queries(engine) as counter:
+                start = time.perf_counter()
+                response = client.open(url, method=method, json=body)
+                elapsed = (time.perf_counter() - start) * 1000
+            if i < warmup:
+                continue
+            if response.status_code >= 400:
+                errors += 1
+            latencies.append(elapsed)
+            query_counts.append(counter.count)
+            if name in ROUTE_QUERY_BUDGETS and name not in overruns:
+                try:
+                    assert_query_budget(name, counter)
+                except AssertionError as e:
+                    overruns[name] = str(e)
+
+        results[name] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'mean_queries': round(sum(query_counts) / len(query_counts), 2) if query_counts else 0,
+            'max_queries': max(query_counts, default=0),
+        }
+    return results, overruns
+
+def report(results):
+    print(f'{"route":<22}{"n":>6}{"err":>5}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"q/req":>8}{"max q":>7}')
+    for name, row in results.items():
+        print(f'{name:<22}{row["requests"]:>6}{row["errors"]:>5}{row["p50_ms"]:>10.2f}'
+              f'{row["p95_ms"]:>10.2f}{row["p99_ms"]:>10.2f}{row["mean_queries"]:>8.1f}{row["max_queries"]:>7}')
+
+def compare(results, baseline, tolerance, floor_ms):
+    # A route regresses when p95 grows past the tolerance (and the noise
+    # floor) or when it needs more queries than the baseline did
+    regressions = []
+    for name, row in results.items():
+        base = baseline['routes'].get(name)
+        if not base:
+            continue
+        if row['p95_ms'] > base['p95_ms'] * (1 + tolerance) and row['p95_ms'] - base['p95_ms'] > floor_ms:
+            regressions.append(f'{name}: p95 {base["p95_ms"]:.2f} -> {row["p95_ms"]:.2f} ms')
+        if row['max_queries'] > base['max_queries']:
+            regressions.append(f'{name}: max queries {base["max_queries"]} -> {row["max_queries"]}')
+        if row['errors'] > base['errors']:
+            regressions.append(f'{name}: errors {base["errors"]} -> {row["errors"]}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive every route and report latency and query counts')
+    parser.add_argument('--database-uri', help='defaults to a fresh SQLite file')
+    parser.add_argument('--reset', action='store_true', help='drop and regenerate tables on --database-uri')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for the default row counts')
+    parser.add_argument('--seed', type=int, default=1500)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--save', metavar='NAME', help='write bench/baselines/NAME.json')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON to check against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p95 growth')
+    parser.add_argument('--floor-ms', type=float, default=2.0, help='ignore p95 changes below this')
+    args = parser.parse_args()
+
+    from bench.datagen import DEFAULT_COUNTS
+    counts = {key: max(1, int(value * args.scale)) for key, value in DEFAULT_COUNTS.items()}
+
+    database_uri = args.database_uri
+    generate = args.reset or database_uri is None
+    if database_uri is None:
+        database_uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='pharmacy-bench-'), 'bench.db')
+
+    app = setup_app(database_uri)
+    if generate:
+        start = time.perf_counter()
+        populate(app, counts, args.seed, reset=args.reset)
+        print(f'Generated {counts} in {time.perf_counter() - start:.1f}s')
+
+    results, overruns = drive(app, args.iterations, args.warmup)
+    report(results)
+    # queries.ROUTE_QUERY_BUDGETS holds regardless of any baseline
+    for name, message in overruns.items():
+        print(f'OVER BUDGET {message}')
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save}.json')
+        with open(path, 'w') as f:
+            json.dump({
+                'meta': {
+                    'created': datetime.now().isoformat(timespec='seconds'),
+                    'dialect': database_uri.split(':', 1)[0],
+                    'counts': counts,
+                    'seed': args.seed,
+                    'iterations': args.iterations,
+                },
+                'routes': results,
+            }, f, indent=2)
+        print(f'Saved baseline to {path}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.floor_ms)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against', args.compare)
+
+    if overruns:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.run import percentile
+from scheduler import LoadIndex
+
+# Simulated order assignment: queue lengths and waits per pharmacist under
+# each policy, minute by minute. Pharmacists work at different speeds and
+# each works its own queue first in, first out. No database is needed.
+#
+#   first-row     every order to the first pharmacist (the old behaviour)
+#   random        uniformly at random
+#   round-robin   in turn (the scheduler's cold fallback)
+#   least-loaded  the scheduler with one worker: exact loads
+#   least-loaded-stale
+#                 --workers workers, each seeing its own assignments and the
+#                 completions it handled at once, and everyone else's only at
+#                 the next reconcile (every --reconcile minutes)
+#
+#   python -m bench.scheduler_bench --pharmacists 20 --orders-per-hour 400 --hours 8
+
+def first_row(rng, loads, worker, minute):
+    return 0
+
+def uniform(rng, loads, worker, minute):
+    return rng.randrange(len(loads))
+
+def round_robin():
+    turn = [0]
+    def pick(rng, loads, worker, minute):
+        turn[0] += 1
+        return (turn[0] - 1) % len(loads)
+    return pick
+
+def least_loaded(workers, reconcile):
+    indexes = [None] * workers
+    reconciled = [None] * workers
+    def pick(rng, loads, worker, minute):
+        if reconciled[worker] is None or minute - reconciled[worker] >= reconcile:
+            indexes[worker] = LoadIndex(dict(enumerate(loads)))
+            reconciled[worker] = minute
+        return indexes[worker].take()
+    def completed(worker, member):
+        if indexes[worker] is not None:
+            indexes[worker].add(member, -1)
+    pick.completed = completed
+    return pick
+
+def simulate(policy, rates, orders_per_hour, minutes, workers, seed):
+    # rates: orders per hour each pharmacist completes
+    rng = random.Random(seed)
+    queues = [[] for _ in rates]
+    lengths, waits = [], []
+    for minute in range(minutes):
+        for _ in range(poisson(rng, orders_per_hour / 60)):
+            member = policy(rng, [len(queue) for queue in queues], rng.randrange(workers), minute)
+            queues[member].append(minute)
+        for member, rate in enumerate(rates):
+            if queues[member] and rng.random() < rate / 60:
+                waits.append(minute - queues[member].pop(0))
+                if hasattr(policy, 'completed'):
+                    policy.completed(rng.randrange(workers), member)
+        lengths.extend(len(queue) for queue in queues)
+    return lengths, waits, sum(map(len, queues))
+
+def poisson(rng, mean):
+    # Knuth; means here are small
+    limit, k, p = pow(2.718281828459045, -mean), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+def main():
+    parser = argparse.ArgumentParser(description='Order assignment simulation')
+    parser.add_argument('--pharmacists', type=int, default=20)
+    parser.add_argument('--orders-per-hour', type=float, default=400)
+    parser.add_argument('--hours', type=float, default=8)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--reconcile', type=float, default=0.5, help='Minutes between reconciles.')
+    parser.add_argument('--seed', type=int, default=2200)
+    args = parser.parse_args()
+
+    # Speeds spread 10-40 orders/hour; capacity is scaled to ~85% utilisation
+    rng = random.Random(args.seed)
+    rates = [rng.uniform(10, 40) for _ in range(args.pharmacists)]
+    scale = args.orders_per_hour / 0.85 / sum(rates)
+    rates = [rate * scale for rate in rates]
+    minutes = int(args.hours * 60)
+
+    policies = [
+        ('first-row', lambda: first_row, 1),
+        ('random', lambda: uniform, 1),
+        ('round-robin', round_robin, 1),
+        ('least-loaded', lambda: least_loaded(1, 0), 1),
+        ('least-loaded-stale', lambda: least_loaded(args.workers, args.reconcile), args.workers),
+    ]
+    print(f'{args.pharmacists} pharmacists, {args.orders_per_hour:.0f} orders/hour for {args.hours:g} h, '
+          f'fastest {max(rates):.1f}/h, slowest {min(rates):.1f}/h')
+    print(f'{"policy":<20}{"queue p50":>10}{"p95":>7}{"max":>7}{"wait p50":>10}{"p95":>7}{"max":>7}{"open":>7}')
+    for name, make, workers in policies:
+        lengths, waits, still_open = simulate(make(), rates, args.orders_per_hour, minutes, workers, args.seed)
+        waits = waits or [0]
+        print(f'{name:<20}{percentile(lengths, 50):>10.0f}{percentile(lengths, 95):>7.0f}{max(lengths):>7}'
+              f'{percentile(waits, 50):>10.0f}{percentile(waits, 95):>7.0f}{max(waits):>7}{still_open:>7}')
+    print('queue: orders waiting per pharmacist, sampled each minute; wait: minutes to completion')
+
+if __name__ == '__main__':
+    main()
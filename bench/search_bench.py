@@ -0,0 +1,70 @@
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import TrigramIndex
+
+# Compares the in-process trigram index (full ranked match set) against the
+# unbounded leading-wildcard LIKE that /search used to run, at increasing sizes.
+#
+#   python -m bench.search_bench --sizes 10000 100000 1000000
+
+FIRST = ['Nolan', 'Jeremy', 'Payton', 'Samantha', 'Marcus', 'Emily', 'James', 'Sofia',
+         'David', 'Isabella', 'Ryan', 'Aisha', 'Tyler', 'Mia', 'Nathan', 'Hiro', 'Elena',
+         'Gabriela', 'Nikolai', 'Priya', 'Arjun', 'Clara', 'Michael', 'Sophia', 'Daniel']
+LAST = ['Le', 'Matloub', 'Lin', 'Wang', 'Chen', 'Rodriguez', 'Patterson', 'Gonzalez', 'Kim',
+        'Martinez', 'OSullivan', 'Patel', 'Brooks', 'Thompson', 'Lee', 'Tanaka', 'Petrova',
+        'Santos', 'Ivanov', 'Raman', 'Johansson', 'OBrien', 'Basa', 'Barbati', 'Esposito']
+QUERIES = ['ma', 'pat', 'chen', 'sofia gon', 'tanaka', 'rez', 'nikolai ivanov', 'xyz']
+
+def names(count, seed=42):
+    rng = random.Random(seed)
+    return [f'{rng.choice(FIRST)} {rng.choice(LAST)}{rng.randint(0, 9999)}' for _ in range(count)]
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def run(size, repeat):
+    rows = names(size)
+
+    start = time.perf_counter()
+    index = TrigramIndex()
+    for doc_id, name in enumerate(rows, 1):
+        index.add(doc_id, name)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE patient (patient_id INTEGER PRIMARY KEY, name TEXT)')
+    conn.executemany('INSERT INTO patient VALUES (?, ?)', enumerate(rows, 1))
+
+    print(f'\n{size} rows (index build {build_ms:.0f} ms)')
+    print(f'{"query":<16}{"matches":>10}{"trigram ms":>12}{"LIKE ms":>10}')
+    for query in QUERIES:
+        matches = len(index.match(query))
+        trigram_ms = timed(lambda: index.match(query), repeat)
+        like_ms = timed(lambda: conn.execute(
+            'SELECT patient_id, name FROM patient WHERE name LIKE ?', (f'%{query}%',)
+        ).fetchall(), repeat)
+        print(f'{query:<16}{matches:>10}{trigram_ms:>12.2f}{like_ms:>10.2f}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Search index latency benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.repeat)
+
+if __name__ == '__main__':
+    main()
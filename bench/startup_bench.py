@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.run import ROOT, setup_app, populate, percentile
+
+# Import-to-first-response time of a fresh process, the cost every gunicorn
+# worker (without preload) and every test run pays. Each sample is a new
+# interpreter that imports the app, calls create_app() and serves GET /.
+#
+#   no-cache     Jinja compiles every template from source
+#   cold-cache   bytecode cache enabled but empty (first deploy)
+#   warm-cache   bytecode cache already written by an earlier process
+#   preloaded    warm-cache plus startup.warm() before the request, i.e. what
+#                a worker forked from a preloaded gunicorn master sees
+#
+#   python -m bench.startup_bench --runs 10
+
+MODES = ['no-cache', 'cold-cache', 'warm-cache', 'preloaded']
+
+def child(mode, cache_dir, path):
+    start = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app({'JINJA_CACHE_DIR': None if mode == 'no-cache' else cache_dir})
+    created = time.perf_counter()
+    if mode == 'preloaded':
+        import startup
+        startup.warm(app)
+    warmed = time.perf_counter()
+    response = app.test_client().get(path)
+    done = time.perf_counter()
+    if response.status_code != 200:
+        raise SystemExit(f'{path} returned {response.status_code}')
+    print(json.dumps({
+        'import_ms': (imported - start) * 1000,
+        'create_app_ms': (created - imported) * 1000,
+        'warm_ms': (warmed - created) * 1000,
+        'first_response_ms': (done - warmed) * 1000,
+    }))
+
+def sample(mode, cache_dir, path, env):
+    if mode == 'cold-cache':
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-m', 'bench.startup_bench', '--child', mode, '--cache-dir', cache_dir, '--path', path],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker startup benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--scale', type=float, default=0.1)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--cache-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.cache_dir, args.path)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='pharmacy-startup-')
+    database_uri = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    app = setup_app(database_uri)
+    from bench.datagen import DEFAULT_COUNTS
+    counts = {key: max(1, int(value * args.scale)) for key, value in DEFAULT_COUNTS.items()}
+    populate(app, counts, seed=1800, reset=False)
+
+    env = dict(os.environ, DATABASE_URI=database_uri, PROFILE_REQUESTS='false')
+    cache_dir = os.path.join(workdir, 'jinja_cache')
+    columns = ['import_ms', 'create_app_ms', 'warm_ms', 'first_response_ms', 'process_ms']
+    print(f'{"mode":<12}' + ''.join(f'{column:>19}' for column in columns) + '   (p50 of %d runs)' % args.runs)
+    for mode in MODES:
+        if mode == 'warm-cache':
+            sample('cold-cache', cache_dir, args.path, env)
+        results = [sample(mode, cache_dir, args.path, env) for _ in range(args.runs)]
+        print(f'{mode:<12}' + ''.join(f'{percentile([r[c] for r in results], 50):>19.1f}' for c in columns))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import hashlib
+import os
+from functools import wraps
+from flask import request, session, make_response, current_app
+
+# Conditional GET for per-user pages. A view declares a cheap version
+# function (an aggregate query, reference-data hashes); its ETag is derived
+# from that version, the logged-in identity, the URL and the deployed
+# templates. A matching If-None-Match is answered with 304 before the view's
+# own queries or template render run.
+
+def templates_fingerprint(app):
+    # Changes whenever a template is edited, so a deploy never serves a stale 304
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()[:12]
+
+def make_etag(version):
+    identity = (session.get('user_id'), session.get('username'), session.get('person_name'))
+    parts = (current_app.config['APP_VERSION'], request.full_path, identity, version)
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+def private(response):
+    # Per-user pages: browsers may keep them but must revalidate every time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+def versioned(version):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Pending flash messages are rendered into the page, which must not be
+            # reused later, so those responses carry no validator
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return private(make_response(f(*args, **kwargs)))
+
+            etag = make_etag(version(*args, **kwargs))
+            # Weak comparison: gzipped pages carry the same tag as W/"..."
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return private(response)
+            response.set_etag(etag)
+            return private(response)
+        return decorated_function
+    return decorator
+
+def init_app(app):
+    app.config.setdefault('APP_VERSION', os.getenv('APP_VERSION') or templates_fingerprint(app))
@@ -0,0 +1,50 @@
+import os
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from metrics import TimedQueuePool
+
+# Settings come from the environment (or .env). Pool defaults suit a single
+# gunicorn worker against MySQL; size them so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under max_connections.
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+def env_bool(name, default):
+    value = os.getenv(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def engine_options(uri):
+    url = make_url(uri)
+    # In-memory SQLite is tied to a single connection and cannot be pooled
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': env_int('DB_POOL_SIZE', 5),
+        'max_overflow': env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': env_int('DB_POOL_TIMEOUT', 30),
+        # Recycle before MySQL's wait_timeout closes idle connections
+        'pool_recycle': env_int('DB_POOL_RECYCLE', 280),
+        'pool_pre_ping': env_bool('DB_POOL_PRE_PING', True),
+        # LOAD DATA LOCAL INFILE for `flask import --load-data`; the server needs local_infile=ON too
+        **({'connect_args': {'local_infile': True}}
+           if url.get_backend_name() == 'mysql' and env_bool('DB_LOCAL_INFILE', False) else {}),
+    }
+
+def configure(app, overrides=None):
+    load_dotenv()
+    app.secret_key = os.getenv('SECRET_KEY')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Optional read replica; views marked with routing.replica_reads query it
+    replica_uri = os.getenv('REPLICA_DATABASE_URI')
+    if replica_uri:
+        app.config['SQLALCHEMY_BINDS'] = {'replica': {'url': replica_uri, **engine_options(replica_uri)}}
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    # Overrides (tests, benchmarks) win; pool options follow the final URI
+    app.config.update(overrides or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
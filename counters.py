@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from sqlalchemy.orm import Session, object_session
+from models import Doctor, Pharmacist, Patient, Prescription, Order
+from routing import primary
+from extensions import listen, on_commit
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Cached aggregate counters for the home page and dashboards.
+# Values live in an in-process TTL cache and, optionally, a shared backend so
+# workers can reuse each other's results. Writes to the tracked models bump a
+# per-table tag after commit, which drops every counter depending on it.
+
+MODEL_TAGS = {
+    Order: 'orders',
+    Prescription: 'prescriptions',
+    Patient: 'patients',
+    Doctor: 'doctors',
+    Pharmacist: 'pharmacists',
+}
+
+class LocalBackend:
+    # Dict-backed stand-in for a shared cache such as Redis, used in tests
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value, expires_at = self._data.get(key, (None, None))
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            expires_at = time.monotonic() + ex if ex else None
+            self._data[key] = (value, expires_at)
+
+    def incr(self, key):
+        with self._lock:
+            value, expires_at = self._data.get(key, (0, None))
+            self._data[key] = (int(value) + 1, expires_at)
+            return int(value) + 1
+
+class CounterCache:
+    def __init__(self, ttl=60, local_ttl=None, backend=None):
+        self.ttl = ttl
+        self.local_ttl = ttl if local_ttl is None else local_ttl
+        self.backend = backend
+        self._local = {}  # name -> (expires_at, tags, value)
+        self._lock = threading.Lock()
+
+    def get(self, name, compute, tags=()):
+        entry = self._local.get(name)
+        if entry and entry[0] > time.monotonic():
+            return entry[2]
+
+        key = None
+        if self.backend is not None:
+            key = self._backend_key(name, tags)
+            value = self.backend.get(key)
+            if value is not None:
+                self._store(name, tags, int(value))
+                return int(value)
+
+        value = compute()
+        if key is not None:
+            self.backend.set(key, value, ex=self.ttl)
+        self._store(name, tags, value)
+        return value
+
+    def invalidate(self, *tags):
+        tags = set(tags)
+        with self._lock:
+            for name, (_, entry_tags, _) in list(self._local.items()):
+                if tags & entry_tags:
+                    self._local.pop(name, None)
+        # Other workers see the new generation once their local copy expires
+        if self.backend is not None:
+            for tag in tags:
+                self.backend.incr(f'counters:gen:{tag}')
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def _store(self, name, tags, value):
+        with self._lock:
+            self._local[name] = (time.monotonic() + self.local_ttl, frozenset(tags), value)
+
+    def _backend_key(self, name, tags):
+        tags = sorted(tags)
+        generations = self.backend.mget([f'counters:gen:{tag}' for tag in tags]) if tags else []
+        suffix = '.'.join(str(int(gen or 0)) for gen in generations)
+        return f'counters:{name}:{suffix}'
+
+cache = CounterCache()
+
+def count(name, query, tags):
+    return cache.get(name, lambda: _count(query), tags)
+
+def _count(query):
+    # Cached values must not come from a lagging replica
+    with primary():
+        return query.count()
+
+def invalidate(*tags):
+    cache.invalidate(*tags)
+
+def make_backend(url):
+    if not url:
+        return None
+    if url.startswith('local://'):
+        return LocalBackend()
+    if url.startswith('redis://'):
+        if redis is None:
+            raise RuntimeError('COUNTER_BACKEND_URL needs the redis package installed')
+        return redis.Redis.from_url(url)
+    raise ValueError(f'Unsupported counter backend: {url}')
+
+# Invalidation events
+def _mark(session, tag):
+    session.info.setdefault('counter_tags', set()).add(tag)
+
+def _mark_target(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _mark(session, MODEL_TAGS[mapper.class_])
+
+def _mark_bulk(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements skip the per-object mapper events
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in MODEL_TAGS:
+            _mark(orm_execute_state.session, MODEL_TAGS[mapper.class_])
+
+def _committed(session, tags):
+    cache.invalidate(*tags)
+
+def init_app(app):
+    global cache
+    app.config.setdefault('COUNTER_TTL', int(os.getenv('COUNTER_TTL', 60)))
+    app.config.setdefault('COUNTER_LOCAL_TTL', int(os.getenv('COUNTER_LOCAL_TTL', 5)))
+    app.config.setdefault('COUNTER_BACKEND_URL', os.getenv('COUNTER_BACKEND_URL'))
+
+    backend = make_backend(app.config['COUNTER_BACKEND_URL'])
+    cache = CounterCache(
+        ttl=app.config['COUNTER_TTL'],
+        # With a shared backend, local copies expire quickly so other workers'
+        # invalidations are picked up; without one each worker relies on COUNTER_TTL
+        local_ttl=app.config['COUNTER_LOCAL_TTL'] if backend is not None else None,
+        backend=backend
+    )
+
+    for model in MODEL_TAGS:
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            listen(model, name, _mark_target)
+    listen(Session, 'do_orm_execute', _mark_bulk)
+    on_commit('counter_tags', _committed)
@@ -0,0 +1,232 @@
+import csv
+import io
+import json
+import sys
+import time
+import click
+from datetime import date
+from flask import Blueprint, Response, request, abort, stream_with_context
+from sqlalchemy import select
+from auth import login_required, role_required
+from routing import read_engine
+from models import Prescription, Drug, Patient, Pharmacy, Doctor
+from archive import ORDERS, ARCHIVE
+
+# Streaming exports of orders and prescriptions as CSV or NDJSON.
+# Rows come from a server-side cursor in fixed-size partitions and are
+# written out in chunks, so memory stays flat however many rows match.
+# The same pipeline backs the HTTP endpoint and the `flask export` command.
+#
+#   GET /export/orders.csv?since=2025-01-01&status=Completed&pharmacy_id=2
+#   flask export orders --format ndjson --output orders.ndjson
+
+export_bp = Blueprint('export', __name__, cli_group='export')
+
+BATCH_ROWS = 1000
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+STATUSES = ('Cancelled', 'Scheduled', 'Completed')
+
+def orders_statement(orders, since=None, until=None, status=None, pharmacy_id=None):
+    # orders is the orders or the orders_archive table
+    statement = select(
+        orders.c.order_id,
+        orders.c.request_date,
+        orders.c.status,
+        orders.c.pharmacy_id,
+        Pharmacy.name.label('pharmacy_name'),
+        orders.c.pharmacist_id,
+        orders.c.patient_id,
+        Patient.name.label('patient_name'),
+        orders.c.prescript_id,
+        Prescription.dosage,
+        Prescription.drug_id,
+        Drug.name.label('drug_name'),
+        Prescription.doctor_id,
+    ).select_from(orders).outerjoin(
+        Pharmacy, orders.c.pharmacy_id == Pharmacy.pharmacy_id
+    ).outerjoin(
+        Patient, orders.c.patient_id == Patient.patient_id
+    ).outerjoin(
+        Prescription, orders.c.prescript_id == Prescription.prescript_id
+    ).outerjoin(
+        Drug, Prescription.drug_id == Drug.drug_id
+    )
+    if since is not None:
+        statement = statement.where(orders.c.request_date >= since)
+    if until is not None:
+        statement = statement.where(orders.c.request_date <= until)
+    if status is not None:
+        statement = statement.where(orders.c.status == status)
+    if pharmacy_id is not None:
+        statement = statement.where(orders.c.pharmacy_id == pharmacy_id)
+    return statement.order_by(orders.c.order_id)
+
+def orders_statements(**filters):
+    # Archived orders first, then the hot table, each in its own key order.
+    # Sorting the two as one union would make the database materialise and
+    # sort every matching row before the first one could be streamed.
+    return [orders_statement(source, **filters) for source in (ARCHIVE, ORDERS)]
+
+def prescriptions_statement(doctor_id=None, drug_id=None):
+    statement = select(
+        Prescription.prescript_id,
+        Prescription.patient_id,
+        Patient.name.label('patient_name'),
+        Prescription.doctor_id,
+        Doctor.name.label('doctor_name'),
+        Prescription.drug_id,
+        Drug.name.label('drug_name'),
+        Drug.common_ailment,
+        Prescription.dosage,
+    ).select_from(Prescription).outerjoin(
+        Patient, Prescription.patient_id == Patient.patient_id
+    ).outerjoin(
+        Doctor, Prescription.doctor_id == Doctor.doctor_id
+    ).outerjoin(
+        Drug, Prescription.drug_id == Drug.drug_id
+    )
+    if doctor_id is not None:
+        statement = statement.where(Prescription.doctor_id == doctor_id)
+    if drug_id is not None:
+        statement = statement.where(Prescription.drug_id == drug_id)
+    return statement.order_by(Prescription.prescript_id)
+
+def prescriptions_statements(**filters):
+    return [prescriptions_statement(**filters)]
+
+# dataset -> builder of the statements whose rows make up the export, in order
+DATASETS = {
+    'orders': orders_statements,
+    'prescriptions': prescriptions_statements,
+}
+
+# Pipeline
+def stream_rows(statements, batch_rows=BATCH_ROWS):
+    # Yields the column names, then lists of rows from each statement in turn
+    # (they share their columns); a dedicated connection (on the replica when
+    # one is configured) keeps the server-side cursor independent of the
+    # request's session
+    with read_engine().connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=batch_rows)
+        for i, statement in enumerate(statements):
+            result = conn.execute(statement)
+            if i == 0:
+                yield list(result.keys())
+            for partition in result.partitions():
+                yield partition
+
+def plain(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+def encode(fmt, batches):
+    # Turns the batches from stream_rows() into text chunks, one per batch
+    columns = next(batches)
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    for rows in batches:
+        if fmt == 'csv':
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(columns, map(plain, row)))))
+                buffer.write('\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_chunks(dataset, fmt, **filters):
+    return encode(fmt, stream_rows(DATASETS[dataset](**filters)))
+
+def write_export(dataset, fmt, out, **filters):
+    # For batch jobs: writes to an open text file, returns (rows, seconds)
+    start = time.perf_counter()
+    rows = 0
+
+    def counted(batches):
+        nonlocal rows
+        yield next(batches)
+        for batch in batches:
+            rows += len(batch)
+            yield batch
+
+    for chunk in encode(fmt, counted(stream_rows(DATASETS[dataset](**filters)))):
+        out.write(chunk)
+    return rows, time.perf_counter() - start
+
+# HTTP
+def parse_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, description=f'{name} must be YYYY-MM-DD')
+
+def request_filters(dataset):
+    if dataset == 'orders':
+        status = request.args.get('status') or None
+        if status is not None and status not in STATUSES:
+            abort(400, description=f'status must be one of {", ".join(STATUSES)}')
+        return {
+            'since': parse_date('since'),
+            'until': parse_date('until'),
+            'status': status,
+            'pharmacy_id': request.args.get('pharmacy_id', type=int),
+        }
+    return {
+        'doctor_id': request.args.get('doctor_id', type=int),
+        'drug_id': request.args.get('drug_id', type=int),
+    }
+
+@export_bp.route('/export/<dataset>.<fmt>')
+@login_required
+@role_required('Pharmacist')
+def export_view(dataset, fmt):
+    if dataset not in DATASETS or fmt not in FORMATS:
+        abort(404)
+    filters = request_filters(dataset)
+    response = Response(stream_with_context(export_chunks(dataset, fmt, **filters)), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={dataset}-{date.today().isoformat()}.{fmt}'
+    # Let reverse proxies pass chunks through instead of buffering the whole export
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# CLI
+def cli_date(ctx, param, value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise click.BadParameter('use YYYY-MM-DD')
+
+@export_bp.cli.command('orders')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='csv', show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Defaults to stdout.')
+@click.option('--since', callback=cli_date, help='First request_date to include (YYYY-MM-DD).')
+@click.option('--until', callback=cli_date, help='Last request_date to include (YYYY-MM-DD).')
+@click.option('--status', type=click.Choice(STATUSES))
+@click.option('--pharmacy-id', type=int)
+def export_orders_command(fmt, output, **filters):
+    """Export orders joined to prescriptions, drugs, patients and pharmacies."""
+    run_export('orders', fmt, output, filters)
+
+@export_bp.cli.command('prescriptions')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='csv', show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Defaults to stdout.')
+@click.option('--doctor-id', type=int)
+@click.option('--drug-id', type=int)
+def export_prescriptions_command(fmt, output, **filters):
+    """Export prescriptions joined to patients, doctors and drugs."""
+    run_export('prescriptions', fmt, output, filters)
+
+def run_export(dataset, fmt, output, filters):
+    if output:
+        with open(output, 'w', newline='') as out:
+            rows, seconds = write_export(dataset, fmt, out, **filters)
+        click.echo(f'{rows} {dataset} written to {output} in {seconds:.1f}s', err=True)
+    else:
+        write_export(dataset, fmt, sys.stdout, **filters)
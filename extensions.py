@@ -1,3 +1,48 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from routing import RoutingSession
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+SCHEMA = 'pharmacy_testing'
+
+def attach_sqlite_schema(engine):
+    # The models live in the pharmacy_testing schema. On SQLite that schema is
+    # attached as a second database file next to the main one.
+    if engine.dialect.name != 'sqlite':
+        return
+    database = engine.url.database
+    path = f'{database}.{SCHEMA}' if database and database != ':memory:' else ':memory:'
+
+    @event.listens_for(engine, 'connect')
+    def attach(dbapi_connection, connection_record):
+        dbapi_connection.execute(f"ATTACH DATABASE '{path}' AS {SCHEMA}")
+
+def listen(target, identifier, fn):
+    # event.listen that is safe to repeat when create_app runs more than once
+    if not event.contains(target, identifier, fn):
+        event.listen(target, identifier, fn)
+
+# Work deferred to the end of a transaction. Hooks collect into
+# session.info[key] while it runs; after the commit apply(session, value) is
+# called with what was collected, in registration order, and on rollback the
+# value is dropped, or handed to rollback(session, value) when given.
+_deferred = {}
+
+def on_commit(key, apply, rollback=None):
+    _deferred[key] = (apply, rollback)
+    listen(Session, 'after_commit', _after_commit)
+    listen(Session, 'after_rollback', _after_rollback)
+
+def _after_commit(session):
+    for key, (apply, _) in _deferred.items():
+        value = session.info.pop(key, None)
+        if value:
+            apply(session, value)
+
+def _after_rollback(session):
+    for key, (_, rollback) in _deferred.items():
+        value = session.info.pop(key, None)
+        if value and rollback is not None:
+            rollback(session, value)
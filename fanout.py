@@ -0,0 +1,44 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g
+from extensions import db
+
+# Runs a view's independent read queries concurrently so page latency is the
+# slowest query rather than the sum of all of them. Every task runs in its own
+# app context, so it gets its own session and pooled connection. Tasks must
+# build their queries when called (not before) and eager-load whatever the
+# template touches: results are detached once the task's session closes.
+
+_executor = None
+
+def enabled():
+    if _executor is None or not current_app.config['FANOUT_WORKERS']:
+        return False
+    # A single in-memory SQLite connection cannot be shared between threads
+    url = db.engine.url
+    return not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'))
+
+def _run(app, profile, read_replica, task):
+    with app.app_context():
+        if profile is not None:
+            g._profile = profile
+        g._read_replica = read_replica
+        return task()
+
+def run(**tasks):
+    # run(prescriptions=lambda: ..., counts=lambda: ...) -> {'prescriptions': ..., 'counts': ...}
+    if not enabled() or len(tasks) < 2:
+        return {name: task() for name, task in tasks.items()}
+
+    app = current_app._get_current_object()
+    profile = g.get('_profile')
+    read_replica = g.get('_read_replica', False)
+    futures = {name: _executor.submit(_run, app, profile, read_replica, task) for name, task in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+def init_app(app):
+    global _executor
+    # 0 runs every task inline; keep it below DB_POOL_SIZE + DB_MAX_OVERFLOW
+    app.config.setdefault('FANOUT_WORKERS', int(os.getenv('FANOUT_WORKERS', 4)))
+    workers = app.config['FANOUT_WORKERS']
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fanout') if workers > 0 else None
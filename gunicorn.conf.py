@@ -0,0 +1,24 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py 'app:create_app()'
+#
+# The app is built once in the master (preload_app) and warmed before
+# forking: templates compiled, reference data and the search index loaded.
+# Workers inherit all of that copy-on-write and only open their own
+# database connections.
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+preload_app = True
+
+def when_ready(server):
+    import startup
+    app = server.app.wsgi()
+    templates = startup.warm(app)
+    server.log.info('Warmed %d templates and reference data before fork', templates)
+
+def post_worker_init(worker):
+    import startup
+    startup.warm_pool(worker.wsgi)
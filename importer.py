@@ -0,0 +1,486 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import tempfile
+import time
+import click
+from collections import namedtuple
+from datetime import date, datetime
+from flask import Blueprint, request, jsonify, abort, current_app
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError, DataError
+from auth import admin_required
+from extensions import db, SCHEMA
+from models import Doctor, Patient, PatientHistory, Drug, Prescription, ImportCheckpoint
+
+# Bulk import of patients, drugs, patient histories and prescriptions from
+# CSV or NDJSON. Input is read as a stream and handled in chunks of
+# IMPORT_CHUNK_ROWS records: each chunk is validated against in-memory
+# lookups (doctor, patient and drug ids and names, loaded once per import),
+# written with one executemany INSERT (or LOAD DATA LOCAL INFILE on MySQL)
+# and committed together with the job's checkpoint. Re-running a job skips
+# the records already committed. Invalid records are not written; they go
+# to the error report with the field and reason. A chunk the database
+# rejects anyway (say a row written since the lookups were loaded) is
+# retried one row at a time and the rows it still refuses are reported too.
+#
+#   flask import patients clinic-patients.csv [--errors report.csv] [--load-data]
+#   POST /admin/import/patients  (multipart "file"; users in ADMIN_USERNAMES)
+#
+# Rows may reference doctors, patients and drugs by id (doctor_id, ...) or
+# by name (doctor, patient, drug); a name must match exactly one row.
+
+import_bp = Blueprint('importer', __name__, cli_group='import')
+
+FORMATS = ('csv', 'ndjson')
+CHECKPOINTS = ImportCheckpoint.__table__
+MAX_REPORTED_ERRORS = 100
+AMBIGUOUS = object()
+
+ImportResult = namedtuple('ImportResult', 'job dataset records inserted failed resumed_at seconds')
+RowFailure = namedtuple('RowFailure', 'record field message row')
+
+class ImportFailed(Exception):
+    pass
+
+class RowsRejected(Exception):
+    # LOAD DATA LOCAL skipped or altered rows instead of failing the statement
+    pass
+
+class RowError(Exception):
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+        self.message = message
+
+# Field parsing
+def text_value(row, field, max_length, required=False):
+    value = row.get(field)
+    if isinstance(value, (list, dict)):
+        raise RowError(field, 'must be a single value, not a list or object')
+    value = None if value is None else str(value).strip()
+    if not value:
+        if required:
+            raise RowError(field, 'required')
+        return None
+    if len(value) > max_length:
+        raise RowError(field, f'longer than {max_length} characters')
+    return value
+
+def int_value(row, field, required=False, minimum=None):
+    value = row.get(field)
+    if value is None or value == '':
+        if required:
+            raise RowError(field, 'required')
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise RowError(field, f'not a whole number: {value!r}')
+    if minimum is not None and number < minimum:
+        raise RowError(field, f'must be at least {minimum}')
+    return number
+
+def date_value(row, field):
+    value = row.get(field)
+    if value is None or value == '':
+        return None
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise RowError(field, f'not a YYYY-MM-DD date: {value!r}')
+
+class Lookup:
+    # Ids and case-insensitive names of one table
+    def __init__(self, label, rows=()):
+        self.label = label
+        self.ids = set()
+        self.names = {}
+        for row_id, name in rows:
+            self.add(row_id, name)
+
+    def add(self, row_id, name):
+        self.ids.add(row_id)
+        if name:
+            key = name.strip().casefold()
+            self.names[key] = AMBIGUOUS if self.names.get(key, row_id) != row_id else row_id
+
+    def resolve(self, row, id_field, name_field, required=True):
+        # The id column wins; otherwise the name must match exactly one row
+        row_id = int_value(row, id_field)
+        if row_id is not None:
+            if row_id not in self.ids:
+                raise RowError(id_field, f'no {self.label} {row_id}')
+            return row_id
+        name = text_value(row, name_field, 200)
+        if name is None:
+            if required:
+                raise RowError(name_field, f'{id_field} or {name_field} required')
+            return None
+        found = self.names.get(name.casefold())
+        if found is None:
+            raise RowError(name_field, f'no {self.label} named {name!r}')
+        if found is AMBIGUOUS:
+            raise RowError(name_field, f'several {self.label}s are named {name!r}; give {id_field}')
+        return found
+
+def lookup(conn, label, id_column, name_column):
+    return Lookup(label, conn.execute(select(id_column, name_column)))
+
+# Datasets: (table, prepare(conn) -> state, validate(row, state) -> values)
+def prepare_patients(conn):
+    # Rows without a patient_id are numbered here, like drugs, so a later
+    # row's explicit id can be checked against them before anything is written
+    patient_ids = set(conn.execute(select(Patient.patient_id)).scalars())
+    return {
+        'doctors': lookup(conn, 'doctor', Doctor.doctor_id, Doctor.name),
+        'patient_ids': patient_ids,
+        'next_id': max(patient_ids, default=0) + 1,
+    }
+
+def validate_patient(row, state):
+    patient_id = int_value(row, 'patient_id', minimum=1)
+    if patient_id in state['patient_ids']:
+        raise RowError('patient_id', f'patient {patient_id} already exists')
+    values = {
+        'patient_id': patient_id or state['next_id'],
+        'name': text_value(row, 'name', 30, required=True),
+        'dob': date_value(row, 'dob'),
+        'doctor_id': state['doctors'].resolve(row, 'doctor_id', 'doctor', required=False),
+        'primary_address': text_value(row, 'primary_address', 100),
+    }
+    state['patient_ids'].add(values['patient_id'])
+    state['next_id'] = max(state['next_id'], values['patient_id'] + 1)
+    return values
+
+def prepare_drugs(conn):
+    # drug_id has no auto-increment on MySQL, so new drugs are numbered here
+    return {
+        'drugs': lookup(conn, 'drug', Drug.drug_id, Drug.name),
+        'next_id': (conn.execute(select(func.max(Drug.drug_id))).scalar() or 0) + 1,
+    }
+
+def validate_drug(row, state):
+    drugs = state['drugs']
+    drug_id = int_value(row, 'drug_id', minimum=1)
+    name = text_value(row, 'name', 50, required=True)
+    if drug_id in drugs.ids:
+        raise RowError('drug_id', f'drug {drug_id} already exists')
+    if name.casefold() in drugs.names:
+        raise RowError('name', f'{name!r} is already in the formulary')
+    values = {
+        'drug_id': drug_id or state['next_id'],
+        'name': name,
+        'common_ailment': text_value(row, 'common_ailment', 200),
+    }
+    drugs.add(values['drug_id'], name)
+    state['next_id'] = max(state['next_id'], values['drug_id'] + 1)
+    return values
+
+def prepare_histories(conn):
+    return {
+        'patients': lookup(conn, 'patient', Patient.patient_id, Patient.name),
+        'with_history': set(conn.execute(select(PatientHistory.patient_id)).scalars()),
+    }
+
+def validate_history(row, state):
+    patient_id = state['patients'].resolve(row, 'patient_id', 'patient')
+    if patient_id in state['with_history']:
+        raise RowError('patient_id', f'patient {patient_id} already has a history')
+    values = {
+        'patient_id': patient_id,
+        'allergies': text_value(row, 'allergies', 200),
+        'family_history': text_value(row, 'family_history', 200),
+        'notes': text_value(row, 'notes', 200),
+    }
+    state['with_history'].add(patient_id)
+    return values
+
+def prepare_prescriptions(conn):
+    return {
+        'patients': lookup(conn, 'patient', Patient.patient_id, Patient.name),
+        'doctors': lookup(conn, 'doctor', Doctor.doctor_id, Doctor.name),
+        'drugs': lookup(conn, 'drug', Drug.drug_id, Drug.name),
+    }
+
+def validate_prescription(row, state):
+    # Historical prescriptions: no orders are created for them
+    return {
+        'prescript_id': None,
+        'patient_id': state['patients'].resolve(row, 'patient_id', 'patient'),
+        'doctor_id': state['doctors'].resolve(row, 'doctor_id', 'doctor'),
+        'drug_id': state['drugs'].resolve(row, 'drug_id', 'drug'),
+        'dosage': int_value(row, 'dosage', required=True, minimum=1),
+    }
+
+DATASETS = {
+    'patients': (Patient.__table__, prepare_patients, validate_patient),
+    'drugs': (Drug.__table__, prepare_drugs, validate_drug),
+    'histories': (PatientHistory.__table__, prepare_histories, validate_history),
+    'prescriptions': (Prescription.__table__, prepare_prescriptions, validate_prescription),
+}
+
+# Input
+def read_records(stream, fmt):
+    # Yields (record number, row dict, error); blank NDJSON lines are skipped
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(text), 1):
+            if None in row:
+                yield number, row, ('', 'more fields than the header')
+            else:
+                yield number, row, None
+        return
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, {'line': line.rstrip('\n')}, ('', f'invalid JSON: {e}')
+            continue
+        if not isinstance(row, dict):
+            yield number, {'line': line.rstrip('\n')}, ('', 'not a JSON object')
+        else:
+            yield number, row, None
+
+def default_job(dataset, stream):
+    # Named after the content, so the same file resumes under any file name
+    digest = hashlib.sha1()
+    for block in iter(lambda: stream.read(1 << 20), b''):
+        digest.update(block)
+    stream.seek(0)
+    return f'{dataset}:{digest.hexdigest()[:16]}'
+
+# Output
+def insert_rows(conn, table, rows):
+    # executemany; the MySQL drivers send it as multi-row INSERT statements
+    conn.execute(table.insert(), rows)
+
+def tsv_value(value):
+    if value is None:
+        return '\\N'
+    value = value.isoformat() if isinstance(value, date) else str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def load_data_rows(conn, table, rows):
+    # Needs DB_LOCAL_INFILE=true here and local_infile=ON on the server.
+    # With LOCAL, MySQL turns duplicate keys and bad values into warnings and
+    # skips or coerces the row, so any shortfall or warning fails the chunk
+    columns = list(rows[0])
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', newline='', delete=False) as f:
+        for row in rows:
+            f.write('\t'.join(tsv_value(row[column]) for column in columns) + '\n')
+    try:
+        loaded = conn.exec_driver_sql(
+            f'LOAD DATA LOCAL INFILE %s INTO TABLE {SCHEMA}.`{table.name}` CHARACTER SET utf8mb4 '
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+            f'({", ".join(f"`{column}`" for column in columns)})',
+            (f.name,)
+        ).rowcount
+        warnings = conn.exec_driver_sql('SELECT @@warning_count').scalar()
+    finally:
+        os.unlink(f.name)
+    if loaded != len(rows) or warnings:
+        raise RowsRejected(f'{len(rows) - loaded} of {len(rows)} rows skipped, {warnings} warnings')
+
+def insert_each(conn, table, valid, failures):
+    # One row per savepoint; returns the rows that went in and adds the rest to failures
+    rows = []
+    for number, row, values in valid:
+        try:
+            with conn.begin_nested():
+                conn.execute(table.insert(), values)
+        except (IntegrityError, DataError) as e:
+            failures.append(RowFailure(number, '', f'rejected by the database: {e.orig}', row))
+        else:
+            rows.append(values)
+    return rows
+
+def save_checkpoint(conn, job, dataset, records, inserted, failed):
+    values = {'dataset': dataset, 'records': records, 'inserted': inserted, 'failed': failed,
+              'updated_at': datetime.now()}
+    if not conn.execute(CHECKPOINTS.update().where(CHECKPOINTS.c.job == job), values).rowcount:
+        conn.execute(CHECKPOINTS.insert(), dict(values, job=job))
+
+# Pipeline
+def run_import(engine, dataset, stream, fmt, job, chunk_rows=1000, load_data=False,
+               on_failures=None, on_chunk=None):
+    # stream: binary file object. on_failures([RowFailure]) and
+    # on_chunk(records, inserted, failed, seconds) run after each commit.
+    table, prepare, validate = DATASETS[dataset]
+    if load_data and engine.dialect.name != 'mysql':
+        raise ImportFailed('LOAD DATA LOCAL INFILE needs MySQL')
+    write = load_data_rows if load_data else insert_rows
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        checkpoint = conn.execute(CHECKPOINTS.select().where(CHECKPOINTS.c.job == job)).first()
+        state = prepare(conn)
+    if checkpoint is not None and checkpoint.dataset != dataset:
+        raise ImportFailed(f'job {job} is a {checkpoint.dataset} import')
+    resumed_at = checkpoint.records if checkpoint else 0
+    records, inserted, failed = (checkpoint.records, checkpoint.inserted, checkpoint.failed) if checkpoint else (0, 0, 0)
+
+    source = itertools.islice(read_records(stream, fmt), resumed_at, None)
+    while True:
+        chunk = list(itertools.islice(source, chunk_rows))
+        if not chunk:
+            break
+        valid, failures = [], []
+        for number, row, error in chunk:
+            if error is None:
+                try:
+                    valid.append((number, row, validate(row, state)))
+                    continue
+                except RowError as e:
+                    error = (e.field, e.message)
+            failures.append(RowFailure(number, *error, row))
+        rows = [values for _, _, values in valid]
+        # The checkpoint commits with the rows, so a rerun never writes a chunk twice
+        try:
+            with engine.begin() as conn:
+                if rows:
+                    write(conn, table, rows)
+                save_checkpoint(conn, job, dataset, records + len(chunk), inserted + len(rows),
+                                failed + len(failures))
+        except (IntegrityError, RowsRejected):
+            # Plain INSERTs, so the rows LOAD DATA skipped fail loudly here
+            with engine.begin() as conn:
+                rows = insert_each(conn, table, valid, failures)
+                save_checkpoint(conn, job, dataset, records + len(chunk), inserted + len(rows),
+                                failed + len(failures))
+            failures.sort(key=lambda failure: failure.record)
+        records += len(chunk)
+        inserted += len(rows)
+        failed += len(failures)
+        if failures and on_failures:
+            on_failures(failures)
+        if on_chunk:
+            on_chunk(records, inserted, failed, time.perf_counter() - start)
+
+    if inserted:
+        # Raw inserts skip the model events, so drop derived caches explicitly
+        import counters
+        import refdata
+        import search
+        counters.invalidate(*counters.MODEL_TAGS.values())
+        refdata.invalidate()
+        search.invalidate()
+    return ImportResult(job, dataset, records, inserted, failed, resumed_at, time.perf_counter() - start)
+
+def rate(result):
+    # Records per second handled in this run (resumed records excluded)
+    done = result.records - result.resumed_at
+    return done / result.seconds if result.seconds else 0.0
+
+def failure_dict(failure):
+    return {'record': failure.record, 'field': failure.field, 'message': failure.message}
+
+class ErrorReport:
+    # CSV of rejected records; appends, so a resumed job extends its report
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        new = not os.path.exists(path)
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        if new:
+            self.writer.writerow(['record', 'field', 'message', 'row'])
+
+    def write(self, failures):
+        for failure in failures:
+            self.writer.writerow([failure.record, failure.field, failure.message,
+                                  json.dumps(failure.row, default=str)])
+        self.count += len(failures)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+# HTTP
+@import_bp.route('/admin/import/<dataset>', methods=['POST'])
+@admin_required
+def import_view(dataset):
+    if dataset not in DATASETS:
+        abort(404)
+    upload = request.files.get('file')
+    if upload is None:
+        abort(400, description='Send the data as the multipart field "file"')
+    fmt = request.form.get('format') or upload.filename.rpartition('.')[2].lower()
+    if fmt not in FORMATS:
+        abort(400, description=f'format must be one of {", ".join(FORMATS)}')
+
+    failures = []
+    def keep(batch):
+        failures.extend(batch[:MAX_REPORTED_ERRORS - len(failures)])
+
+    job = request.form.get('job') or default_job(dataset, upload.stream)
+    try:
+        result = run_import(db.engine, dataset, upload.stream, fmt, job,
+                            chunk_rows=current_app.config['IMPORT_CHUNK_ROWS'], on_failures=keep)
+    except ImportFailed as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(
+        **result._asdict(),
+        rows_per_second=round(rate(result)),
+        errors=[failure_dict(failure) for failure in failures],
+    )
+
+# CLI
+def import_command(dataset):
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+    @click.option('--job', help='Checkpoint name; defaults to one derived from the file content.')
+    @click.option('--chunk-rows', type=int, help='Records per transaction; defaults to IMPORT_CHUNK_ROWS.')
+    @click.option('--errors', 'errors_path', type=click.Path(dir_okay=False), help='Defaults to PATH.errors.csv.')
+    @click.option('--load-data', is_flag=True, help='MySQL: write with LOAD DATA LOCAL INFILE.')
+    @click.option('--restart', is_flag=True, help='Ignore an existing checkpoint for this job.')
+    def command(path, fmt, job, chunk_rows, errors_path, load_data, restart):
+        fmt = fmt or path.rpartition('.')[2].lower()
+        if fmt not in FORMATS:
+            raise click.BadParameter(f'use --format {" or ".join(FORMATS)}', param_hint='--format')
+        report = ErrorReport(errors_path or path + '.errors.csv')
+
+        def progress(records, inserted, failed, seconds):
+            click.echo(f'\r{records} records, {inserted} inserted, {failed} rejected, '
+                       f'{records / seconds:.0f} records/s', nl=False)
+
+        try:
+            with open(path, 'rb') as stream:
+                job = job or default_job(dataset, stream)
+                if restart:
+                    with db.engine.begin() as conn:
+                        conn.execute(CHECKPOINTS.delete().where(CHECKPOINTS.c.job == job))
+                result = run_import(db.engine, dataset, stream, fmt, job,
+                                    chunk_rows or current_app.config['IMPORT_CHUNK_ROWS'],
+                                    load_data, report.write, progress)
+        except ImportFailed as e:
+            raise click.ClickException(str(e))
+        finally:
+            report.close()
+        click.echo()
+        if result.resumed_at:
+            click.echo(f'Resumed job {job} after record {result.resumed_at}')
+        click.echo(f'{result.inserted} {dataset} imported, {result.failed} rejected, {result.records} records '
+                   f'in {result.seconds:.1f}s ({rate(result):.0f} records/s)')
+        if report.count:
+            click.echo(f'{report.count} rejected records written to {report.path}')
+
+    command.__doc__ = f'Import {dataset} from a CSV or NDJSON file.'
+    return import_bp.cli.command(dataset)(command)
+
+for _dataset in DATASETS:
+    import_command(_dataset)
+
+def init_app(app):
+    app.config.setdefault('IMPORT_CHUNK_ROWS', int(os.getenv('IMPORT_CHUNK_ROWS', 1000)))
+    app.config.setdefault('ADMIN_USERNAMES', {
+        name.strip() for name in os.getenv('ADMIN_USERNAMES', '').split(',') if name.strip()
+    })
+    app.register_blueprint(import_bp)
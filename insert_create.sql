@@ -1,109 +1,6 @@
 USE pharmacy_testing;
 
-CREATE table doctor
-	(doctor_id INT UNIQUE AUTO_INCREMENT,
-	name VARCHAR(30),
-	dob DATE,
-    PRIMARY KEY(doctor_id));
-
-CREATE table pharmacist
-	(pharmacist_id INT UNIQUE AUTO_INCREMENT,
-	name VARCHAR(30),
-	dob DATE,
-    PRIMARY KEY(pharmacist_id));
-    
-CREATE table patient
-	(patient_id INT UNIQUE AUTO_INCREMENT,
-	name VARCHAR(30),
-	dob date,
-	doctor_id INT,
-	primary_address VARCHAR(100),
-	PRIMARY KEY(patient_id), 
-	FOREIGN KEY(doctor_id) 
-		references doctor(doctor_id));
-
-CREATE table user
-	(user_id INT UNIQUE AUTO_INCREMENT, 
-	patient_id INT,
-	doctor_id INT,
-	pharmacist_id INT,
-	username VARCHAR(30) UNIQUE,
-	upassword varchar(80),
-	role ENUM("Patient","Doctor","Pharmacist"),
-	PRIMARY KEY (user_id),
-	FOREIGN KEY(doctor_id)
-		references doctor(doctor_id),
-	FOREIGN KEY(patient_id)
-		references patient(patient_id),
-	FOREIGN KEY(pharmacist_id)
-		references pharmacist(pharmacist_id));
-
-CREATE table patientHistory
-	(patient_id INT UNIQUE AUTO_INCREMENT,
-	allergies VARCHAR(200),
-    family_history VARCHAR(200),
-	notes VARCHAR(200),
-	PRIMARY KEY(patient_id), 
-    FOREIGN KEY(patient_id) 
-		references patient(patient_id));
-
-CREATE table prescriptions
-	(prescript_id INT UNIQUE AUTO_INCREMENT,
-	patient_id INT,
-	doctor_id INT,
-    drug_id INT,
-	dosage INT,
-    PRIMARY KEY(prescript_id),
-    FOREIGN KEY(patient_id) 
-		references patient(patient_id),
-	FOREIGN KEY(doctor_id)
-		references doctor(doctor_id));
-
-CREATE table drug
-	(drug_id INT UNIQUE,
-	name VARCHAR(50),
-	common_ailment VARCHAR(200));
-
-CREATE table pharmacy
-	(pharmacy_id INT UNIQUE,
-	address VARCHAR(100),
-	name VARCHAR(100),
-	PRIMARY KEY(pharmacy_id));
-
-CREATE table orders
-	(order_id INT UNIQUE AUTO_INCREMENT,
-	request_date DATE,
-	pharmacy_id INT,
-	patient_id INT,
-	prescript_id INT,
-	pharmacist_id INT,
-	status ENUM("Cancelled", "Scheduled", "Completed"),
-    PRIMARY KEY(order_id),
-    FOREIGN KEY(pharmacy_id)
-		references pharmacy(pharmacy_id),
-    FOREIGN KEY(patient_id)
-		references patient(patient_id),
-    FOREIGN KEY(prescript_id)
-		references prescriptions(prescript_id),
-    FOREIGN KEY(pharmacist_id)
-		references pharmacist(pharmacist_id));
-
-CREATE table user
-	(user_id INT,
-    role ENUM('Patient', 'Doctor', 'Pharmacist'),
-    patient_id INT,
-    doctor_id INT, 
-    pharmacist_id INT,
-    username VARCHAR(50),
-    password VARCHAR(50),
-    PRIMARY KEY(user_id),
-    FOREIGN KEY(patient_id)
-		references Patient,
-	FOREIGN KEY(doctor_id)
-		references doctor,
-	FOREIGN KEY(pharmacist_id)
-		references pharmacist);
-
+-- Tables and indexes are created by migrations.py (flask db upgrade)
 
 -- DUMMY DATA
 INSERT INTO doctor(doctor_id, name, dob)
@@ -226,6 +123,48 @@ VALUES
 (14, 'Pantoprazole', 'GERD'),
 (15, 'Fluoxetine', 'Depression');
 
+INSERT INTO drug_terms(term_id, drug_id, term, kind)
+VALUES
+(1, 1, 'Zestril', 'synonym'),
+(2, 1, 'Prinivil', 'synonym'),
+(3, 1, 'ACE inhibitor', 'class'),
+(4, 1, 'angioedema', 'contraindication'),
+(5, 1, 'pregnancy', 'contraindication'),
+(6, 2, 'Glucophage', 'synonym'),
+(7, 2, 'biguanide', 'class'),
+(8, 2, 'kidney disease', 'contraindication'),
+(9, 2, 'lactic acidosis', 'contraindication'),
+(10, 3, 'Lipitor', 'synonym'),
+(11, 3, 'statin', 'class'),
+(12, 3, 'liver disease', 'contraindication'),
+(13, 3, 'pregnancy', 'contraindication'),
+(14, 4, 'Zoloft', 'synonym'),
+(15, 4, 'SSRI', 'class'),
+(16, 5, 'Prilosec', 'synonym'),
+(17, 5, 'proton pump inhibitor', 'class'),
+(18, 5, 'PPI', 'class'),
+(19, 6, 'Synthroid', 'synonym'),
+(20, 7, 'Vistaril', 'synonym'),
+(21, 7, 'Atarax', 'synonym'),
+(22, 7, 'antihistamine', 'class'),
+(23, 8, 'Norvasc', 'synonym'),
+(24, 8, 'calcium channel blocker', 'class'),
+(25, 9, 'Ventolin', 'synonym'),
+(26, 9, 'ProAir', 'synonym'),
+(27, 10, 'Neurontin', 'synonym'),
+(28, 11, 'Cozaar', 'synonym'),
+(29, 11, 'ARB', 'class'),
+(30, 11, 'angiotensin receptor blocker', 'class'),
+(31, 11, 'pregnancy', 'contraindication'),
+(32, 12, 'Lexapro', 'synonym'),
+(33, 12, 'SSRI', 'class'),
+(34, 13, 'Singulair', 'synonym'),
+(35, 14, 'Protonix', 'synonym'),
+(36, 14, 'proton pump inhibitor', 'class'),
+(37, 14, 'PPI', 'class'),
+(38, 15, 'Prozac', 'synonym'),
+(39, 15, 'SSRI', 'class');
+
 INSERT INTO pharmacy(pharmacy_id, address, name)
 VALUES
 (1, '12 Kimble Road', 'Rite Aid'),
@@ -273,49 +212,3 @@ VALUES
 (13, '2025-02-27', 9, 1, 2, 4, 'Completed'),
 (14, '2025-12-06', 4, 3, 1, 5, 'Scheduled'),
 (15, '2025-11-14', 5, 1, 2, 2, 'Scheduled');
-
-INSERT into user(user_id, role, patient_id, username, password)
-VALUES
-(1, 'Patient', 1, 'nolanLe', 'password'),
-(2, 'Patient', 2, 'jsmith', 'pass123'),
-(3, 'Patient', 3, 'emilyd', 'secure456'),
-(4, 'Patient', 4, 'robertj', 'health789'),
-(5, 'Patient', 5, 'sarahm', 'care2024'),
-(6, 'Patient', 6, 'michaelb', 'wellness01'),
-(7, 'Patient', 7, 'lisac', 'patient22'),
-(8, 'Patient', 8, 'davidw', 'medical33'),
-(9, 'Patient', 9, 'jennifert', 'portal44'),
-(10, 'Patient', 10, 'chrisp', 'access55'),
-(11, 'Patient', 11, 'amandah', 'record66'),
-(12, 'Patient', 12, 'jamesm', 'system77'),
-(13, 'Patient', 13, 'laurak', 'login88'),
-(14, 'Patient', 14, 'thomasn', 'entry99'),
-(15, 'Patient', 15, 'jessicaa', 'data2025');
-
-INSERT into user(user_id, role, doctor_id, username, password)
-VALUES
-(16, 'Doctor', 1, 'htdabest', 'pass'),
-(17, 'Doctor', 2, 'drjohnson', 'med2024'),
-(18, 'Doctor', 3, 'drbrown', 'clinic01'),
-(19, 'Doctor', 4, 'drgarcia', 'health22'),
-(20, 'Doctor', 5, 'drlee', 'practice33'),
-(21, 'Doctor', 6, 'drwilson', 'doctor44'),
-(22, 'Doctor', 7, 'drmartinez', 'medical55'),
-(23, 'Doctor', 8, 'dranderson', 'care66'),
-(24, 'Doctor', 9, 'drthomas', 'physician77'),
-(25, 'Doctor', 10, 'drtaylor', 'staff88'),
-(26, 'Doctor', 11, 'drmoore', 'hospital99');
-
-INSERT into user(user_id, role, pharmacist_id, username, password)
-VALUES
-(27, 'Pharmacist', 1, 'username', 'mypassword'),
-(28, 'Pharmacist', 2, 'pharma_jones', 'pills123'),
-(29, 'Pharmacist', 3, 'rxtech_kim', 'meds456'),
-(30, 'Pharmacist', 4, 'pharmD_alex', 'script789'),
-(31, 'Pharmacist', 5, 'medtech_ryan', 'dispense01'),
-(32, 'Pharmacist', 6, 'pharmacist_emma', 'pharmacy22'),
-(33, 'Pharmacist', 7, 'rx_manager', 'counter33'),
-(34, 'Pharmacist', 8, 'pill_pro', 'medicine44'),
-(35, 'Pharmacist', 9, 'drug_expert', 'dosage55'),
-(36, 'Pharmacist', 10, 'pharm_carol', 'refill66');
-
@@ -0,0 +1,118 @@
+import threading
+import time
+from flask import Blueprint, Response, current_app, request, abort
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from extensions import db
+
+# /metrics endpoint in the Prometheus text format.
+# Other modules add their own series with @collector.
+
+metrics_bp = Blueprint('metrics', __name__)
+
+collectors = []
+
+def collector(fn):
+    collectors.append(fn)
+    return fn
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            'checkouts': 0,
+            'checkins': 0,
+            'overflow_checkouts': 0,
+            'connects': 0,
+            'invalidations': 0,
+            'soft_invalidations': 0,
+            'timeouts': 0,
+        }
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe_wait(self, seconds):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records checkouts, overflow use and time spent waiting
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        stats = self.stats = PoolStats()
+        # A recreated pool inherits the listeners and stats of the old one
+        if kwargs.get('_dispatch') is None:
+            event.listen(self, 'connect', lambda *args: stats.add('connects'))
+            event.listen(self, 'invalidate', lambda *args: stats.add('invalidations'))
+            event.listen(self, 'soft_invalidate', lambda *args: stats.add('soft_invalidations'))
+
+    def recreate(self):
+        # Keep counting across dispose() and invalidation-triggered recreates
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        overflow = self._overflow
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.add('timeouts')
+            raise
+        finally:
+            self.stats.observe_wait(time.perf_counter() - start)
+        self.stats.add('checkouts')
+        if self._overflow > overflow and self._overflow > 0:
+            self.stats.add('overflow_checkouts')
+        return connection
+
+    def _do_return_conn(self, record):
+        self.stats.add('checkins')
+        super()._do_return_conn(record)
+
+@collector
+def pool_metrics():
+    lines = []
+    for key, engine in db.engines.items():
+        pool = engine.pool
+        if not isinstance(pool, TimedQueuePool):
+            continue
+        label = f'engine="{key or "default"}"'
+        stats = pool.stats
+        gauges = {
+            'db_pool_size': pool.size(),
+            'db_pool_checked_out': pool.checkedout(),
+            'db_pool_checked_in': pool.checkedin(),
+            'db_pool_overflow': max(pool.overflow(), 0),
+            'db_pool_max_overflow': pool._max_overflow,
+            'db_pool_wait_seconds_max': stats.wait_seconds_max,
+        }
+        for name, value in gauges.items():
+            lines.append(f'{name}{{{label}}} {value}')
+        for name, value in stats.counters.items():
+            lines.append(f'db_pool_{name}_total{{{label}}} {value}')
+        lines.append(f'db_pool_wait_seconds_total{{{label}}} {stats.wait_seconds_total:.6f}')
+    return lines
+
+def check_token():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    check_token()
+    lines = []
+    for fn in collectors:
+        lines.extend(fn())
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+def init_app(app):
+    app.register_blueprint(metrics_bp)
@@ -0,0 +1,316 @@
+import sys
+import click
+from datetime import datetime
+from flask import Blueprint
+from sqlalchemy import (MetaData, Table, Column, Index, ForeignKey, Integer, String, Date,
+                        DateTime, Enum, inspect, text, table, column)
+from extensions import db, SCHEMA
+
+# Schema migrations. Each migration is a function registered in order with
+# @migration; applied versions are recorded in pharmacy_testing.schema_version.
+# The models in models.py mirror the result of the latest migration.
+#
+#   flask db upgrade
+#   flask db current
+#   flask db check-indexes
+
+migrations_bp = Blueprint('migrations', __name__, cli_group='db')
+
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+def head():
+    return MIGRATIONS[-1][0]
+
+# Helpers shared by migrations
+def has_table(conn, name):
+    return inspect(conn).has_table(name, schema=SCHEMA)
+
+def index_names(conn, table_name):
+    names = {index['name'] for index in inspect(conn).get_indexes(table_name, schema=SCHEMA)}
+    if conn.dialect.name == 'mysql':
+        # get_indexes() leaves out FULLTEXT indexes on some server versions
+        rows = conn.execute(text(
+            'SELECT DISTINCT index_name FROM information_schema.statistics '
+            'WHERE table_schema = :schema AND table_name = :table'
+        ), {'schema': SCHEMA, 'table': table_name})
+        names.update(row[0] for row in rows)
+    return names
+
+def create_index(conn, name, table_name, *columns, **kw):
+    # Skips indexes that already exist, e.g. on databases built from the old seed script
+    if name in index_names(conn, table_name):
+        return
+    target = Table(table_name, MetaData(), *(Column(c) for c in columns), schema=SCHEMA)
+    Index(name, *(target.c[c] for c in columns), **kw).create(conn)
+
+# Migrations
+@migration('0001', 'baseline schema')
+def baseline(conn):
+    # The schema as insert_create.sql used to create it; later migrations fix it up
+    metadata = MetaData(schema=SCHEMA)
+    Table('doctor', metadata,
+          Column('doctor_id', Integer, primary_key=True),
+          Column('name', String(30)),
+          Column('dob', Date))
+    Table('pharmacist', metadata,
+          Column('pharmacist_id', Integer, primary_key=True),
+          Column('name', String(30)),
+          Column('dob', Date))
+    Table('patient', metadata,
+          Column('patient_id', Integer, primary_key=True),
+          Column('name', String(30)),
+          Column('dob', Date),
+          Column('doctor_id', Integer, ForeignKey(f'{SCHEMA}.doctor.doctor_id')),
+          Column('primary_address', String(100)))
+    Table('user', metadata,
+          Column('user_id', Integer, primary_key=True),
+          Column('patient_id', Integer, ForeignKey(f'{SCHEMA}.patient.patient_id')),
+          Column('doctor_id', Integer, ForeignKey(f'{SCHEMA}.doctor.doctor_id')),
+          Column('pharmacist_id', Integer, ForeignKey(f'{SCHEMA}.pharmacist.pharmacist_id')),
+          Column('username', String(30), unique=True),
+          Column('upassword', String(80)),
+          Column('role', Enum('Patient', 'Doctor', 'Pharmacist')))
+    Table('patientHistory', metadata,
+          Column('patient_id', Integer, ForeignKey(f'{SCHEMA}.patient.patient_id'), primary_key=True,
+                 autoincrement=False),
+          Column('allergies', String(200)),
+          Column('family_history', String(200)),
+          Column('notes', String(200)))
+    Table('prescriptions', metadata,
+          Column('prescript_id', Integer, primary_key=True),
+          Column('patient_id', Integer, ForeignKey(f'{SCHEMA}.patient.patient_id')),
+          Column('doctor_id', Integer, ForeignKey(f'{SCHEMA}.doctor.doctor_id')),
+          Column('drug_id', Integer),
+          Column('dosage', Integer))
+    Table('drug', metadata,
+          Column('drug_id', Integer, unique=True),
+          Column('name', String(50)),
+          Column('common_ailment', String(200)))
+    Table('pharmacy', metadata,
+          Column('pharmacy_id', Integer, primary_key=True, autoincrement=False),
+          Column('address', String(100)),
+          Column('name', String(100)))
+    Table('orders', metadata,
+          Column('order_id', Integer, primary_key=True),
+          Column('request_date', Date),
+          Column('pharmacy_id', Integer, ForeignKey(f'{SCHEMA}.pharmacy.pharmacy_id')),
+          Column('patient_id', Integer, ForeignKey(f'{SCHEMA}.patient.patient_id')),
+          Column('prescript_id', Integer, ForeignKey(f'{SCHEMA}.prescriptions.prescript_id')),
+          Column('pharmacist_id', Integer, ForeignKey(f'{SCHEMA}.pharmacist.pharmacist_id')),
+          Column('status', Enum('Cancelled', 'Scheduled', 'Completed')))
+    metadata.create_all(conn)
+
+@migration('0002', 'primary key on drug')
+def drug_primary_key(conn):
+    if inspect(conn).get_pk_constraint('drug', schema=SCHEMA)['constrained_columns']:
+        return
+    if conn.dialect.name == 'sqlite':
+        # SQLite cannot add a primary key in place, so copy into a rebuilt table
+        conn.execute(text(
+            f'CREATE TABLE {SCHEMA}.drug_new (drug_id INTEGER NOT NULL PRIMARY KEY, '
+            f'name VARCHAR(50), common_ailment VARCHAR(200))'
+        ))
+        conn.execute(text(f'INSERT INTO {SCHEMA}.drug_new SELECT drug_id, name, common_ailment FROM {SCHEMA}.drug'))
+        conn.execute(text(f'DROP TABLE {SCHEMA}.drug'))
+        conn.execute(text(f'ALTER TABLE {SCHEMA}.drug_new RENAME TO drug'))
+    else:
+        conn.execute(text(f'ALTER TABLE {SCHEMA}.drug ADD PRIMARY KEY (drug_id)'))
+
+@migration('0003', 'indexes for patient lookups, the order queue and prescriptions by drug')
+def hot_path_indexes(conn):
+    create_index(conn, 'ix_patient_name', 'patient', 'name')
+    create_index(conn, 'ix_orders_status_request_date', 'orders', 'status', 'request_date')
+    create_index(conn, 'ix_orders_request_date', 'orders', 'request_date')
+    create_index(conn, 'ix_orders_patient_id', 'orders', 'patient_id')
+    create_index(conn, 'ix_prescriptions_drug_id', 'prescriptions', 'drug_id')
+
+@migration('0004', 'FULLTEXT indexes for /search')
+def fulltext_indexes(conn):
+    # MySQL only; other databases search through the in-process trigram index
+    if conn.dialect.name != 'mysql':
+        return
+    create_index(conn, 'ft_patient_name', 'patient', 'name', mysql_prefix='FULLTEXT')
+    create_index(conn, 'ft_doctor_name', 'doctor', 'name', mysql_prefix='FULLTEXT')
+    create_index(conn, 'ft_drug_name', 'drug', 'name', mysql_prefix='FULLTEXT')
+    create_index(conn, 'ft_drug_name_ailment', 'drug', 'name', 'common_ailment', mysql_prefix='FULLTEXT')
+
+@migration('0005', 'user column sizes match the model')
+def user_columns(conn):
+    # SQLite does not enforce VARCHAR lengths
+    if conn.dialect.name != 'mysql':
+        return
+    conn.execute(text(
+        f'ALTER TABLE {SCHEMA}.`user` MODIFY username VARCHAR(50) NOT NULL, '
+        f'MODIFY upassword VARCHAR(255) NOT NULL'
+    ))
+
+@migration('0006', 'order_stats summary table')
+def order_stats_table(conn):
+    Table('order_stats', MetaData(),
+          Column('scope', String(10), primary_key=True),
+          Column('scope_id', Integer, primary_key=True, autoincrement=False),
+          Column('status', String(10), primary_key=True),
+          Column('day', Date, primary_key=True),
+          Column('order_count', Integer, nullable=False, default=0),
+          schema=SCHEMA).create(conn, checkfirst=True)
+    # Backfill from the existing orders (orders_archive arrives in 0008)
+    from order_stats import rebuild
+    rebuild(conn, archived=False)
+
+@migration('0007', 'drug_terms for allergy screening')
+def drug_terms_table(conn):
+    metadata = MetaData()
+    # Only referenced, so the foreign key can resolve
+    Table('drug', metadata, Column('drug_id', Integer, primary_key=True), schema=SCHEMA)
+    Table('drug_terms', metadata,
+          Column('term_id', Integer, primary_key=True),
+          Column('drug_id', Integer, ForeignKey(f'{SCHEMA}.drug.drug_id'), nullable=False),
+          Column('term', String(100), nullable=False),
+          Column('kind', Enum('synonym', 'class', 'contraindication'), nullable=False),
+          schema=SCHEMA).create(conn, checkfirst=True)
+
+@migration('0008', 'orders_archive for archived order history')
+def orders_archive_table(conn):
+    archive = Table('orders_archive', MetaData(),
+                    Column('order_id', Integer, primary_key=True, autoincrement=False),
+                    Column('request_date', Date, primary_key=True),
+                    Column('pharmacy_id', Integer),
+                    Column('patient_id', Integer),
+                    Column('prescript_id', Integer),
+                    Column('pharmacist_id', Integer),
+                    Column('status', Enum('Cancelled', 'Scheduled', 'Completed')),
+                    schema=SCHEMA)
+    if has_table(conn, 'orders_archive'):
+        return
+    archive.create(conn)
+    create_index(conn, 'ix_orders_archive_patient_id', 'orders_archive', 'patient_id', 'request_date')
+    if conn.dialect.name == 'mysql':
+        # One partition per year; archive.py adds years as rows arrive
+        from archive import partition_table
+        partition_table(conn)
+
+@migration('0009', 'import_checkpoints for resumable bulk imports')
+def import_checkpoints_table(conn):
+    Table('import_checkpoints', MetaData(),
+          Column('job', String(200), primary_key=True),
+          Column('dataset', String(20), nullable=False),
+          Column('records', Integer, nullable=False, default=0),
+          Column('inserted', Integer, nullable=False, default=0),
+          Column('failed', Integer, nullable=False, default=0),
+          Column('updated_at', DateTime),
+          schema=SCHEMA).create(conn, checkfirst=True)
+
+@migration('0010', 'prescript_id indexes on orders and orders_archive')
+def prescript_id_indexes(conn):
+    # The doctor dashboard checks each prescription for an order in both
+    # tables. On MySQL the new index replaces the one behind the foreign key.
+    create_index(conn, 'ix_orders_prescript_id', 'orders', 'prescript_id')
+    create_index(conn, 'ix_orders_archive_prescript_id', 'orders_archive', 'prescript_id')
+
+# Runner
+SCHEMA_VERSION = table('schema_version', column('version'), column('description'), column('applied_at'),
+                       schema=SCHEMA)
+
+def ensure_version_table(conn):
+    Table('schema_version', MetaData(),
+          Column('version', String(32), primary_key=True),
+          Column('description', String(200)),
+          Column('applied_at', DateTime),
+          schema=SCHEMA).create(conn, checkfirst=True)
+
+def applied_versions(conn):
+    if not has_table(conn, 'schema_version'):
+        return set()
+    return {row[0] for row in conn.execute(SCHEMA_VERSION.select().with_only_columns(SCHEMA_VERSION.c.version))}
+
+def current_version(conn):
+    versions = applied_versions(conn)
+    return max(versions) if versions else None
+
+def record(conn, version, description):
+    conn.execute(SCHEMA_VERSION.insert(), {
+        'version': version, 'description': description, 'applied_at': datetime.now(),
+    })
+
+def upgrade(engine, target=None):
+    # Each migration commits on its own; MySQL DDL cannot be rolled back anyway
+    applied = []
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+        if not done and has_table(conn, 'doctor'):
+            # Database built by the old seed script: adopt it as the baseline
+            ensure_version_table(conn)
+            record(conn, '0001', 'baseline schema (adopted)')
+            done = {'0001'}
+    for version, description, fn in MIGRATIONS:
+        if version in done:
+            continue
+        if target is not None and version > target:
+            break
+        with engine.begin() as conn:
+            ensure_version_table(conn)
+            fn(conn)
+            record(conn, version, description)
+        applied.append(version)
+    return applied
+
+def drop_all(engine):
+    # Drops every table in the schema, including ones the models no longer know about
+    with engine.begin() as conn:
+        if conn.dialect.name == 'mysql':
+            conn.execute(text('SET FOREIGN_KEY_CHECKS = 0'))
+        for name in inspect(conn).get_table_names(schema=SCHEMA):
+            conn.execute(text(f'DROP TABLE {SCHEMA}.{conn.dialect.identifier_preparer.quote(name)}'))
+        if conn.dialect.name == 'mysql':
+            conn.execute(text('SET FOREIGN_KEY_CHECKS = 1'))
+
+def model_index_drift(conn):
+    # Indexes declared on the models that the database does not have
+    missing = []
+    for model_table in db.metadata.sorted_tables:
+        if not has_table(conn, model_table.name):
+            missing.append(f'{model_table.name} (table)')
+            continue
+        existing = index_names(conn, model_table.name)
+        missing.extend(f'{model_table.name}.{index.name}' for index in model_table.indexes
+                       if index.name not in existing)
+    return missing
+
+# CLI
+@migrations_bp.cli.command('upgrade')
+@click.option('--to', 'target', help='Stop after this version.')
+def upgrade_command(target):
+    """Apply pending migrations."""
+    applied = upgrade(db.engine, target)
+    click.echo(f"Applied {', '.join(applied)}" if applied else 'Already up to date')
+
+@migrations_bp.cli.command('current')
+def current_command():
+    """Show the applied and pending migrations."""
+    with db.engine.connect() as conn:
+        done = applied_versions(conn)
+    for version, description, fn in MIGRATIONS:
+        click.echo(f"{'applied' if version in done else 'pending':<8} {version} {description}")
+
+@migrations_bp.cli.command('check-indexes')
+def check_indexes_command():
+    """EXPLAIN the hot queries and fail if any of them misses its index."""
+    from queries import check_query_plans
+    failures = 0
+    with db.engine.connect() as conn:
+        for name in model_index_drift(conn):
+            click.echo(f'MISSING  {name}')
+            failures += 1
+        for name, table_name, expected, used in check_query_plans(conn):
+            ok = used == expected
+            failures += not ok
+            click.echo(f"{'ok' if ok else 'FAIL':<8} {name}: {table_name} uses {used or 'a full scan'}"
+                       + ('' if ok else f' (expected {expected})'))
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,159 @@
+from extensions import db
+
+# DB Models
+class Doctor(db.Model):
+    __tablename__ = 'doctor'
+    __table_args__ = {'schema': 'pharmacy_testing'};
+    doctor_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(30))
+    dob = db.Column(db.Date)
+    
+    # Relationships
+    patients = db.relationship('Patient', backref='doctor', lazy=True)
+    prescriptions = db.relationship('Prescription', backref='doctor', lazy=True)
+
+class Pharmacist(db.Model):
+    __tablename__ = 'pharmacist'
+    __table_args__ = {'schema': 'pharmacy_testing'};
+    pharmacist_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(30))
+    dob = db.Column(db.Date)
+    
+    # Relationships
+    orders = db.relationship('Order', backref='pharmacist', lazy=True)
+
+class Patient(db.Model):
+    __tablename__ = 'patient'
+    __table_args__ = (
+        db.Index('ix_patient_name', 'name'),
+        {'schema': 'pharmacy_testing', 'extend_existing':True},
+    )
+    patient_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(30))
+    dob = db.Column(db.Date)
+    
+    doctor_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.doctor.doctor_id')) 
+    primary_address = db.Column(db.String(100))
+    
+    # Relationships
+    history = db.relationship('PatientHistory', backref='patient', uselist=False, lazy=True)
+    prescriptions = db.relationship('Prescription', backref='patient', lazy=True)
+    orders = db.relationship('Order', backref='patient', lazy=True)
+class User(db.Model):
+    __tablename__ = 'user'
+    __table_args__ = {'schema':'pharmacy_testing'}
+    user_id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.patient.patient_id'))
+    doctor_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.doctor.doctor_id'))  
+    pharmacist_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.pharmacist.pharmacist_id'))
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    upassword = db.Column(db.String(255), nullable=False)
+    role = db.Column(db.String(20), nullable=False)
+class PatientHistory(db.Model):
+    __tablename__ = 'patientHistory'
+    __table_args__ = {'schema': 'pharmacy_testing'};
+    patient_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.patient.patient_id'), primary_key=True)
+    allergies = db.Column(db.String(200))
+    family_history = db.Column(db.String(200))
+    notes = db.Column(db.String(200))
+
+class Prescription(db.Model):
+    __tablename__ = 'prescriptions'
+    __table_args__ = (
+        db.Index('ix_prescriptions_drug_id', 'drug_id'),
+        {'schema': 'pharmacy_testing'},
+    )
+    prescript_id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.patient.patient_id'))
+    doctor_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.doctor.doctor_id')) 
+    drug_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.drug.drug_id')) 
+    dosage = db.Column(db.Integer)
+    
+    # Relationships
+    drug = db.relationship('Drug', backref='prescriptions', lazy=True)
+    orders = db.relationship('Order', backref='prescription', lazy=True)
+
+class Drug(db.Model):
+    __tablename__ = 'drug'
+    __table_args__ = {'schema': 'pharmacy_testing'};
+    drug_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50))
+    common_ailment = db.Column(db.String(200))
+
+class DrugTerm(db.Model):
+    # Other names a drug is known by in free text: brand names, drug classes,
+    # and conditions it is contraindicated for; compiled by allergies.py
+    __tablename__ = 'drug_terms'
+    __table_args__ = {'schema': 'pharmacy_testing'}
+    term_id = db.Column(db.Integer, primary_key=True)
+    drug_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.drug.drug_id'), nullable=False)
+    term = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.Enum('synonym', 'class', 'contraindication'), nullable=False)
+
+class Pharmacy(db.Model):
+    __tablename__ = 'pharmacy'
+    __table_args__ = {'schema': 'pharmacy_testing'};
+    pharmacy_id = db.Column(db.Integer, primary_key=True)
+    address = db.Column(db.String(100))
+    name = db.Column(db.String(100))
+    
+    # Relationships
+    orders = db.relationship('Order', backref='pharmacy', lazy=True)
+
+class Order(db.Model):
+    __tablename__ = 'orders'
+    # Indexes are created by migrations.py; keep the two in step
+    __table_args__ = (
+        db.Index('ix_orders_status_request_date', 'status', 'request_date'),
+        db.Index('ix_orders_request_date', 'request_date'),
+        db.Index('ix_orders_patient_id', 'patient_id'),
+        db.Index('ix_orders_prescript_id', 'prescript_id'),
+        {'schema': 'pharmacy_testing'},
+    )
+    order_id = db.Column(db.Integer, primary_key=True)
+    request_date = db.Column(db.Date)
+    pharmacy_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.pharmacy.pharmacy_id'))
+    patient_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.patient.patient_id')) 
+    prescript_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.prescriptions.prescript_id'))
+    pharmacist_id = db.Column(db.Integer, db.ForeignKey('pharmacy_testing.pharmacist.pharmacist_id'))
+    status = db.Column(db.Enum('Cancelled', 'Scheduled', 'Completed'))
+
+class ArchivedOrder(db.Model):
+    # Old Completed/Cancelled orders moved out of orders by archive.py. Same
+    # columns; request_date is part of the key because MySQL partitions the
+    # table by it, which also rules out foreign keys.
+    __tablename__ = 'orders_archive'
+    __table_args__ = (
+        db.Index('ix_orders_archive_patient_id', 'patient_id', 'request_date'),
+        db.Index('ix_orders_archive_prescript_id', 'prescript_id'),
+        {'schema': 'pharmacy_testing'},
+    )
+    order_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    request_date = db.Column(db.Date, primary_key=True)
+    pharmacy_id = db.Column(db.Integer)
+    patient_id = db.Column(db.Integer)
+    prescript_id = db.Column(db.Integer)
+    pharmacist_id = db.Column(db.Integer)
+    status = db.Column(db.Enum('Cancelled', 'Scheduled', 'Completed'))
+
+class OrderStat(db.Model):
+    # Order counts per patient, pharmacy and pharmacist by status and request
+    # day; maintained by order_stats.py, never written directly
+    __tablename__ = 'order_stats'
+    __table_args__ = {'schema': 'pharmacy_testing'}
+    scope = db.Column(db.String(10), primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    status = db.Column(db.String(10), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ImportCheckpoint(db.Model):
+    # Progress of a bulk import (importer.py), committed with each chunk
+    __tablename__ = 'import_checkpoints'
+    __table_args__ = {'schema': 'pharmacy_testing'}
+    job = db.Column(db.String(200), primary_key=True)
+    dataset = db.Column(db.String(20), nullable=False)
+    records = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime)
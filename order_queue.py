@@ -0,0 +1,93 @@
+from flask import Blueprint, render_template, request, jsonify, abort
+from datetime import date
+from auth import login_required, role_required, current_actor
+from routing import replica_reads
+from models import Patient, PatientHistory
+import queries
+
+queue_bp = Blueprint('queue', __name__)
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Cursors are "<request_date>.<order_id>" of the last row on the previous page
+def encode_cursor(order):
+    request_date = order.request_date or date.min
+    return f'{request_date.isoformat()}.{order.order_id}'
+
+def decode_cursor(cursor):
+    try:
+        last_date, last_id = cursor.split('.')
+        return date.fromisoformat(last_date), int(last_id)
+    except ValueError:
+        abort(400, description='Invalid cursor')
+
+def load_queue_page(cursor=None, limit=PAGE_SIZE, pharmacy_id=None, pharmacist_id=None, include_unassigned=False):
+    after = decode_cursor(cursor) if cursor else None
+
+    # Fetch one extra row to know whether another page exists
+    rows = queries.queue_page_query(
+        after=after,
+        pharmacy_id=pharmacy_id,
+        pharmacist_id=pharmacist_id,
+        include_unassigned=include_unassigned
+    ).limit(limit + 1).all()
+
+    orders = rows[:limit]
+    next_cursor = encode_cursor(orders[-1]) if len(rows) > limit else None
+    return orders, next_cursor
+
+def page_args():
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+    pharmacist_id = request.args.get('pharmacist_id', type=int)
+    return {
+        'cursor': request.args.get('cursor') or None,
+        'limit': max(1, min(limit, MAX_PAGE_SIZE)),
+        'pharmacy_id': request.args.get('pharmacy_id', type=int),
+        # Defaults to the dashboard's view: the caller's orders plus unassigned ones
+        'pharmacist_id': pharmacist_id if pharmacist_id is not None else current_actor.person_id,
+        'include_unassigned': pharmacist_id is None,
+    }
+
+def order_to_dict(order):
+    prescription = order.prescription
+    return {
+        'order_id': order.order_id,
+        'request_date': order.request_date.isoformat() if order.request_date else None,
+        'pharmacy_id': order.pharmacy_id,
+        'pharmacist_id': order.pharmacist_id,
+        'patient': {
+            'patient_id': order.patient.patient_id,
+            'name': order.patient.name,
+        },
+        'drug': prescription.drug.name,
+        'dosage': prescription.dosage,
+        'doctor': prescription.doctor.name,
+    }
+
+@queue_bp.route('/pharmacist/queue')
+@login_required
+@role_required('Pharmacist')
+@replica_reads
+def queue_json():
+    orders, next_cursor = load_queue_page(**page_args())
+    return jsonify(orders=[order_to_dict(o) for o in orders], next_cursor=next_cursor)
+
+@queue_bp.route('/pharmacist/queue/rows')
+@login_required
+@role_required('Pharmacist')
+@replica_reads
+def queue_rows():
+    orders, next_cursor = load_queue_page(**page_args())
+    html = render_template('_queue_rows.html', pending_orders=orders)
+    return html, 200, {'X-Next-Cursor': next_cursor or ''}
+
+# History modals are loaded on demand instead of rendered once per queued order
+@queue_bp.route('/pharmacist/history/<int:patient_id>')
+@login_required
+@role_required('Pharmacist')
+@replica_reads
+def history_fragment(patient_id):
+    patient = Patient.query.get_or_404(patient_id)
+    history = PatientHistory.query.get(patient_id)
+    return render_template('_history_modal_body.html', patient=patient, history=history)
@@ -0,0 +1,178 @@
+import sys
+import click
+from collections import Counter
+from datetime import date
+from flask import Blueprint
+from sqlalchemy import select, func, literal, inspect
+from sqlalchemy.dialects import mysql, sqlite, postgresql
+from sqlalchemy.orm import Session
+from extensions import db, listen, on_commit
+from models import Order, OrderStat
+from archive import order_history
+
+# Materialized order statistics: order_stats holds one count per
+# (scope, scope_id, status, request day), for scopes patient, pharmacy and
+# pharmacist. Every change to an order adjusts those counts by upsert in the
+# same transaction, so dashboards read a handful of rows instead of scanning
+# orders. Unassigned pharmacy/pharmacist is scope_id 0; undated orders count
+# under UNDATED.
+#
+#   flask stats rebuild
+#   flask stats check [--fix]
+
+stats_bp = Blueprint('order_stats', __name__, cli_group='stats')
+
+STATS = OrderStat.__table__
+SCOPES = {
+    'patient': Order.patient_id,
+    'pharmacy': Order.pharmacy_id,
+    'pharmacist': Order.pharmacist_id,
+}
+UNASSIGNED = 0
+UNDATED = date(1970, 1, 1)
+FIELDS = ('patient_id', 'pharmacy_id', 'pharmacist_id', 'status', 'request_date')
+
+def stat_keys(state):
+    # state: an order's (patient_id, pharmacy_id, pharmacist_id, status, request_date)
+    values = dict(zip(FIELDS, state))
+    status = values['status'] or ''
+    day = values['request_date'] or UNDATED
+    return [(scope, values[column.key] or UNASSIGNED, status, day) for scope, column in SCOPES.items()]
+
+def track(session, changes):
+    # changes: iterable of (before, after) order states; None for an insert/delete
+    deltas = Counter()
+    for before, after in changes:
+        if before == after:
+            continue
+        if before is not None:
+            deltas.subtract(stat_keys(before))
+        if after is not None:
+            deltas.update(stat_keys(after))
+    upsert(session.connection(), deltas)
+    session.info.setdefault('order_stats_deltas', Counter()).update(deltas)
+
+def upsert(conn, deltas):
+    # Sorted so concurrent transactions lock rows in the same order
+    rows = [
+        {'scope': scope, 'scope_id': scope_id, 'status': status, 'day': day, 'order_count': n}
+        for (scope, scope_id, status, day), n in sorted(deltas.items()) if n
+    ]
+    if not rows:
+        return
+    if conn.dialect.name == 'mysql':
+        statement = mysql.insert(STATS)
+        statement = statement.on_duplicate_key_update(order_count=STATS.c.order_count + statement.inserted.order_count)
+    else:
+        statement = (postgresql if conn.dialect.name == 'postgresql' else sqlite).insert(STATS)
+        statement = statement.on_conflict_do_update(
+            index_elements=[column for column in STATS.primary_key.columns],
+            set_={'order_count': STATS.c.order_count + statement.excluded.order_count}
+        )
+    conn.execute(statement, rows)
+
+# Reads
+def status_counts(scope, scope_ids, day=None):
+    # {status: count} summed over scope_ids, over every day unless one is given
+    query = select(STATS.c.status, func.sum(STATS.c.order_count)).where(
+        STATS.c.scope == scope,
+        STATS.c.scope_id.in_(scope_ids)
+    ).group_by(STATS.c.status)
+    if day is not None:
+        query = query.where(STATS.c.day == day)
+    return Counter({status: int(n) for status, n in db.session.execute(query)})
+
+# Rebuild and reconcile
+def computed(scope, archived=True):
+    # Counts cover archived orders too, so archiving leaves them unchanged
+    orders = order_history() if archived else Order.__table__
+    column = orders.c[SCOPES[scope].key]
+    return select(
+        literal(scope).label('scope'),
+        func.coalesce(column, UNASSIGNED).label('scope_id'),
+        func.coalesce(orders.c.status, '').label('status'),
+        func.coalesce(orders.c.request_date, UNDATED).label('day'),
+        func.count().label('order_count'),
+    ).select_from(orders).group_by(func.coalesce(column, UNASSIGNED), func.coalesce(orders.c.status, ''),
+                                   func.coalesce(orders.c.request_date, UNDATED))
+
+def rebuild(conn, archived=True):
+    conn.execute(STATS.delete())
+    for scope in SCOPES:
+        conn.execute(STATS.insert().from_select(
+            ['scope', 'scope_id', 'status', 'day', 'order_count'], computed(scope, archived)
+        ))
+
+def check(conn):
+    # [(key, stored, actual)] for every count that disagrees with the orders table
+    def normalize(row):
+        day = row.day if isinstance(row.day, date) else date.fromisoformat(str(row.day))
+        return (row.scope, row.scope_id, row.status, day), int(row.order_count)
+
+    actual = dict(normalize(row) for scope in SCOPES for row in conn.execute(computed(scope)))
+    stored = dict(normalize(row) for row in conn.execute(STATS.select()) if row.order_count)
+    return [(key, stored.get(key, 0), actual.get(key, 0))
+            for key in sorted(set(actual) | set(stored)) if stored.get(key, 0) != actual.get(key, 0)]
+
+@stats_bp.cli.command('rebuild')
+def rebuild_command():
+    """Recompute order_stats from the orders table."""
+    with db.engine.begin() as conn:
+        rebuild(conn)
+        rows = conn.execute(select(func.count()).select_from(STATS)).scalar()
+    click.echo(f'Rebuilt order_stats: {rows} rows')
+
+@stats_bp.cli.command('check')
+@click.option('--fix', is_flag=True, help='Rebuild when counts have drifted.')
+def check_command(fix):
+    """Compare order_stats with the orders table."""
+    with db.engine.begin() as conn:
+        drift = check(conn)
+        for (scope, scope_id, status, day), stored, actual in drift[:50]:
+            click.echo(f'{scope} {scope_id} {status or "-"} {day}: stored {stored}, actual {actual}')
+        if drift and fix:
+            rebuild(conn)
+            click.echo(f'Fixed {len(drift)} counts')
+            return
+    click.echo(f'{len(drift)} counts drifted' if drift else 'order_stats is consistent')
+    if drift:
+        sys.exit(1)
+
+# Maintenance from ORM changes
+def order_state(order, committed=False):
+    if not committed:
+        return tuple(getattr(order, field) for field in FIELDS)
+    attrs = inspect(order).attrs
+    values = []
+    for field in FIELDS:
+        history = attrs[field].history
+        values.append(history.deleted[0] if history.deleted else
+                      history.unchanged[0] if history.unchanged else getattr(order, field))
+    return tuple(values)
+
+def _before_flush(session, flush_context, instances):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Order):
+            changes.append((None, order_state(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, Order) and session.is_modified(obj):
+            changes.append((order_state(obj, committed=True), order_state(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            changes.append((order_state(obj, committed=True), None))
+    if changes:
+        track(session, changes)
+
+# Committed deltas are handed to in-process subscribers (fn(session, deltas))
+subscribers = []
+
+def _committed(session, deltas):
+    for fn in subscribers:
+        fn(session, deltas)
+
+def init_app(app):
+    app.register_blueprint(stats_bp)
+    # Bulk ORM statements on orders don't flush; their callers use track()
+    listen(Session, 'before_flush', _before_flush)
+    on_commit('order_stats_deltas', _committed)
@@ -0,0 +1,186 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from flask import (Blueprint, g, request, jsonify, current_app, has_app_context,
+                   before_render_template, template_rendered)
+from sqlalchemy import event
+from config import env_bool, env_int
+from extensions import db
+import metrics
+
+# Opt-in per-request profiler (PROFILE_REQUESTS=true).
+# Counts SQL statements and database time per request, times template
+# rendering, adds a Server-Timing header, logs slow statements as JSON lines
+# and keeps a per-endpoint latency histogram for /metrics.
+
+profiler_bp = Blueprint('profiler', __name__)
+
+slow_log = logging.getLogger('pharmacy.slow_query')
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SLOWEST_PER_ENDPOINT = 5
+
+class EndpointStats:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.slowest = []  # min-heap of (duration_ms, statement)
+
+class Histograms:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def observe(self, endpoint, profile, total_seconds):
+        total_ms = total_seconds * 1000
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            for i, bound in enumerate(BUCKETS_MS):
+                if total_ms <= bound:
+                    stats.buckets[i] += 1
+            stats.count += 1
+            stats.total_seconds += total_seconds
+            stats.queries += profile['queries']
+            stats.db_seconds += profile['db_seconds']
+            stats.template_seconds += profile['template_seconds']
+            for entry in profile['slowest']:
+                if len(stats.slowest) < SLOWEST_PER_ENDPOINT:
+                    heapq.heappush(stats.slowest, entry)
+                else:
+                    heapq.heappushpop(stats.slowest, entry)
+
+histograms = Histograms()
+
+def current_profile():
+    # fanout tasks run in their own app context and share the request's profile
+    if has_app_context():
+        return g.get('_profile')
+    return None
+
+# SQL timing
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._profile_start = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._profile_start
+    profile = current_profile()
+    if profile is None:
+        return
+    duration_ms = elapsed * 1000
+    entry = (duration_ms, statement)
+    with profile['lock']:
+        profile['queries'] += 1
+        profile['db_seconds'] += elapsed
+        if len(profile['slowest']) < SLOWEST_PER_ENDPOINT:
+            heapq.heappush(profile['slowest'], entry)
+        else:
+            heapq.heappushpop(profile['slowest'], entry)
+
+    if duration_ms >= profile['slow_ms']:
+        slow_log.warning(json.dumps({
+            'endpoint': profile['endpoint'],
+            'method': profile['method'],
+            'path': profile['path'],
+            'duration_ms': round(duration_ms, 3),
+            'statement': statement,
+            'executemany': executemany,
+        }))
+
+# Template timing
+def on_before_render(app, template, context, **extra):
+    profile = current_profile()
+    if profile is not None:
+        profile['render_start'].append(time.perf_counter())
+
+def on_rendered(app, template, context, **extra):
+    profile = current_profile()
+    if profile is not None and profile['render_start']:
+        profile['template_seconds'] += time.perf_counter() - profile['render_start'].pop()
+
+# Request hooks
+def start_profile():
+    g._profile = {
+        'start': time.perf_counter(),
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'lock': threading.Lock(),
+        'queries': 0,
+        'db_seconds': 0.0,
+        'template_seconds': 0.0,
+        'render_start': [],
+        'slowest': [],
+        'slow_ms': current_app.config['SLOW_QUERY_MS'],
+    }
+
+def finish_profile(response):
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return response
+    total = time.perf_counter() - profile['start']
+    histograms.observe(request.endpoint or 'unknown', profile, total)
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={profile["db_seconds"] * 1000:.2f};desc="{profile["queries"]} queries", '
+        f'tpl;dur={profile["template_seconds"] * 1000:.2f}, '
+        f'total;dur={total * 1000:.2f}'
+    )
+    return response
+
+@metrics.collector
+def endpoint_metrics():
+    lines = []
+    with histograms._lock:
+        for endpoint, stats in sorted(histograms.endpoints.items()):
+            label = f'endpoint="{endpoint}"'
+            for bound, count in zip(BUCKETS_MS, stats.buckets):
+                lines.append(f'http_request_duration_seconds_bucket{{{label},le="{bound / 1000}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{label},le="+Inf"}} {stats.count}')
+            lines.append(f'http_request_duration_seconds_sum{{{label}}} {stats.total_seconds:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{label}}} {stats.count}')
+            lines.append(f'http_request_queries_total{{{label}}} {stats.queries}')
+            lines.append(f'http_request_db_seconds_total{{{label}}} {stats.db_seconds:.6f}')
+            lines.append(f'http_request_template_seconds_total{{{label}}} {stats.template_seconds:.6f}')
+    return lines
+
+@profiler_bp.route('/metrics/slow_queries')
+def slow_queries():
+    metrics.check_token()
+    with histograms._lock:
+        return jsonify({
+            endpoint: [
+                {'duration_ms': round(duration, 3), 'statement': statement}
+                for duration, statement in sorted(stats.slowest, reverse=True)
+            ]
+            for endpoint, stats in histograms.endpoints.items()
+        })
+
+def init_app(app):
+    app.config.setdefault('PROFILE_REQUESTS', env_bool('PROFILE_REQUESTS', False))
+    app.config.setdefault('SLOW_QUERY_MS', env_int('SLOW_QUERY_MS', 100))
+    app.config.setdefault('SLOW_QUERY_LOG', os.getenv('SLOW_QUERY_LOG'))
+    if not app.config['PROFILE_REQUESTS']:
+        return
+
+    log_path = app.config['SLOW_QUERY_LOG']
+    handler = logging.FileHandler(log_path) if log_path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_log.addHandler(handler)
+    slow_log.setLevel(logging.WARNING)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    before_render_template.connect(on_before_render, app)
+    template_rendered.connect(on_rendered, app)
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.register_blueprint(profiler_bp)
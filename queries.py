@@ -0,0 +1,255 @@
+import re
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy import event, func, select, case, true, union_all
+from sqlalchemy.orm import aliased, contains_eager, joinedload
+from extensions import db
+from models import Doctor, Patient, PatientHistory, Prescription, Drug, Order, ArchivedOrder
+from archive import order_exists
+
+# Shared query layer for the dashboard and search views.
+# Each view gets its rows together with everything its template touches, so
+# rendering never falls back to a lazy SELECT per row.
+
+# Upper bound on SQL statements per request, keyed by bench.run scenario
+# (the endpoint name, or close to it); bench.run fails any route that goes over
+ROUTE_QUERY_BUDGETS = {
+    'home': 4,
+    'doctor_dashboard': 7,
+    'patient_dashboard': 6,
+    'pharmacist_dashboard': 4,
+    'search': 6,
+    # Served from the trigram index; the allowance covers a request that rebuilds it
+    'typeahead': 4,
+    'patient_history_api': 2,
+    'pharmacist_queue': 2,
+    'pharmacist_queue_rows': 2,
+    'pharmacist_history': 3,
+    'process_batch': 4,
+    'prescription_batch': 6,
+}
+
+# Pharmacist queue
+def queue_page_query(after=None, pharmacy_id=None, pharmacist_id=None, include_unassigned=False):
+    # Keyset pagination on (request_date, order_id): each page seeks past the
+    # last row of the previous one, so deep pages cost the same as the first
+    query = db.session.query(Order).join(
+        Patient, Order.patient_id == Patient.patient_id
+    ).join(
+        Prescription, Order.prescript_id == Prescription.prescript_id
+    ).join(
+        Drug, Prescription.drug_id == Drug.drug_id
+    ).join(
+        Doctor, Prescription.doctor_id == Doctor.doctor_id
+    ).options(
+        contains_eager(Order.patient),
+        contains_eager(Order.prescription).contains_eager(Prescription.drug),
+        contains_eager(Order.prescription).contains_eager(Prescription.doctor),
+    ).filter(
+        Order.status == 'Scheduled'
+    )
+
+    if pharmacy_id is not None:
+        query = query.filter(Order.pharmacy_id == pharmacy_id)
+    if pharmacist_id is not None and include_unassigned:
+        query = query.filter(db.or_(Order.pharmacist_id == pharmacist_id, Order.pharmacist_id.is_(None)))
+    elif pharmacist_id is not None:
+        query = query.filter(Order.pharmacist_id == pharmacist_id)
+
+    if after is not None:
+        last_date, last_id = after
+        query = query.filter(db.or_(
+            Order.request_date > last_date,
+            db.and_(Order.request_date == last_date, Order.order_id > last_id)
+        ))
+
+    return query.order_by(Order.request_date, Order.order_id)
+
+# Doctor dashboard
+def doctor_patients_query(doctor_id):
+    return db.session.query(Patient).outerjoin(
+        PatientHistory, Patient.patient_id == PatientHistory.patient_id
+    ).options(
+        contains_eager(Patient.history)
+    ).filter(Patient.doctor_id == doctor_id)
+
+def doctor_prescriptions_query(doctor_id):
+    # (prescription, has_order) rows; archived orders count as filled too
+    has_order = order_exists(lambda source: [source.c.prescript_id == Prescription.prescript_id])
+    return db.session.query(Prescription, has_order.label('has_order')).options(
+        joinedload(Prescription.patient),
+        joinedload(Prescription.drug),
+    ).filter(Prescription.doctor_id == doctor_id)
+
+# Patient dashboard
+def patient_prescriptions_query(patient_id):
+    return db.session.query(Prescription).join(
+        Drug, Prescription.drug_id == Drug.drug_id
+    ).options(
+        contains_eager(Prescription.drug),
+        joinedload(Prescription.doctor),
+    ).filter(Prescription.patient_id == patient_id)
+
+def recent_orders_query(patient_id, limit=5):
+    # Across orders and orders_archive. Each side takes its newest rows on its
+    # own patient index first; archived rows load as read-only Order objects.
+    newest = [
+        select(*source.c).where(source.c.patient_id == patient_id)
+        .order_by(source.c.request_date.desc()).limit(limit).subquery()
+        for source in (Order.__table__, ArchivedOrder.__table__)
+    ]
+    history = aliased(Order, union_all(*(select(*side.c) for side in newest)).subquery('orders'))
+    return db.session.query(history).join(
+        Prescription, history.prescript_id == Prescription.prescript_id
+    ).join(
+        Drug, Prescription.drug_id == Drug.drug_id
+    ).options(
+        contains_eager(history.prescription).contains_eager(Prescription.drug)
+    ).order_by(history.request_date.desc()).limit(limit)
+
+# Search
+def search_patients_query(criteria):
+    return Patient.query.options(joinedload(Patient.doctor)).filter(criteria)
+
+def search_prescriptions_query(criteria):
+    return db.session.query(Prescription).join(
+        Patient, Prescription.patient_id == Patient.patient_id
+    ).join(
+        Drug, Prescription.drug_id == Drug.drug_id
+    ).options(
+        contains_eager(Prescription.patient),
+        contains_eager(Prescription.drug),
+        joinedload(Prescription.doctor),
+    ).filter(criteria)
+
+def patient_counts(doctor_ids):
+    # One grouped COUNT instead of loading every patient to take len()
+    if not doctor_ids:
+        return {}
+    rows = db.session.query(
+        Patient.doctor_id, func.count(Patient.patient_id)
+    ).filter(
+        Patient.doctor_id.in_(doctor_ids)
+    ).group_by(Patient.doctor_id).all()
+    return dict(rows)
+
+# Page versions for conditional GET
+# Each returns one row of aggregates that changes whenever the page's rows do:
+# counts and max ids catch inserts and deletes, per-status and dosage sums
+# catch the updates the app makes.
+def status_sums(*statuses):
+    return [func.sum(case((Order.status == status, 1), else_=0)) for status in statuses]
+
+def aggregate_version(*selects):
+    # One round trip: the single-row aggregates are cross joined
+    subqueries = [statement.subquery() for statement in selects]
+    joined = subqueries[0]
+    for subquery in subqueries[1:]:
+        joined = joined.join(subquery, true())
+    return tuple(db.session.execute(select(*subqueries).select_from(joined)).one())
+
+def patient_dashboard_version(patient_id):
+    return aggregate_version(
+        select(func.count(), func.max(Order.order_id), *status_sums('Completed', 'Cancelled'))
+        .select_from(Order).where(Order.patient_id == patient_id),
+        select(func.count(), func.max(Prescription.prescript_id), func.sum(Prescription.dosage))
+        .select_from(Prescription).where(Prescription.patient_id == patient_id),
+    )
+
+def pharmacist_dashboard_version(pharmacist_id, today):
+    mine_or_unassigned = db.or_(Order.pharmacist_id == pharmacist_id, Order.pharmacist_id.is_(None))
+    return aggregate_version(
+        select(func.count(), func.max(Order.order_id))
+        .select_from(Order).where(Order.status == 'Scheduled', mine_or_unassigned),
+        select(func.count())
+        .select_from(Order).where(Order.status == 'Completed', Order.request_date == today, Order.pharmacist_id == pharmacist_id),
+    )
+
+def prescriptions_version(patient_name):
+    return aggregate_version(
+        select(func.count(), func.max(Prescription.prescript_id), func.sum(Prescription.dosage))
+        .select_from(Prescription).join(Patient, Prescription.patient_id == Patient.patient_id)
+        .where(Patient.name == patient_name),
+    )
+
+# Statement counting for tests
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+@contextmanager
+def count_queries(engine=None):
+    engine = engine or db.engine
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def assert_query_budget(endpoint, counter):
+    budget = ROUTE_QUERY_BUDGETS[endpoint]
+    if counter.count > budget:
+        raise AssertionError(
+            f'{endpoint} ran {counter.count} queries (budget {budget}):\n'
+            + '\n'.join(counter.statements)
+        )
+
+# Query plans for `flask db check-indexes`
+# (name, table, expected index, statement builder)
+HOT_QUERIES = [
+    ('patient_by_name', 'patient', 'ix_patient_name',
+     lambda: select(Patient).where(Patient.name == 'Jane Doe')),
+    ('pharmacist_queue', 'orders', 'ix_orders_status_request_date',
+     lambda: queue_page_query().limit(50).statement),
+    ('completed_today', 'orders', 'ix_orders_status_request_date',
+     lambda: select(func.count(Order.order_id)).where(
+         Order.status == 'Completed', Order.request_date == date.today())),
+    ('orders_since', 'orders', 'ix_orders_request_date',
+     lambda: select(Order.order_id).where(Order.request_date >= date.today())),
+    ('patient_orders', 'orders', 'ix_orders_patient_id',
+     lambda: recent_orders_query(1).statement),
+    ('archived_patient_orders', 'orders_archive', 'ix_orders_archive_patient_id',
+     lambda: recent_orders_query(1).statement),
+    ('prescription_filled', 'orders', 'ix_orders_prescript_id',
+     lambda: doctor_prescriptions_query(1).statement),
+    ('archived_prescription_filled', 'orders_archive', 'ix_orders_archive_prescript_id',
+     lambda: doctor_prescriptions_query(1).statement),
+    ('prescriptions_by_drug', 'prescriptions', 'ix_prescriptions_drug_id',
+     lambda: select(Prescription).where(Prescription.drug_id == 1)),
+    ('drug_by_id', 'drug', 'PRIMARY',
+     lambda: select(Drug).where(Drug.drug_id == 1)),
+]
+
+SQLITE_PLAN = re.compile(r'^(?:SCAN|SEARCH) (?:\w+\.)?(\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+)| USING (?:INTEGER )?(PRIMARY) KEY)?')
+
+def explain(conn, statement):
+    # Returns {table: index used or None for a full scan}
+    sql = statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}).string
+    used = {}
+    if conn.dialect.name == 'sqlite':
+        for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql):
+            match = SQLITE_PLAN.match(row[-1])
+            if match:
+                used.setdefault(match.group(1), match.group(2) or match.group(3))
+    else:
+        for row in conn.exec_driver_sql('EXPLAIN ' + sql).mappings():
+            used.setdefault(row['table'], None if row['type'] == 'ALL' else row['key'])
+    return used
+
+def check_query_plans(conn):
+    # MySQL only prefers an index once a table holds a realistic number of
+    # rows, so run this against bench data or a copy of production
+    results = []
+    for name, table_name, expected, build in HOT_QUERIES:
+        used = explain(conn, build())
+        results.append((name, table_name, expected, used.get(table_name)))
+    return results
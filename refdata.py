@@ -0,0 +1,163 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from flask import Blueprint, request, jsonify
+from sqlalchemy.orm import Session, object_session
+from extensions import db, listen, on_commit
+from routing import primary
+from models import Drug, DrugTerm, Pharmacy, Doctor, Pharmacist
+
+# Reference data (drug catalog and drug terms, pharmacies, doctors,
+# pharmacists) cached in process as immutable snapshots of plain tuples. Each
+# dataset has a version counter that model writes bump after commit; a
+# snapshot is reloaded when its version is stale or it is older than
+# REFDATA_MAX_AGE, which bounds how long another worker's writes stay invisible.
+
+refdata_bp = Blueprint('refdata', __name__)
+
+DrugRecord = namedtuple('DrugRecord', 'drug_id name common_ailment')
+PharmacyRecord = namedtuple('PharmacyRecord', 'pharmacy_id name address')
+DoctorRecord = namedtuple('DoctorRecord', 'doctor_id name dob')
+PharmacistRecord = namedtuple('PharmacistRecord', 'pharmacist_id name')
+DrugTermRecord = namedtuple('DrugTermRecord', 'term_id drug_id term kind')
+
+# name -> (model, record type, columns in record order)
+DATASETS = {
+    'drugs': (Drug, DrugRecord, (Drug.drug_id, Drug.name, Drug.common_ailment)),
+    'pharmacies': (Pharmacy, PharmacyRecord, (Pharmacy.pharmacy_id, Pharmacy.name, Pharmacy.address)),
+    'doctors': (Doctor, DoctorRecord, (Doctor.doctor_id, Doctor.name, Doctor.dob)),
+    'pharmacists': (Pharmacist, PharmacistRecord, (Pharmacist.pharmacist_id, Pharmacist.name)),
+    'drug_terms': (DrugTerm, DrugTermRecord, (DrugTerm.term_id, DrugTerm.drug_id, DrugTerm.term, DrugTerm.kind)),
+}
+MODEL_DATASETS = {model: name for name, (model, _, _) in DATASETS.items()}
+
+class Snapshot:
+    __slots__ = ('name', 'version', 'loaded_at', 'items', 'by_id', 'etag')
+
+    def __init__(self, name, version, items):
+        self.name = name
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.items = tuple(items)
+        self.by_id = MappingProxyType({item[0]: item for item in self.items})
+        self.etag = hashlib.sha1(repr(self.items).encode()).hexdigest()[:16]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, item_id):
+        return self.by_id.get(item_id)
+
+    def first(self):
+        return self.items[0] if self.items else None
+
+class RefDataCache:
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self.versions = dict.fromkeys(DATASETS, 0)
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        snapshot = self._snapshots.get(name)
+        if (snapshot is not None and snapshot.version == self.versions[name]
+                and time.monotonic() - snapshot.loaded_at <= self.max_age):
+            return snapshot
+        return self.load(name)
+
+    def load(self, name):
+        _, record, columns = DATASETS[name]
+        version = self.versions[name]
+        with primary():
+            rows = db.session.query(*columns).order_by(columns[0]).all()
+        snapshot = Snapshot(name, version, (record(*row) for row in rows))
+        with self._lock:
+            # A write committed while loading already bumped the version; keep it stale
+            if self.versions[name] == version:
+                self._snapshots[name] = snapshot
+        return snapshot
+
+    def bump(self, *names):
+        with self._lock:
+            for name in names:
+                self.versions[name] += 1
+
+    def etag(self, *names):
+        # Combined content hash of several datasets
+        parts = ':'.join(self.get(name).etag for name in sorted(names or DATASETS))
+        return hashlib.sha1(parts.encode()).hexdigest()[:16]
+
+cache = RefDataCache()
+
+def drugs():
+    return cache.get('drugs')
+
+def pharmacies():
+    return cache.get('pharmacies')
+
+def doctors():
+    return cache.get('doctors')
+
+def pharmacists():
+    return cache.get('pharmacists')
+
+def drug_terms():
+    return cache.get('drug_terms')
+
+def etag(*names):
+    return cache.etag(*names)
+
+def invalidate(*names):
+    cache.bump(*(names or DATASETS))
+
+# JSON endpoints
+def snapshot_response(snapshot):
+    if snapshot.etag in request.if_none_match:
+        return '', 304, {'ETag': f'"{snapshot.etag}"'}
+    response = jsonify([item._asdict() for item in snapshot])
+    response.set_etag(snapshot.etag)
+    return response
+
+@refdata_bp.route('/api/drugs')
+def drug_catalog():
+    return snapshot_response(drugs())
+
+@refdata_bp.route('/api/pharmacies')
+def pharmacy_list():
+    return snapshot_response(pharmacies())
+
+# Version bumps
+def _mark(session, name):
+    session.info.setdefault('refdata', set()).add(name)
+
+def _mark_target(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _mark(session, MODEL_DATASETS[mapper.class_])
+
+def _mark_bulk(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in MODEL_DATASETS:
+            _mark(orm_execute_state.session, MODEL_DATASETS[mapper.class_])
+
+def _committed(session, names):
+    cache.bump(*names)
+
+def init_app(app):
+    global cache
+    app.config.setdefault('REFDATA_MAX_AGE', int(os.getenv('REFDATA_MAX_AGE', 300)))
+    cache = RefDataCache(max_age=app.config['REFDATA_MAX_AGE'])
+    app.register_blueprint(refdata_bp)
+
+    for model in MODEL_DATASETS:
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            listen(model, name, _mark_target)
+    listen(Session, 'do_orm_execute', _mark_bulk)
+    on_commit('refdata', _committed)
@@ -1,50 +1,222 @@
-from flask import Flask, redirect, url_for, flash, Blueprint
-from flask_sqlalchemy import SQLAlchemy
-from dotenv import load_dotenv
 import os
-from sqlalchemy import text
-from extensions import db
+import re
+import threading
+import time
+import click
+from flask import current_app, redirect, url_for, flash, Blueprint
+from sqlalchemy import text, table, column
+from extensions import db, SCHEMA
+import migrations
+import order_stats
 
-load_dotenv()
+reset_bp = Blueprint('reset', __name__, cli_group=None)
 
-reset_bp = Blueprint('reset', __name__)
+SEED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'insert_create.sql')
+
+# Tables in dependency order; cleared in reverse
+TABLES = ['doctor', 'pharmacist', 'patient', 'user', 'patientHistory',
+          'drug', 'drug_terms', 'pharmacy', 'prescriptions', 'orders', 'orders_archive',
+          'import_checkpoints']
+
+# Statement splitter
+def split_statements(sql):
+    # Splits on ';' outside of quotes and comments, dropping the comments
+    statements = []
+    current = []
+    i = 0
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if char in ('"', "'", '`'):
+            end = i + 1
+            while end < length:
+                if sql[end] == '\\' and char != '`':
+                    end += 2
+                    continue
+                if sql[end] == char:
+                    # A doubled quote is an escaped quote
+                    if end + 1 < length and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+        elif sql.startswith('--', i) or char == '#':
+            end = sql.find('\n', i)
+            i = length if end == -1 else end
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+# INSERT parsing
+INSERT_HEADER = re.compile(r'^INSERT\s+INTO\s+`?(\w+)`?\s*\(([^)]*)\)\s*VALUES\s*', re.IGNORECASE)
+VALUE_TOKEN = re.compile(r"""\s*(?:
+    '((?:[^'\\]|\\.|'')*)'        # quoted string
+  | (-?\d+\.\d+)                  # decimal
+  | (-?\d+)                       # integer
+  | (NULL|TRUE|FALSE)             # keywords
+  | ([(),])                       # punctuation
+)""", re.IGNORECASE | re.VERBOSE)
+
+def unquote(value):
+    return re.sub(r"\\(.)", r'\1', value.replace("''", "'"))
+
+def parse_insert(statement):
+    header = INSERT_HEADER.match(statement)
+    if not header:
+        return None
+    table_name = header.group(1)
+    columns = [name.strip().strip('`') for name in header.group(2).split(',')]
+
+    rows = []
+    row = None
+    position = header.end()
+    while position < len(statement):
+        token = VALUE_TOKEN.match(statement, position)
+        if not token:
+            if statement[position:].strip():
+                raise ValueError(f'Cannot parse VALUES near: {statement[position:position + 40]!r}')
+            break
+        position = token.end()
+        string, decimal, integer, keyword, punct = token.groups()
+        if punct == '(':
+            row = []
+        elif punct == ')':
+            if len(row) != len(columns):
+                raise ValueError(f'{table_name}: expected {len(columns)} values, got {len(row)}')
+            rows.append(dict(zip(columns, row)))
+            row = None
+        elif punct == ',':
+            continue
+        elif string is not None:
+            row.append(unquote(string))
+        elif decimal is not None:
+            row.append(float(decimal))
+        elif integer is not None:
+            row.append(int(integer))
+        else:
+            row.append({'NULL': None, 'TRUE': True, 'FALSE': False}[keyword.upper()])
+    return table_name, columns, rows
+
+class SeedPlan:
+    def __init__(self, path):
+        with open(path) as f:
+            sql = f.read()
+        self.inserts = []  # (table, columns, rows)
+        for statement in split_statements(sql):
+            parsed = parse_insert(statement)
+            if parsed:
+                self.inserts.append(parsed)
+            elif not statement.upper().startswith('USE '):
+                raise ValueError(f'Seed scripts only hold INSERTs; schema changes belong in migrations.py: {statement[:60]!r}')
+        self.row_count = sum(len(rows) for _, _, rows in self.inserts)
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+def load_plan(path=SEED_FILE):
+    # Parsed once and reused until the file changes
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _plans_lock:
+        cached = _plans.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        plan = SeedPlan(path)
+        _plans[path] = (key, plan)
+        return plan
+
+# Seed engine
+def set_foreign_keys(conn, enabled):
+    if conn.dialect.name == 'mysql':
+        conn.execute(text(f'SET FOREIGN_KEY_CHECKS = {1 if enabled else 0}'))
+
+def clear_tables(conn):
+    # DELETE rather than TRUNCATE: MySQL commits a TRUNCATE implicitly, which would
+    # leave the tables empty if the reload failed. The seed tables are small.
+    for name in reversed(TABLES):
+        conn.execute(table(name, schema=SCHEMA).delete())
+
+def load_rows(conn, plan):
+    for table_name, columns, rows in plan.inserts:
+        target = table(table_name, *(column(name) for name in columns), schema=SCHEMA)
+        conn.execute(target.insert(), rows)
+
+def reset_database(path=SEED_FILE, full=False):
+    timings = {}
+    start = time.perf_counter()
+    plan = load_plan(path)
+    timings['parse_ms'] = (time.perf_counter() - start) * 1000
+
+    step = time.perf_counter()
+    with db.engine.connect() as conn:
+        up_to_date = migrations.current_version(conn) == migrations.head()
+    # Schema already at the latest migration: keep the tables, reload the rows
+    if up_to_date and not full:
+        timings['mode'] = 'reload'
+    else:
+        migrations.drop_all(db.engine)
+        migrations.upgrade(db.engine)
+        timings['mode'] = 'rebuild'
+
+    with db.engine.begin() as conn:
+        set_foreign_keys(conn, False)
+        if timings['mode'] == 'reload':
+            clear_tables(conn)
+        timings['schema_ms'] = (time.perf_counter() - step) * 1000
+
+        step = time.perf_counter()
+        load_rows(conn, plan)
+        # The seed rows bypass the ORM hooks that maintain the summary table
+        order_stats.rebuild(conn)
+        timings['load_ms'] = (time.perf_counter() - step) * 1000
+        set_foreign_keys(conn, True)
+
+    # Bulk loads skip the model events, so drop derived caches explicitly
+    import counters
+    import refdata
+    import search
+    counters.invalidate(*counters.MODEL_TAGS.values())
+    refdata.invalidate()
+    search.invalidate()
+
+    timings['rows'] = plan.row_count
+    timings['total_ms'] = (time.perf_counter() - start) * 1000
+    return timings
 
 @reset_bp.route('/reset_demo', methods=['POST'])
 def reset_demo():
     try:
-        # Read the SQL file
-        with open('insert_create.sql', 'r') as f:
-            sql_commands = f.read()
-
-        with db.engine.begin() as conn:
-            # Disable foreign key checks
-            conn.execute(text('SET FOREIGN_KEY_CHECKS = 0'))
-            
-            # Drop all tables if they exist
-            tables_to_drop = ['orders', 'prescriptions', 'patienthistory', 'user', 
-                            'patient', 'pharmacy', 'drug', 'pharmacist', 'doctor']
-            for table in tables_to_drop:
-                conn.execute(text(f'DROP TABLE IF EXISTS pharmacy_testing.{table}'))
-            
-            # Re-enable foreign key checks
-            conn.execute(text('SET FOREIGN_KEY_CHECKS = 1'))
-            
-            # Execute all CREATE and INSERT commands from your SQL file
-            for cmd in sql_commands.split(';'):
-                cmd = cmd.strip()
-                if cmd and not cmd.upper().startswith('USE'):  # Skip USE statement
-                    try:
-                        conn.execute(text(cmd))
-                    except Exception as e:
-                        print(f"Error executing command: {cmd[:50]}...")
-                        print(f"Error: {e}")
-        
-        # IMPORTANT: Tell SQLAlchemy to refresh its metadata
-        db.reflect()
-        
-        flash("Demo database has been reset!", "success")
+        timings = reset_database()
+        flash(f"Demo database has been reset! ({timings['rows']} rows in {timings['total_ms']:.0f} ms)", "success")
     except Exception as e:
         flash(f"Error resetting demo database: {str(e)}", "danger")
-        print(f"Full error: {e}")
+        current_app.logger.exception("Demo database reset failed")
+
+    return redirect(url_for('home'))
+
+@reset_bp.cli.command('reset-db')
+@click.option('--full', is_flag=True, help='Drop the tables and rerun every migration.')
+@click.option('--file', 'path', default=SEED_FILE, show_default=True, help='Seed script to load.')
+def reset_db_command(full, path):
+    """Reset the database from the seed script."""
+    timings = reset_database(path, full=full)
+    click.echo(
+        f"{timings['mode']}: {timings['rows']} rows in {timings['total_ms']:.1f} ms "
+        f"(parse {timings['parse_ms']:.1f}, schema {timings['schema_ms']:.1f}, load {timings['load_ms']:.1f})"
+    )
 
-    return redirect(url_for('home'))
\ No newline at end of file
+if __name__ == '__main__':
+    from app import create_app
+    with create_app().app_context():
+        print(reset_database())
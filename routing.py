@@ -0,0 +1,80 @@
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, session, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+
+# Read/write splitting. Views decorated with @replica_reads send their plain
+# SELECTs to the 'replica' bind (REPLICA_DATABASE_URI); everything else, and
+# every statement once the session has flushed a write, goes to the primary.
+# After a commit the user's session is pinned to the primary for
+# READ_YOUR_WRITES_SECONDS so the redirect that follows sees its own writes.
+# Without a replica configured all of this is a no-op.
+
+REPLICA = 'replica'
+PIN_KEY = '_primary_until'
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        engines = self._db.engines
+        if (bind is None and REPLICA in engines and engine is engines.get(None)
+                and getattr(clause, 'is_select', False) and not self.info.get('wrote')
+                and has_app_context() and g.get('_read_replica')):
+            return engines[REPLICA]
+        return engine
+
+def pinned():
+    return session.get(PIN_KEY, 0) > time.time()
+
+def replica_reads(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g._read_replica = not pinned()
+        return f(*args, **kwargs)
+    return decorated_function
+
+@contextmanager
+def primary():
+    # For reads that feed a shared cache: a lagging replica would keep
+    # stale rows cached long after the invalidation that triggered the load
+    previous = g.get('_read_replica') if has_app_context() else None
+    if previous:
+        g._read_replica = False
+    try:
+        yield
+    finally:
+        if previous:
+            g._read_replica = previous
+
+def read_engine():
+    # For callers that open their own connection (exports, reports)
+    engines = current_app.extensions['sqlalchemy'].engines
+    return engines.get(REPLICA, engines[None])
+
+# Read-your-writes pin
+def _after_flush(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+def _bulk_write(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements don't flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+def _committed(db_session, wrote):
+    if not has_app_context():
+        return
+    # Reads for the rest of this request stay on the primary as well
+    g._read_replica = False
+    window = current_app.config['READ_YOUR_WRITES_SECONDS']
+    if has_request_context() and window and REPLICA in current_app.extensions['sqlalchemy'].engines:
+        session[PIN_KEY] = time.time() + window
+
+def init_app(app):
+    # extensions imports this module for RoutingSession
+    from extensions import listen, on_commit
+    app.config.setdefault('READ_YOUR_WRITES_SECONDS', float(os.getenv('READ_YOUR_WRITES_SECONDS', 5)))
+    listen(RoutingSession, 'after_flush', _after_flush)
+    listen(RoutingSession, 'do_orm_execute', _bulk_write)
+    on_commit('wrote', _committed)
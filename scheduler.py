@@ -0,0 +1,167 @@
+import heapq
+import os
+import threading
+import time
+from collections import Counter
+from flask import current_app
+from sqlalchemy import select, func
+from extensions import db, on_commit
+from models import OrderStat
+import order_stats
+import refdata
+
+# Assigns new orders to the least-loaded pharmacy and pharmacist. Load is the
+# number of open (Scheduled) orders, held in process in one min-heap per kind
+# and kept current from the order_stats deltas of every commit in this
+# process. Other workers' orders are folded in by a reconcile against
+# order_stats every SCHEDULER_RECONCILE_SECONDS. Until the first reconcile
+# succeeds (cold start, order_stats missing) orders go round-robin.
+
+class LoadIndex:
+    # id -> load with O(log n) least-loaded lookups; stale heap entries are
+    # skipped when popped rather than removed on every update
+    def __init__(self, loads=None):
+        self.loads = dict(loads or {})
+        self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(load, member) for member, load in self.loads.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self.loads)
+
+    def least_loaded(self):
+        while self._heap:
+            load, member = self._heap[0]
+            if self.loads.get(member) == load:
+                return member
+            heapq.heappop(self._heap)
+        return None
+
+    def add(self, member, delta):
+        if member not in self.loads or not delta:
+            return
+        self.loads[member] = max(self.loads[member] + delta, 0)
+        heapq.heappush(self._heap, (self.loads[member], member))
+        if len(self._heap) > 4 * len(self.loads) + 64:
+            self._rebuild()
+
+    def take(self):
+        # Least-loaded member, charged one order
+        member = self.least_loaded()
+        if member is not None:
+            self.add(member, 1)
+        return member
+
+KINDS = {'pharmacy': refdata.pharmacies, 'pharmacist': refdata.pharmacists}
+
+class Scheduler:
+    def __init__(self, reconcile_seconds=30):
+        self.reconcile_seconds = reconcile_seconds
+        self.indexes = None
+        self.reconciled_at = None
+        self._turn = Counter()
+        self._lock = threading.Lock()
+        self._reconciling = threading.Lock()
+
+    def assign(self):
+        # -> (pharmacy_id, pharmacist_id)
+        self.maybe_reconcile()
+        with self._lock:
+            if self.indexes is not None:
+                return self.indexes['pharmacy'].take(), self.indexes['pharmacist'].take()
+        return self.round_robin('pharmacy'), self.round_robin('pharmacist')
+
+    def round_robin(self, kind):
+        members = KINDS[kind]()
+        if not len(members):
+            return None
+        with self._lock:
+            turn = self._turn[kind]
+            self._turn[kind] += 1
+        return members.items[turn % len(members)][0]
+
+    def maybe_reconcile(self):
+        due = self.reconciled_at is None or time.monotonic() - self.reconciled_at > self.reconcile_seconds
+        # One request reconciles; the rest keep using the current index
+        if due and self._reconciling.acquire(blocking=False):
+            try:
+                self.reconcile()
+            except Exception:
+                current_app.logger.exception('Scheduler reconcile failed; assigning round-robin')
+                self.reconciled_at = time.monotonic()
+            finally:
+                self._reconciling.release()
+
+    def reconcile(self):
+        members = {kind: [item[0] for item in accessor()] for kind, accessor in KINDS.items()}
+        # Own connection, so a failure cannot affect the caller's transaction
+        with db.engine.connect() as conn:
+            rows = conn.execute(select(
+                OrderStat.scope, OrderStat.scope_id, func.sum(OrderStat.order_count)
+            ).where(
+                OrderStat.scope.in_(list(KINDS)),
+                OrderStat.status == 'Scheduled'
+            ).group_by(OrderStat.scope, OrderStat.scope_id)).all()
+        open_orders = {(scope, scope_id): int(n) for scope, scope_id, n in rows}
+        indexes = {
+            kind: LoadIndex({member: open_orders.get((kind, member), 0) for member in ids})
+            for kind, ids in members.items()
+        }
+        with self._lock:
+            self.indexes = indexes
+            self.reconciled_at = time.monotonic()
+
+    def apply(self, changes):
+        # changes: {(kind, member id): change in open orders}
+        with self._lock:
+            if self.indexes is None:
+                return
+            for (kind, member), n in changes.items():
+                if kind in self.indexes:
+                    self.indexes[kind].add(member, n)
+
+    def release(self, reserved):
+        # Assignments that never became an order
+        self.apply({key: -n for key, n in reserved.items() if n})
+
+scheduler = Scheduler()
+
+def assign(session=None):
+    # Charged to the index right away so concurrent requests spread out; the
+    # order's own order_stats delta is skipped when it commits, and the charge
+    # is handed back if the transaction ends without it
+    session = session or db.session()
+    pharmacy_id, pharmacist_id = scheduler.assign()
+    reserved = session.info.setdefault('scheduler_reserved', Counter())
+    reserved['pharmacy', pharmacy_id] += 1
+    reserved['pharmacist', pharmacist_id] += 1
+    return pharmacy_id, pharmacist_id
+
+def _committed(session, deltas):
+    reserved = session.info.pop('scheduler_reserved', Counter())
+    applied = Counter()
+    for (scope, scope_id, status, _), n in deltas.items():
+        if status != 'Scheduled':
+            continue
+        if n > 0 and reserved[scope, scope_id]:
+            charged = min(n, reserved[scope, scope_id])
+            reserved[scope, scope_id] -= charged
+            n -= charged
+        applied[scope, scope_id] += n
+    scheduler.apply(applied)
+    scheduler.release(reserved)
+
+def _release(session, reserved):
+    scheduler.release(reserved)
+
+def init_app(app):
+    global scheduler
+    app.config.setdefault('SCHEDULER_RECONCILE_SECONDS', int(os.getenv('SCHEDULER_RECONCILE_SECONDS', 30)))
+    scheduler = Scheduler(reconcile_seconds=app.config['SCHEDULER_RECONCILE_SECONDS'])
+    if _committed not in order_stats.subscribers:
+        order_stats.subscribers.append(_committed)
+    # Registered after order_stats, so this only sees reservations that
+    # _committed left behind: nothing was ordered with them
+    on_commit('scheduler_reserved', _release, rollback=_release)
@@ -0,0 +1,378 @@
+import heapq
+import os
+import re
+import threading
+import time
+from array import array
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session, object_session
+from extensions import db, listen, on_commit
+from routing import primary, replica_reads
+from models import Doctor, Patient, Prescription, Drug
+
+# Search subsystem behind /search and /search/typeahead.
+# On MySQL the FULLTEXT indexes from migrations.py are queried directly.
+# Everywhere else an in-process trigram index is built on first use and kept
+# up to date from model write events, so no query needs a leading-wildcard LIKE.
+
+search_bp = Blueprint('search_api', __name__)
+
+ENTITIES = ('patients', 'doctors', 'drugs', 'prescriptions')
+PER_PAGE = 10
+TYPEAHEAD_LIMIT = 8
+
+_WORD_SEPARATORS = re.compile(r'[^\w]+')
+
+def normalize(text):
+    return ' '.join(_WORD_SEPARATORS.split((text or '').lower())).strip()
+
+def index_grams(text):
+    # Trigrams of the text with a leading space, so every word start is a gram,
+    # plus the two-character word prefixes used by one-letter queries
+    padded = ' ' + text
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    grams.update(' ' + word[0] for word in text.split(' ') if word)
+    return grams
+
+class TrigramIndex:
+    def __init__(self):
+        self.docs = {}      # id -> normalized text
+        self.labels = {}    # id -> original text, for typeahead
+        self.postings = {}  # gram -> array of ids, may hold stale ids
+        self._garbage = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id, label):
+        self.labels[doc_id] = label
+        text = normalize(label)
+        if self.docs.get(doc_id) == text:
+            return
+        if doc_id in self.docs:
+            self._garbage += 1
+        self.docs[doc_id] = text
+        for gram in index_grams(text):
+            self.postings.setdefault(gram, array('q')).append(doc_id)
+        if self._garbage > len(self.docs):
+            self.compact()
+
+    def remove(self, doc_id):
+        self.labels.pop(doc_id, None)
+        if self.docs.pop(doc_id, None) is not None:
+            self._garbage += 1
+
+    def compact(self):
+        self.postings = {}
+        for doc_id, text in self.docs.items():
+            for gram in index_grams(text):
+                self.postings.setdefault(gram, array('q')).append(doc_id)
+        self._garbage = 0
+
+    def match(self, query):
+        # Returns {id: rank}; lower ranks are better
+        query = normalize(query)
+        if not query:
+            return {}
+
+        if len(query) < 3:
+            # Short queries only match word prefixes
+            candidates = self.postings.get(' ' + query, ())
+        else:
+            lists = []
+            for i in range(len(query) - 2):
+                posting = self.postings.get(query[i:i + 3])
+                if posting is None:
+                    return {}
+                lists.append(posting)
+            candidates = min(lists, key=len)
+
+        matches = {}
+        for doc_id in set(candidates):
+            text = self.docs.get(doc_id)
+            if text is None or query not in text:
+                continue
+            if text == query:
+                tier = 0
+            elif text.startswith(query):
+                tier = 1
+            elif ' ' + query in text:
+                tier = 2
+            elif len(query) >= 3:
+                tier = 3
+            else:
+                continue
+            matches[doc_id] = (tier, len(text), doc_id)
+        return matches
+
+class SearchIndexes:
+    # One generation of the index; the engine swaps in a new one on rebuild
+    def __init__(self):
+        self.patients = TrigramIndex()
+        self.doctors = TrigramIndex()
+        self.drug_names = TrigramIndex()
+        self.drug_ailments = TrigramIndex()
+        self.prescription_refs = {}  # prescript_id -> (patient_id, drug_id)
+        self.by_patient = {}
+        self.by_drug = {}
+
+    def load(self):
+        for patient_id, name in db.session.query(Patient.patient_id, Patient.name):
+            self.patients.add(patient_id, name)
+        for doctor_id, name in db.session.query(Doctor.doctor_id, Doctor.name):
+            self.doctors.add(doctor_id, name)
+        for drug_id, name, ailment in db.session.query(Drug.drug_id, Drug.name, Drug.common_ailment):
+            self.drug_names.add(drug_id, name)
+            self.drug_ailments.add(drug_id, ailment)
+        for row in db.session.query(Prescription.prescript_id, Prescription.patient_id, Prescription.drug_id):
+            self._set_prescription(*row)
+
+    def apply(self, ops):
+        for op in ops:
+            kind, entity, doc_id = op[:3]
+            if entity == 'prescriptions':
+                self._remove_prescription(doc_id)
+                if kind == 'upsert':
+                    self._set_prescription(doc_id, *op[3:])
+            elif entity == 'drugs':
+                if kind == 'upsert':
+                    self.drug_names.add(doc_id, op[3])
+                    self.drug_ailments.add(doc_id, op[4])
+                else:
+                    self.drug_names.remove(doc_id)
+                    self.drug_ailments.remove(doc_id)
+            else:
+                index = getattr(self, entity)
+                if kind == 'upsert':
+                    index.add(doc_id, op[3])
+                else:
+                    index.remove(doc_id)
+
+    def _set_prescription(self, prescript_id, patient_id, drug_id):
+        self.prescription_refs[prescript_id] = (patient_id, drug_id)
+        self.by_patient.setdefault(patient_id, set()).add(prescript_id)
+        self.by_drug.setdefault(drug_id, set()).add(prescript_id)
+
+    def _remove_prescription(self, prescript_id):
+        refs = self.prescription_refs.pop(prescript_id, None)
+        if refs:
+            self.by_patient.get(refs[0], set()).discard(prescript_id)
+            self.by_drug.get(refs[1], set()).discard(prescript_id)
+
+class SearchEngine:
+    # Readers never lock: they take the current SearchIndexes and use it, so
+    # a rebuild (filled off to the side, then swapped in) never shows them a
+    # half-built index. Committed writes are applied under the lock, which
+    # makes them wait for a running rebuild and land in the new generation.
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self.indexes = SearchIndexes()
+        self.built_at = None         # when the current generation started loading
+        self.invalidated_at = None   # last write the incremental ops can't describe
+        self._lock = threading.RLock()
+
+    def stale(self):
+        # Other workers' writes are only seen after a rebuild, so bound the age
+        if self.built_at is None or time.monotonic() - self.built_at > self.max_age:
+            return True
+        return self.invalidated_at is not None and self.invalidated_at >= self.built_at
+
+    def ensure_built(self):
+        if self.stale():
+            with self._lock:
+                # Another thread may have rebuilt while this one waited
+                if self.stale():
+                    self.build()
+
+    def build(self):
+        with self._lock, primary():
+            started = time.monotonic()
+            indexes = SearchIndexes()
+            indexes.load()
+            self.indexes = indexes
+            self.built_at = started
+
+    def invalidate(self):
+        self.invalidated_at = time.monotonic()
+
+    def apply(self, ops):
+        with self._lock:
+            if self.built_at is not None:
+                self.indexes.apply(ops)
+
+    def ranked(self, entity, query):
+        self.ensure_built()
+        indexes = self.indexes
+        if entity == 'patients':
+            return indexes.patients.match(query)
+        if entity == 'doctors':
+            return indexes.doctors.match(query)
+        if entity == 'drugs':
+            # Name matches outrank ailment matches
+            matches = {
+                doc_id: (rank[0] + 4,) + rank[1:]
+                for doc_id, rank in indexes.drug_ailments.match(query).items()
+            }
+            matches.update(indexes.drug_names.match(query))
+            return matches
+        if entity == 'prescriptions':
+            matches = {}
+            for index, owners in ((indexes.patients, indexes.by_patient), (indexes.drug_names, indexes.by_drug)):
+                for owner_id, rank in index.match(query).items():
+                    # Copied: a commit may add to the set while this loop runs
+                    for prescript_id in tuple(owners.get(owner_id, ())):
+                        rank_for = rank[:2] + (prescript_id,)
+                        if prescript_id not in matches or rank_for < matches[prescript_id]:
+                            matches[prescript_id] = rank_for
+            return matches
+        raise ValueError(f'Unknown search entity: {entity}')
+
+    def search(self, entity, query, offset=0, limit=PER_PAGE):
+        matches = self.ranked(entity, query)
+        best = heapq.nsmallest(offset + limit, matches.items(), key=lambda item: item[1])
+        return [doc_id for doc_id, _ in best[offset:]], len(matches)
+
+    def names(self, entity, ids):
+        indexes = self.indexes
+        index = {'patients': indexes.patients, 'doctors': indexes.doctors, 'drugs': indexes.drug_names}[entity]
+        return [index.labels.get(doc_id) for doc_id in ids]
+
+engine = SearchEngine()
+
+# MySQL FULLTEXT backend
+FULLTEXT_COLUMNS = {
+    'patients': (Patient.patient_id, (Patient.name,)),
+    'doctors': (Doctor.doctor_id, (Doctor.name,)),
+    'drugs': (Drug.drug_id, (Drug.name, Drug.common_ailment)),
+}
+MIN_TOKEN_SIZE = 3
+
+def boolean_query(query):
+    # Every word must match, each as a prefix
+    words = [w for w in normalize(query).split(' ') if len(w) >= MIN_TOKEN_SIZE]
+    return ' '.join(f'+{w}*' for w in words)
+
+def fulltext_match(columns, query):
+    # Returns (criteria, score); short queries fall back to a prefix LIKE
+    against = boolean_query(query)
+    if not against:
+        return db.or_(*(column.startswith(query, autoescape=True) for column in columns)), None
+    score = mysql.match(*columns, against=against).in_boolean_mode()
+    return score, score
+
+def fulltext_search(entity, query, offset=0, limit=PER_PAGE):
+    if entity == 'prescriptions':
+        patient_criteria, _ = fulltext_match((Patient.name,), query)
+        drug_criteria, _ = fulltext_match((Drug.name,), query)
+        base = db.session.query(Prescription.prescript_id).filter(db.or_(
+            Prescription.patient_id.in_(db.select(Patient.patient_id).where(patient_criteria)),
+            Prescription.drug_id.in_(db.select(Drug.drug_id).where(drug_criteria))
+        ))
+        ordered = base.order_by(Prescription.prescript_id)
+    else:
+        id_column, columns = FULLTEXT_COLUMNS[entity]
+        criteria, score = fulltext_match(columns, query)
+        base = db.session.query(id_column).filter(criteria)
+        ordered = base.order_by(score.desc(), id_column) if score is not None else base.order_by(id_column)
+
+    total = base.count()
+    ids = [row[0] for row in ordered.offset(offset).limit(limit)]
+    return ids, total
+
+# Public API
+def backend():
+    configured = current_app.config['SEARCH_BACKEND']
+    if configured == 'auto':
+        return 'fulltext' if db.engine.dialect.name == 'mysql' else 'trigram'
+    return configured
+
+def search_ids(entity, query, page=1, per_page=PER_PAGE):
+    offset = (page - 1) * per_page
+    if backend() == 'fulltext':
+        return fulltext_search(entity, query, offset, per_page)
+    return engine.search(entity, query, offset, per_page)
+
+def typeahead(entity, query, limit=TYPEAHEAD_LIMIT):
+    if backend() == 'fulltext':
+        id_column, columns = FULLTEXT_COLUMNS[entity]
+        ids, _ = fulltext_search(entity, query, 0, limit)
+        rows = dict(db.session.query(id_column, columns[0]).filter(id_column.in_(ids)).all()) if ids else {}
+        return [{'id': doc_id, 'name': rows.get(doc_id)} for doc_id in ids]
+
+    # Served straight from the in-memory index, no database round trip
+    ids, _ = engine.search(entity, query, 0, limit)
+    return [{'id': doc_id, 'name': name} for doc_id, name in zip(ids, engine.names(entity, ids))]
+
+@search_bp.route('/search/typeahead')
+@replica_reads
+def typeahead_view():
+    query = request.args.get('q', '').strip()
+    types = request.args.get('types', 'patients,doctors,drugs').split(',')
+    limit = max(1, min(request.args.get('limit', TYPEAHEAD_LIMIT, type=int), 25))
+
+    unknown = [entity for entity in types if entity not in ('patients', 'doctors', 'drugs')]
+    if unknown:
+        return jsonify(error=f'Unknown type: {unknown[0]}'), 400
+    if not query:
+        return jsonify({entity: [] for entity in types})
+    return jsonify({entity: typeahead(entity, query, limit) for entity in types})
+
+# Incremental index maintenance
+def _op(target):
+    if isinstance(target, Patient):
+        return ('patients', target.patient_id, target.name)
+    if isinstance(target, Doctor):
+        return ('doctors', target.doctor_id, target.name)
+    if isinstance(target, Drug):
+        return ('drugs', target.drug_id, target.name, target.common_ailment)
+    return ('prescriptions', target.prescript_id, target.patient_id, target.drug_id)
+
+def _after_upsert(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('search_ops', []).append(('upsert',) + _op(target))
+
+def _after_delete(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('search_ops', []).append(('delete',) + _op(target)[:2])
+
+def track(session, ops):
+    # For bulk ORM statements, which fire no mapper events: the caller
+    # describes its rows as ('upsert', entity, id, ...) ops, applied on commit.
+    # Run the statement with execution_options(search_tracked=True).
+    session.info.setdefault('search_ops', []).extend(ops)
+
+def _committed(session, ops):
+    engine.apply(ops)
+
+def _bulk_write(orm_execute_state):
+    # Other bulk statements carry no objects to index, so rebuild once committed
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        if (mapper is not None and mapper.class_ in (Patient, Doctor, Drug, Prescription)
+                and not orm_execute_state.execution_options.get('search_tracked')):
+            orm_execute_state.session.info['search_stale'] = True
+
+def _stale_committed(session, stale):
+    engine.invalidate()
+
+def invalidate():
+    # For writes that bypass the ORM entirely (seed loads, raw SQL)
+    engine.invalidate()
+
+def init_app(app):
+    global engine
+    app.config.setdefault('SEARCH_BACKEND', os.getenv('SEARCH_BACKEND', 'auto'))
+    app.config.setdefault('SEARCH_INDEX_MAX_AGE', int(os.getenv('SEARCH_INDEX_MAX_AGE', 300)))
+    engine = SearchEngine(max_age=app.config['SEARCH_INDEX_MAX_AGE'])
+    app.register_blueprint(search_bp)
+
+    for model in (Patient, Doctor, Drug, Prescription):
+        listen(model, 'after_insert', _after_upsert)
+        listen(model, 'after_update', _after_upsert)
+        listen(model, 'after_delete', _after_delete)
+    listen(Session, 'do_orm_execute', _bulk_write)
+    on_commit('search_ops', _committed)
+    on_commit('search_stale', _stale_committed)
@@ -0,0 +1,49 @@
+import os
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy.pool import QueuePool
+from extensions import db
+import refdata
+import search
+
+# Worker startup costs. Compiled templates are kept in an on-disk bytecode
+# cache shared by every worker and restart, and warm() does the remaining
+# first-request work (template compilation, reference data, the search
+# index) once. Under gunicorn with preload_app, warm() runs in the master
+# before fork so workers inherit the result; see gunicorn.conf.py.
+
+def precompile_templates(app):
+    env = app.jinja_env
+    for name in env.list_templates():
+        env.get_template(name)
+    return len(env.list_templates())
+
+def warm_pool(app, size=None):
+    # Opens up to `size` pooled connections so the first requests don't pay for the connect
+    with app.app_context():
+        for engine in db.engines.values():
+            pool_size = size or (engine.pool.size() if isinstance(engine.pool, QueuePool) else 1)
+            connections = []
+            try:
+                for _ in range(pool_size):
+                    connections.append(engine.connect())
+            finally:
+                for conn in connections:
+                    conn.close()
+
+def warm(app):
+    templates = precompile_templates(app)
+    with app.app_context():
+        for name in refdata.DATASETS:
+            refdata.cache.get(name)
+        if search.backend() == 'trigram':
+            search.engine.ensure_built()
+        # Connections must not be shared across fork; workers open their own
+        for engine in db.engines.values():
+            engine.dispose()
+    return templates
+
+def init_app(app):
+    app.config.setdefault('JINJA_CACHE_DIR', os.getenv('JINJA_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache'))
+    if app.config['JINJA_CACHE_DIR']:
+        os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
@@ -1,15 +1,8 @@
 import os
-from flask import Flask
-from dotenv import load_dotenv
-from app import db, Doctor, Pharmacist, Patient
+from app import create_app
+from models import Doctor, Pharmacist, Patient
 
-load_dotenv()
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db.init_app(app)
+app = create_app()
 
 with app.app_context():
     try:
@@ -0,0 +1,52 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# One app per test run on a throwaway SQLite file, migrated to head once.
+# Every test starts from the demo seed (reset.reset_database reloads the rows
+# and drops the in-process caches), so tests can write freely.
+#
+#   python -m pytest -q
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    from app import create_app
+    from extensions import db
+    import migrations
+
+    path = tmp_path_factory.mktemp('db') / 'test.db'
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+    })
+    with app.app_context():
+        migrations.upgrade(db.engine)
+    return app
+
+@pytest.fixture
+def seeded(app):
+    from extensions import db
+    import reset
+
+    with app.app_context():
+        reset.reset_database()
+        yield db.session
+        db.session.remove()
+
+@pytest.fixture
+def client(app, seeded):
+    return app.test_client()
+
+@pytest.fixture
+def login(client):
+    # Demo users from insert_create.sql all use the password "demopass"
+    def login(username, password='demopass'):
+        client.get('/logout')
+        response = client.post('/login', data={'username': username, 'upassword': password})
+        assert response.status_code == 302
+        return client
+    return login
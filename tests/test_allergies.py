@@ -0,0 +1,61 @@
+from models import PatientHistory
+from refdata import DrugRecord, DrugTermRecord
+import allergies
+from allergies import Automaton, Matcher, screen
+
+def test_automaton_finds_overlapping_patterns():
+    automaton = Automaton(['he', 'she', 'his', 'hers'])
+    assert automaton.find('ushers') == {0, 1, 3}
+    assert automaton.find('hi') == set()
+
+def catalog_matcher():
+    drugs = [DrugRecord(1, 'Lisinopril', 'High blood pressure'), DrugRecord(3, 'Atorvastatin', 'High cholesterol')]
+    terms = [DrugTermRecord(3, 1, 'ACE inhibitor', 'class'), DrugTermRecord(11, 3, 'statin', 'class'),
+             DrugTermRecord(15, 4, 'SSRI', 'class'), DrugTermRecord(33, 12, 'SSRI', 'class')]
+    return Matcher('test', drugs, terms)
+
+def test_matches_whole_words_and_folds_plurals():
+    matcher = catalog_matcher()
+
+    found = matcher.scan('Reacted badly to STATINS; ace-inhibitors are fine')
+
+    assert {(m.drug_id, m.term) for m in found} == {(3, 'statin'), (1, 'ACE inhibitor')}
+    assert matcher.scan('lisinoprils') == {allergies.Match(1, 'Lisinopril', 'name')}
+    assert matcher.scan('atorvastatinx, facet, lisinoprilate') == frozenset()
+
+def test_shared_terms_match_every_drug():
+    found = catalog_matcher().scan('SSRIs cause nausea')
+    assert sorted(m.drug_id for m in found) == [4, 12]
+
+def test_screen_reads_allergies_and_notes_only(seeded):
+    # Patient 13's "Kidney disease" is family history, a Metformin contraindication
+    assert screen(13, 2) == []
+
+    history = seeded.get(PatientHistory, 13)
+    history.notes = 'Stage 3 kidney disease'
+    seeded.commit()
+
+    assert [(m.term, m.kind) for m in screen(13, 2)] == [('kidney disease', 'contraindication')]
+
+def test_committed_histories_refresh_the_cache(seeded):
+    assert screen(4, 3) == []
+
+    seeded.get(PatientHistory, 4).allergies = 'Lipitor'
+    seeded.commit()
+
+    entry = allergies.cache._entries[4]
+    assert entry[1] == allergies.history_text('Lipitor', 'N/A')
+    assert [m.term for m in screen(4, 3)] == ['Lipitor']
+
+def test_batch_prescriptions_stop_on_conflicts(seeded, login):
+    seeded.get(PatientHistory, 2).allergies = 'Glucophage'
+    seeded.commit()
+    client = login('doctor_demo')
+
+    response = client.post('/prescription/batch', json={'drug_id': 2, 'dosage': 10, 'patient_ids': [2, 15]})
+
+    assert response.status_code == 409
+    assert [line['patient_id'] for line in response.get_json()['lines']] == [2]
+    assert client.get('/api/patients/2/allergy-check?drug_id=2').get_json()['conflicts'] == [
+        {'drug_id': 2, 'term': 'Glucophage', 'kind': 'synonym'}
+    ]
@@ -0,0 +1,74 @@
+import io
+import pytest
+from sqlalchemy import select, func
+from extensions import db
+from models import Patient, ImportCheckpoint
+from importer import run_import
+from search import search_ids
+
+class Interrupted(Exception):
+    pass
+
+def csv_stream(*lines):
+    return io.BytesIO(('name,patient_id,doctor_id,dob\n' + ''.join(line + '\n' for line in lines)).encode())
+
+def patients_named(name):
+    with db.engine.connect() as conn:
+        return conn.execute(select(func.count()).where(Patient.name == name)).scalar()
+
+def test_invalid_records_are_reported_not_written(seeded):
+    failures = []
+    result = run_import(db.engine, 'patients', csv_stream(
+        'Ada Okafor,,1,1990-01-31',
+        ',,1,',
+        'Ben Ito,50,,',
+        'Duplicate,1,,',
+        'Cleo Park,,1,31/01/1990',
+        'Dev Rao,,99,',
+    ), 'csv', 'report', chunk_rows=2, on_failures=failures.extend)
+
+    assert (result.records, result.inserted, result.failed) == (6, 2, 4)
+    assert [(f.record, f.field) for f in failures] == [(2, 'name'), (4, 'patient_id'), (5, 'dob'), (6, 'doctor_id')]
+    assert seeded.get(Patient, 50).name == 'Ben Ito'
+    # The import drops the search index, so new patients are findable at once
+    assert search_ids('patients', 'okafor')[1] == 1
+
+def test_rerun_resumes_after_the_last_committed_chunk(seeded):
+    lines = [f'Resume Patient {n},,1,' for n in range(5)]
+    def crash(records, inserted, failed, seconds):
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        run_import(db.engine, 'patients', csv_stream(*lines), 'csv', 'resume', chunk_rows=2, on_chunk=crash)
+    result = run_import(db.engine, 'patients', csv_stream(*lines), 'csv', 'resume', chunk_rows=2)
+
+    assert (result.resumed_at, result.records, result.inserted, result.failed) == (2, 5, 5, 0)
+    assert [patients_named(f'Resume Patient {n}') for n in range(5)] == [1] * 5
+    checkpoint = seeded.get(ImportCheckpoint, 'resume')
+    assert (checkpoint.records, checkpoint.inserted) == (5, 5)
+
+def test_rows_the_database_rejects_are_retried_one_by_one(seeded):
+    # Patient 60 is written by someone else after the import loaded its lookups
+    def race(records, inserted, failed, seconds):
+        if records == 2:
+            with db.engine.begin() as conn:
+                conn.execute(Patient.__table__.insert(), {'patient_id': 60, 'name': 'Walk In'})
+
+    failures = []
+    result = run_import(db.engine, 'patients', csv_stream(
+        'First,,1,', 'Second,,1,', 'Clash,60,1,', 'Third,,1,',
+    ), 'csv', 'race', chunk_rows=2, on_failures=failures.extend, on_chunk=race)
+
+    assert (result.inserted, result.failed) == (3, 1)
+    assert [(f.record, f.message.startswith('rejected by the database')) for f in failures] == [(3, True)]
+    assert patients_named('Third') == 1
+    assert seeded.get(Patient, 60).name == 'Walk In'
+
+def test_ndjson_records_must_be_flat_objects(seeded):
+    stream = io.BytesIO(b'{"name": "Eve Lund", "doctor_id": 1}\n[1, 2]\n\n{"name": ["a", "b"]}\n{broken\n')
+    failures = []
+
+    result = run_import(db.engine, 'patients', stream, 'ndjson', 'ndjson', on_failures=failures.extend)
+
+    assert (result.records, result.inserted) == (4, 1)
+    assert [(f.record, f.field) for f in failures] == [(2, ''), (3, 'name'), (4, '')]
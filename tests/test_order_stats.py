@@ -0,0 +1,82 @@
+from collections import Counter
+from datetime import date
+from extensions import db
+from models import Order
+import archive
+import order_stats
+from order_stats import STATS, check, rebuild, status_counts
+
+def stored():
+    with db.engine.connect() as conn:
+        return {(row.scope, row.scope_id, row.status, str(row.day)): row.order_count
+                for row in conn.execute(STATS.select()) if row.order_count}
+
+def assert_matches_rebuild():
+    incremental = stored()
+    with db.engine.begin() as conn:
+        assert check(conn) == []
+        rebuild(conn)
+    assert incremental == stored()
+
+def test_seed_counts_are_consistent(seeded):
+    assert_matches_rebuild()
+    assert status_counts('pharmacist', [10]) == Counter({'Scheduled': 1, 'Completed': 1})
+
+def test_orm_changes_match_a_rebuild(seeded):
+    # Undated and unassigned orders count under UNDATED and scope_id 0
+    seeded.add(Order(patient_id=3, prescript_id=1, status='Scheduled'))
+    seeded.get(Order, 1).status = 'Completed'
+    moved = seeded.get(Order, 4)
+    moved.pharmacist_id = 2
+    moved.request_date = date(2025, 2, 6)
+    seeded.delete(seeded.get(Order, 13))
+    seeded.commit()
+
+    assert_matches_rebuild()
+    assert status_counts('pharmacy', [0])['Scheduled'] == 1
+    assert status_counts('pharmacist', [2], day=date(2025, 2, 6)) == Counter({'Scheduled': 1})
+
+def test_rollback_leaves_counts_alone(seeded):
+    before = stored()
+    seeded.get(Order, 1).status = 'Cancelled'
+    seeded.flush()
+    seeded.rollback()
+
+    assert stored() == before
+
+def test_bulk_completion_tracks_deltas(seeded, login):
+    client = login('pharmacist_demo')
+
+    response = client.post('/order/process_batch', json={'order_ids': [1, 4, 2, 999]})
+
+    assert response.get_json()['results'] == {
+        '1': 'completed', '4': 'completed', '2': 'already_completed', '999': 'missing'
+    }
+    assert_matches_rebuild()
+
+def test_archiving_keeps_counts(seeded):
+    before = stored()
+
+    moved = archive.archive_orders(db.engine, date(2026, 1, 1))
+
+    assert moved == 9
+    assert stored() == before
+    assert_matches_rebuild()
+
+def test_subscribers_see_committed_deltas(seeded):
+    seen = []
+    def subscriber(session, deltas):
+        seen.append(dict(deltas))
+    order_stats.subscribers.append(subscriber)
+    try:
+        seeded.get(Order, 1).status = 'Completed'
+        seeded.commit()
+    finally:
+        order_stats.subscribers.remove(subscriber)
+
+    day = date(2025, 10, 10)
+    scopes = (('patient', 12), ('pharmacy', 2), ('pharmacist', 10))
+    assert seen == [{
+        **{(scope, scope_id, 'Scheduled', day): -1 for scope, scope_id in scopes},
+        **{(scope, scope_id, 'Completed', day): 1 for scope, scope_id in scopes},
+    }]
@@ -0,0 +1,65 @@
+from datetime import date
+from models import Order
+from order_queue import load_queue_page, encode_cursor
+import queries
+
+def add_scheduled(session, count, request_date, pharmacist_id=None):
+    orders = [Order(request_date=request_date, pharmacy_id=1, patient_id=3, prescript_id=1,
+                    pharmacist_id=pharmacist_id, status='Scheduled') for _ in range(count)]
+    session.add_all(orders)
+    session.commit()
+    return [order.order_id for order in orders]
+
+def walk(limit, **filters):
+    ids, cursor, pages = [], None, 0
+    while True:
+        orders, cursor = load_queue_page(cursor=cursor, limit=limit, **filters)
+        ids += [order.order_id for order in orders]
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+def test_pages_cover_the_queue_once_in_order(seeded):
+    # Several orders on one day, so pages break inside a run of equal dates
+    add_scheduled(seeded, 5, date(2025, 7, 18))
+    expected = [order.order_id for order in queries.queue_page_query().all()]
+
+    ids, pages = walk(limit=3)
+
+    assert ids == expected
+    assert pages == -(-len(expected) // 3)
+
+def test_cursor_seeks_past_equal_dates(seeded):
+    added = add_scheduled(seeded, 4, date(2030, 1, 1))
+    last = seeded.get(Order, added[1])
+
+    orders, cursor = load_queue_page(cursor=encode_cursor(last), limit=10)
+
+    assert [order.order_id for order in orders] == added[2:]
+    assert cursor is None
+
+def test_filters_apply_on_every_page(seeded):
+    add_scheduled(seeded, 3, date(2025, 7, 18), pharmacist_id=1)
+    add_scheduled(seeded, 3, date(2025, 7, 18))
+
+    ids, _ = walk(limit=2, pharmacist_id=1, include_unassigned=True)
+
+    orders = [seeded.get(Order, order_id) for order_id in ids]
+    assert len(orders) == 6
+    assert all(order.pharmacist_id in (1, None) for order in orders)
+
+def test_queue_endpoint_returns_next_cursor(seeded, login):
+    # Pharmacist 10 has one Scheduled order in the seed: order 1, 2025-10-10
+    added = add_scheduled(seeded, 1, date(2025, 12, 1), pharmacist_id=10)
+    client = login('pharmacist_demo')
+
+    first = client.get('/pharmacist/queue?pharmacist_id=10&limit=1').get_json()
+    second = client.get(f'/pharmacist/queue?pharmacist_id=10&limit=1&cursor={first["next_cursor"]}').get_json()
+
+    assert [order['order_id'] for order in first['orders']] == [1]
+    assert [order['order_id'] for order in second['orders']] == added
+    assert second['next_cursor'] is None
+
+def test_invalid_cursor_is_rejected(login):
+    client = login('pharmacist_demo')
+    assert client.get('/pharmacist/queue?cursor=not-a-cursor').status_code == 400
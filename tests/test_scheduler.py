@@ -0,0 +1,73 @@
+from datetime import date
+from models import Order
+import refdata
+import scheduler
+from scheduler import LoadIndex, Scheduler
+
+def test_load_index_takes_the_least_loaded():
+    index = LoadIndex({1: 2, 2: 0, 3: 1})
+
+    # Ties go to the lowest id
+    assert [index.take() for _ in range(4)] == [2, 2, 3, 1]
+    assert index.loads == {1: 3, 2: 2, 3: 2}
+
+def test_load_index_skips_stale_entries_and_unknown_members():
+    index = LoadIndex({1: 5, 2: 3})
+    index.add(1, -5)
+    index.add(2, -10)
+    index.add(9, 1)
+
+    assert index.loads == {1: 0, 2: 0}
+    assert index.least_loaded() == 1
+
+def loads(kind):
+    return dict(scheduler.scheduler.indexes[kind].loads)
+
+def test_reconcile_counts_open_orders(seeded):
+    scheduler.scheduler.reconcile()
+
+    pharmacists = loads('pharmacist')
+    assert {member: n for member, n in pharmacists.items() if n} == {2: 1, 5: 2, 7: 2, 10: 1}
+    assert set(pharmacists) == {item[0] for item in refdata.pharmacists()}
+
+def test_committed_orders_are_charged_once(seeded):
+    scheduler.scheduler.reconcile()
+    before = loads('pharmacist')
+
+    pharmacy_id, pharmacist_id = scheduler.assign()
+    seeded.add(Order(request_date=date(2025, 12, 1), patient_id=3, prescript_id=1, status='Scheduled',
+                     pharmacy_id=pharmacy_id, pharmacist_id=pharmacist_id))
+    seeded.commit()
+
+    assert before[pharmacist_id] == min(before.values())
+    assert loads('pharmacist') == {**before, pharmacist_id: before[pharmacist_id] + 1}
+
+def test_rolled_back_assignments_are_released(seeded):
+    scheduler.scheduler.reconcile()
+    before = {kind: loads(kind) for kind in scheduler.KINDS}
+
+    # Charged as they are handed out, so back-to-back requests spread out
+    for _ in range(20):
+        scheduler.assign()
+    spread = loads('pharmacist')
+    assert max(spread.values()) - min(spread.values()) <= 1
+
+    seeded.rollback()
+    assert {kind: loads(kind) for kind in scheduler.KINDS} == before
+
+def test_completed_orders_free_capacity(seeded):
+    scheduler.scheduler.reconcile()
+    before = loads('pharmacist')
+
+    seeded.get(Order, 4).status = 'Completed'
+    seeded.commit()
+
+    assert loads('pharmacist') == {**before, 5: before[5] - 1}
+
+def test_round_robin_until_reconciled(seeded):
+    fresh = Scheduler()
+    pharmacies = [item[0] for item in refdata.pharmacies()]
+
+    turns = [fresh.round_robin('pharmacy') for _ in range(len(pharmacies) + 1)]
+
+    assert turns == pharmacies + pharmacies[:1]
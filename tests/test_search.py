@@ -0,0 +1,93 @@
+from sqlalchemy import update
+from models import Patient, Drug
+import search
+from search import TrigramIndex, search_ids
+
+def test_trigram_ranks_exact_prefix_word_then_substring():
+    index = TrigramIndex()
+    for doc_id, label in ((1, 'Ashlee Brown'), (2, 'Nathan Lee'), (3, 'Leeds Kim'), (4, 'Lee')):
+        index.add(doc_id, label)
+
+    matches = index.match('LEE')
+
+    assert sorted(matches, key=matches.get) == [4, 3, 2, 1]
+    assert [matches[doc_id][0] for doc_id in (4, 3, 2, 1)] == [0, 1, 2, 3]
+
+def test_short_queries_only_match_word_starts():
+    index = TrigramIndex()
+    index.add(1, 'Nolan Le')
+    index.add(2, 'Ashlee Brown')
+
+    assert set(index.match('le')) == {1}
+
+def test_readded_documents_drop_their_old_text():
+    index = TrigramIndex()
+    index.add(1, 'Mia Thompson')
+    index.add(1, 'Mia Hartley')
+    index.remove(2)
+
+    assert index.match('thompson') == {}
+    assert set(index.match('hartley')) == {1}
+
+def test_search_pages_seed_patients(seeded):
+    assert search_ids('patients', 'le') == ([1, 15], 2)
+    assert search_ids('patients', 'le', page=2, per_page=1) == ([15], 2)
+
+def test_drug_names_outrank_ailments(seeded):
+    seeded.add(Drug(drug_id=100, name='Asthmacort', common_ailment='Wheezing'))
+    seeded.commit()
+
+    ids, total = search_ids('drugs', 'asthma')
+
+    # Albuterol's ailment is exactly "Asthma", but a name prefix still wins
+    assert ids[:2] == [100, 9]
+    assert total == 3
+
+def test_committed_writes_update_the_index_in_place(seeded):
+    search_ids('patients', 'thompson')
+    built_at = search.engine.built_at
+
+    seeded.get(Patient, 14).name = 'Mia Hartley'
+    seeded.add(Patient(patient_id=100, name='Zora Quill', doctor_id=1))
+    seeded.commit()
+
+    assert search_ids('patients', 'thompson') == ([], 0)
+    assert search_ids('patients', 'hartley') == ([14], 1)
+    assert search_ids('patients', 'quill') == ([100], 1)
+    assert search.engine.built_at == built_at
+
+def test_rolled_back_writes_are_not_indexed(seeded):
+    search_ids('patients', 'quill')
+    seeded.add(Patient(patient_id=100, name='Zora Quill', doctor_id=1))
+    seeded.flush()
+    seeded.rollback()
+
+    assert search_ids('patients', 'quill') == ([], 0)
+
+def test_bulk_updates_invalidate_on_commit(seeded):
+    search_ids('patients', 'chen')
+    seeded.execute(update(Patient).where(Patient.patient_id == 5).values(name='Marcus Vale'))
+    assert not search.engine.stale()
+
+    seeded.rollback()
+    assert not search.engine.stale()
+
+    seeded.execute(update(Patient).where(Patient.patient_id == 5).values(name='Marcus Vale'))
+    seeded.commit()
+    assert search.engine.stale()
+    assert search_ids('patients', 'vale') == ([5], 1)
+
+def test_batch_prescriptions_are_indexed_without_a_rebuild(seeded, login):
+    search_ids('prescriptions', 'metformin')
+    built_at = search.engine.built_at
+    client = login('doctor_demo')
+
+    response = client.post('/prescription/batch', json={
+        'drug_id': 2, 'dosage': 10, 'override_allergies': True, 'patient_ids': [2, 15],
+    })
+
+    assert response.status_code == 201
+    created = {row['prescript_id'] for row in response.get_json()['prescriptions']}
+    ids, _ = search_ids('prescriptions', 'metformin', per_page=50)
+    assert created <= set(ids)
+    assert search.engine.built_at == built_at
@@ -0,0 +1,632 @@
+from flask import render_template, request, redirect, url_for, flash, session
+from datetime import date
+from order_queue import load_queue_page
+from extensions import db
+from models import (Doctor, Pharmacist, Patient, User, PatientHistory,
+                    Prescription, Drug, Pharmacy, Order)
+from auth import login_required, role_required, current_actor, find_user, remember_actor
+import queries
+import counters
+import search as search_index
+import refdata
+import conditional
+import fanout
+import routing
+import order_stats
+import allergies
+import scheduler
+
+# The application's own pages. Views are collected here and added to the app
+# by init_app() (not a blueprint) so endpoint names stay unprefixed, e.g.
+# url_for('doctor_dashboard').
+
+_routes = []
+
+def route(rule, **options):
+    def decorator(f):
+        _routes.append((rule, f, options))
+        return f
+    return decorator
+
+def init_app(app):
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+
+# Routes
+@route('/')
+@routing.replica_reads
+def home():
+    total_patients = counters.count('total_patients', Patient.query, ['patients'])
+    total_doctors = counters.count('total_doctors', Doctor.query, ['doctors'])
+    total_prescriptions = counters.count('total_prescriptions', Prescription.query, ['prescriptions'])
+    total_pharmacists = counters.count('total_pharmacists', Pharmacist.query, ['pharmacists'])
+    
+    return render_template('home.html',
+                         total_patients=total_patients,
+                         total_doctors=total_doctors,
+                         total_prescriptions=total_prescriptions,
+                         total_pharmacists=total_pharmacists)
+
+@route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('upassword')
+        
+        user, actor = find_user(username)
+        
+        if user and user.upassword==password:
+            # Store user info in session
+            remember_actor(actor)
+            
+            flash(f'Welcome back, {actor.name}!', 'success')
+            
+            # Redirect based on role
+            if user.role == 'Doctor':
+                return redirect(url_for('doctor_dashboard'))
+            elif user.role == 'Patient':
+                return redirect(url_for('patient_dashboard'))
+            elif user.role == 'Pharmacist':
+                return redirect(url_for('pharmacist_dashboard'))
+            else:
+                return redirect(url_for('home'))
+        else:
+            flash('Invalid username or password', 'danger')
+    
+    return render_template('login.html')
+
+@route('/logout')
+def logout():
+    session.clear()
+    flash('You have been logged out.', 'success')
+    return redirect(url_for('login'))
+
+@route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('upassword')
+        role = request.form.get('role')
+        
+        # Check if username already exists
+        existing_user = User.query.filter_by(username=username).first()
+        if existing_user:
+            flash('Username already exists', 'danger')
+            return redirect(url_for('register'))
+        
+        if role == 'doctor': 
+            new_doctor = Doctor(name=username, dob=date.today())
+            db.session.add(new_doctor)
+            db.session.flush()  
+            
+            new_user = User(
+                username=username,
+                upassword=password,
+                role='Doctor',  
+                doctor_id=new_doctor.doctor_id
+            )
+        elif role == 'patient':  
+            new_patient = Patient(name=username, dob=date.today())
+            db.session.add(new_patient)
+            db.session.flush()
+            
+            new_user = User(
+                username=username,
+                upassword=password,
+                role='Patient',  
+                patient_id=new_patient.patient_id
+            )
+        elif role == 'pharmacist':  
+            new_pharmacist = Pharmacist(name=username, dob=date.today())
+            db.session.add(new_pharmacist)
+            db.session.flush()
+            
+            new_user = User(
+                username=username,
+                upassword=password,
+                role='Pharmacist',  
+                pharmacist_id=new_pharmacist.pharmacist_id
+            )
+        else:
+            flash('Invalid role selected', 'danger')
+            return redirect(url_for('register'))
+        
+        db.session.add(new_user)
+        db.session.commit()
+        
+        flash('Registration successful! Please log in.', 'success')
+        return redirect(url_for('login'))
+    
+    return render_template('register.html')
+@route('/doctor_dashboard')
+@routing.replica_reads
+@login_required
+@role_required('Doctor')
+def doctor_dashboard():
+    doctor = current_actor
+    
+    if doctor.person_id is None:
+            flash('No doctor linked to this account')
+            return redirect(url_for('home'))
+
+    # Patients with history, prescriptions and the pending count are independent reads
+    doctor_id = doctor.person_id
+    results = fanout.run(
+        patients=lambda: queries.doctor_patients_query(doctor_id).all(),
+        prescriptions=lambda: queries.doctor_prescriptions_query(doctor_id).all(),
+        pending_prescriptions=lambda: counters.count(
+            f'doctor:{doctor_id}:pending_prescriptions',
+            Prescription.query.filter_by(doctor_id=doctor_id).join(Order).filter(Order.status == 'Scheduled'),
+            ['prescriptions', 'orders']
+        ),
+    )
+    
+    return render_template('doctor.html',
+                         doctor=doctor,  
+                         patients=results['patients'],  
+                         prescriptions=results['prescriptions'], 
+                         pending_prescriptions=results['pending_prescriptions'])
+
+def patient_dashboard_version():
+    return (queries.patient_dashboard_version(current_actor.person_id),
+            refdata.etag('drugs', 'doctors'))
+
+@route('/patient_dashboard')
+@routing.replica_reads
+@login_required
+@role_required('Patient')
+@conditional.versioned(patient_dashboard_version)
+def patient_dashboard():
+    patient = current_actor
+    
+    if patient.person_id is None:
+        flash('No patient linked to this account')
+        return redirect(url_for('home'))
+    
+    # Prescriptions, order counts and recent orders are independent reads
+    patient_id = patient.person_id
+    results = fanout.run(
+        prescriptions=lambda: queries.patient_prescriptions_query(patient_id).all(),
+        counts=lambda: order_stats.status_counts('patient', [patient_id]),
+        recent_orders=lambda: queries.recent_orders_query(patient_id).all(),
+    )
+    prescriptions = results['prescriptions']
+    
+    return render_template('patient.html',
+                         patient=patient,
+                         prescriptions=prescriptions,
+                         active_prescriptions=len(prescriptions),
+                         pending_orders=results['counts']['Scheduled'],
+                         completed_orders=results['counts']['Completed'],
+                         recent_orders=results['recent_orders'])
+
+def pharmacist_dashboard_version():
+    return (date.today(),
+            queries.pharmacist_dashboard_version(current_actor.person_id, date.today()),
+            refdata.etag('drugs', 'doctors'))
+
+@route('/pharmacist_dashboard')
+@routing.replica_reads
+@login_required
+@role_required('Pharmacist')
+@conditional.versioned(pharmacist_dashboard_version)
+def pharmacist_dashboard():
+    pharmacist = current_actor
+    
+    if pharmacist.person_id is None:
+        flash('No pharmacist linked to this account')
+        return redirect(url_for('home'))
+    
+    # The first queue page and both counts are independent reads; later pages load on demand
+    pharmacist_id = pharmacist.person_id
+    today = date.today()
+    results = fanout.run(
+        queue=lambda: load_queue_page(pharmacist_id=pharmacist_id, include_unassigned=True),
+        # Own and unassigned orders are pending for this pharmacist
+        pending=lambda: order_stats.status_counts('pharmacist', [pharmacist_id, order_stats.UNASSIGNED])['Scheduled'],
+        completed_today=lambda: order_stats.status_counts('pharmacist', [pharmacist_id], day=today)['Completed'],
+    )
+    pending_orders, next_cursor = results['queue']
+    
+    # Dummy data for demo
+    low_stock_count = 3
+    out_for_delivery = 5
+    
+    return render_template('pharmacist.html',
+                         pharmacist=pharmacist,
+                         pending_orders=pending_orders,
+                         next_cursor=next_cursor,
+                         pending_count=results['pending'],
+                         completed_today=results['completed_today'],
+                         low_stock_count=low_stock_count,
+                         out_for_delivery=out_for_delivery)
+
+# Routes for User Input
+def prescriptions_version(patient_name):
+    return queries.prescriptions_version(patient_name), refdata.etag('drugs')
+
+@route('/prescriptions/<string:patient_name>')
+@routing.replica_reads
+@conditional.versioned(prescriptions_version)
+def get_prescriptions(patient_name):
+    prescriptions = db.session.query(
+        Prescription.dosage,
+        Drug.name,
+        Drug.common_ailment
+    ).join(
+        Patient, Prescription.patient_id == Patient.patient_id
+    ).join(
+        Drug, Prescription.drug_id == Drug.drug_id
+    ).filter(
+        Patient.name == patient_name
+    ).all()
+    
+    return render_template('prescriptions.html', prescriptions=prescriptions)
+
+@route('/new_prescription')
+@login_required
+@role_required('Doctor')
+def new_prescription():
+    # Patients, drugs and history are fetched on demand by the form's typeahead
+    return render_template('new_prescription.html')
+
+@route('/api/patients/<int:patient_id>/history')
+@login_required
+@role_required('Doctor')
+@routing.replica_reads
+def patient_history_api(patient_id):
+    row = db.session.query(
+        Patient.patient_id,
+        Patient.name,
+        PatientHistory.allergies,
+        PatientHistory.family_history,
+        PatientHistory.notes
+    ).outerjoin(
+        PatientHistory, Patient.patient_id == PatientHistory.patient_id
+    ).filter(
+        Patient.patient_id == patient_id
+    ).first()
+
+    if row is None:
+        return {'error': 'Patient not found'}, 404
+    return dict(row._mapping)
+
+@route('/patient/history/<string:patient_name>')
+@routing.replica_reads
+def get_patient_history(patient_name):
+    history = db.session.query(
+        PatientHistory.allergies,
+        PatientHistory.family_history,
+        PatientHistory.notes
+    ).join(
+        Patient, PatientHistory.patient_id == Patient.patient_id
+    ).filter(
+        Patient.name == patient_name
+    ).first()
+    
+    if history:
+        return render_template('patient_history.html', history=history)
+    return {'error': 'History not found'}, 404
+
+@route('/patient/history/update/<int:patient_id>', methods=['POST'])
+@login_required
+@role_required('Doctor')
+def update_patient_history(patient_id):
+    allergies = request.form.get('allergies')
+    family_history = request.form.get('family_history')
+    notes = request.form.get('notes')
+
+    patient = Patient.query.get_or_404(patient_id)
+    # Allergy screening reads this text, so only the patient's own doctor edits it
+    if patient.doctor_id != current_actor.person_id:
+        flash('You can only update the history of your own patients.', 'danger')
+        return redirect(url_for('doctor_dashboard'))
+
+    # Get or create patient history
+    history = PatientHistory.query.get(patient_id)
+    if not history:
+        history = PatientHistory(patient_id=patient_id)
+        db.session.add(history)
+    
+    history.allergies = allergies
+    history.family_history = family_history
+    history.notes = notes
+    
+    db.session.commit()
+    
+    flash(f'Patient history for {patient.name} updated successfully!', 'success')
+    return redirect(url_for('doctor_dashboard'))
+
+@route('/order/process/<int:order_id>', methods=['POST'])
+@login_required
+@role_required('Pharmacist')
+def process_order(order_id):
+    order = Order.query.get_or_404(order_id)
+    order.status = 'Completed'
+    # Unassigned orders belong to whoever completes them
+    if order.pharmacist_id is None:
+        order.pharmacist_id = current_actor.person_id
+    
+    db.session.commit()
+    
+    flash(f'Order #{order_id} processed successfully!', 'success')
+    return redirect(url_for('pharmacist_dashboard'))
+
+MAX_BATCH_ORDERS = 1000
+
+def complete_orders(order_ids, pharmacist_id=None):
+    # Lock the requested rows, then complete the Scheduled ones in one UPDATE
+    rows = db.session.query(
+        Order.order_id, *(getattr(Order, field) for field in order_stats.FIELDS)
+    ).filter(
+        Order.order_id.in_(order_ids)
+    ).with_for_update().all()
+    statuses = {row.order_id: row.status for row in rows}
+
+    scheduled = [row for row in rows if row.status == 'Scheduled']
+    if scheduled:
+        Order.query.filter(
+            Order.order_id.in_([row.order_id for row in scheduled]),
+            Order.status == 'Scheduled'
+        ).update({
+            Order.status: 'Completed',
+            Order.pharmacist_id: db.func.coalesce(Order.pharmacist_id, pharmacist_id),
+        }, synchronize_session=False)
+        # Bulk UPDATEs skip the flush hooks, so adjust the stats here
+        order_stats.track(db.session, [
+            (tuple(row[1:]), (row.patient_id, row.pharmacy_id, row.pharmacist_id or pharmacist_id,
+                              'Completed', row.request_date))
+            for row in scheduled
+        ])
+    db.session.commit()
+
+    results = {}
+    for order_id in order_ids:
+        status = statuses.get(order_id)
+        if status is None:
+            results[order_id] = 'missing'
+        elif status == 'Scheduled':
+            results[order_id] = 'completed'
+        elif status == 'Completed':
+            results[order_id] = 'already_completed'
+        else:
+            results[order_id] = 'cancelled'
+    return results
+
+@route('/order/process_batch', methods=['POST'])
+@login_required
+@role_required('Pharmacist')
+def process_orders_batch():
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return {'error': 'Expected a JSON object with order_ids'}, 400
+        order_ids = payload.get('order_ids', [])
+        if not isinstance(order_ids, list):
+            return {'error': 'order_ids must be a list'}, 400
+    else:
+        order_ids = request.form.getlist('order_ids')
+
+    try:
+        order_ids = sorted({int(order_id) for order_id in order_ids})
+    except (TypeError, ValueError):
+        return {'error': 'order_ids must be integers'}, 400
+    if len(order_ids) > MAX_BATCH_ORDERS:
+        return {'error': f'At most {MAX_BATCH_ORDERS} orders per batch'}, 400
+
+    results = complete_orders(order_ids, current_actor.person_id) if order_ids else {}
+
+    if request.is_json:
+        return {'results': {str(order_id): result for order_id, result in results.items()}}
+
+    completed = sum(1 for result in results.values() if result == 'completed')
+    skipped = len(results) - completed
+    if completed:
+        flash(f'{completed} order(s) processed successfully!', 'success')
+    if skipped:
+        flash(f'{skipped} order(s) skipped (already completed, cancelled or missing)', 'warning')
+    if not results:
+        flash('No orders selected', 'warning')
+    return redirect(url_for('pharmacist_dashboard'))
+
+@route('/refill/<int:prescription_id>', methods=['POST'])
+@login_required
+@role_required('Patient')
+def order_refill(prescription_id):
+    # Patients can only refill their own prescriptions
+    Prescription.query.filter_by(
+        prescript_id=prescription_id,
+        patient_id=current_actor.person_id
+    ).first_or_404()
+
+    # Least-loaded pharmacy and pharmacist (demo - let patient choose the pharmacy)
+    pharmacy_id, pharmacist_id = scheduler.assign()
+    
+    new_order = Order(
+        request_date=date.today(),
+        pharmacy_id=pharmacy_id,
+        patient_id=current_actor.person_id,
+        prescript_id=prescription_id,
+        pharmacist_id=pharmacist_id,
+        status='Scheduled'
+    )
+    
+    db.session.add(new_order)
+    db.session.commit()
+    
+    flash('Refill order placed successfully!', 'success')
+    return redirect(url_for('patient_dashboard'))
+
+@route('/prescription/create', methods=['POST'])
+@login_required
+@role_required('Doctor')
+def create_prescription():
+    patient_id = request.form.get('patient_id', type=int)
+    drug_id = request.form.get('drug_id', type=int)
+    dosage = request.form.get('dosage')
+
+    patient = db.session.get(Patient, patient_id) if patient_id is not None else None
+    if not patient:
+        flash('Patient not found', 'error')
+        return redirect(url_for('doctor_dashboard'))
+    
+    drug = refdata.drugs().get(drug_id)
+    if not drug:
+        flash('Drug not found', 'error')
+        return redirect(url_for('doctor_dashboard'))
+
+    conflicts = allergies.screen(patient.patient_id, drug.drug_id)
+    if conflicts and not request.form.get('override_allergy'):
+        flash(f'{drug.name} not prescribed: patient history mentions {allergies.describe(conflicts)}. '
+              'Review and confirm the override to prescribe anyway.', 'danger')
+        return redirect(url_for('new_prescription'))
+    
+    # One transaction: flush assigns the prescription id, the order rides the same commit
+    new_prescription = Prescription(
+        patient_id=patient.patient_id,
+        doctor_id=current_actor.person_id,
+        drug_id=drug.drug_id,
+        dosage=dosage,
+    )
+    db.session.add(new_prescription)
+    db.session.flush()
+
+    pharmacy_id, pharmacist_id = scheduler.assign()
+    db.session.add(Order(
+        prescript_id=new_prescription.prescript_id,
+        patient_id=patient.patient_id,
+        pharmacy_id=pharmacy_id,
+        pharmacist_id=pharmacist_id,
+        status="Scheduled",
+        request_date=date.today()
+    ))
+    db.session.commit()
+
+    flash('Prescription created successfully!', 'success')
+    return redirect(url_for('doctor_dashboard'))
+
+MAX_BATCH_LINES = 500
+
+def prescription_lines(payload):
+    # {"patient_id": 1, "lines": [{"drug_id": 2, "dosage": 10}, ...]}  several drugs, one patient
+    # {"drug_id": 2, "dosage": 10, "patient_ids": [1, 3, 5]}          one drug, a cohort
+    # Top-level patient_id/drug_id/dosage are defaults for every line
+    defaults = {key: payload[key] for key in ('patient_id', 'drug_id', 'dosage') if key in payload}
+    lines = [dict(defaults, **line) for line in payload.get('lines', [])]
+    lines += [dict(defaults, patient_id=patient_id) for patient_id in payload.get('patient_ids', [])]
+    return [
+        {key: int(line[key]) for key in ('patient_id', 'drug_id', 'dosage')}
+        for line in lines
+    ]
+
+def create_prescriptions(lines, doctor_id):
+    # One multi-row INSERT per table and a single commit. Orders are built from
+    # the RETURNING rows themselves, so their order doesn't matter.
+    rows = [dict(line, doctor_id=doctor_id) for line in lines]
+    columns = (Prescription.prescript_id, Prescription.patient_id, Prescription.drug_id, Prescription.dosage)
+    if db.engine.dialect.insert_executemany_returning:
+        created = [dict(row._mapping) for row in db.session.execute(
+            db.insert(Prescription).returning(*columns), rows, execution_options={'search_tracked': True})]
+        search_index.track(db.session, [
+            ('upsert', 'prescriptions', row['prescript_id'], row['patient_id'], row['drug_id']) for row in created
+        ])
+    else:
+        # No RETURNING (MySQL): the ORM inserts row by row to read each id
+        prescriptions = [Prescription(**row) for row in rows]
+        db.session.add_all(prescriptions)
+        db.session.flush()
+        created = [{column.key: getattr(prescription, column.key) for column in columns}
+                   for prescription in prescriptions]
+
+    today = date.today()
+    orders = []
+    for row in created:
+        pharmacy_id, pharmacist_id = scheduler.assign()
+        orders.append({'prescript_id': row['prescript_id'], 'patient_id': row['patient_id'],
+                       'pharmacy_id': pharmacy_id, 'pharmacist_id': pharmacist_id,
+                       'status': 'Scheduled', 'request_date': today})
+    db.session.execute(db.insert(Order), orders)
+    # Bulk inserts skip before_flush, so the counts (and the scheduler's load
+    # index, through order_stats) are updated here
+    order_stats.track(db.session, [
+        (None, tuple(order[field] for field in order_stats.FIELDS)) for order in orders
+    ])
+    db.session.commit()
+    return created
+
+@route('/prescription/batch', methods=['POST'])
+@login_required
+@role_required('Doctor')
+def create_prescription_batch():
+    try:
+        lines = prescription_lines(request.get_json(silent=True) or {})
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return {'error': 'Every line needs integer patient_id, drug_id and dosage'}, 400
+    if not lines:
+        return {'error': 'No prescription lines'}, 400
+    if len(lines) > MAX_BATCH_LINES:
+        return {'error': f'At most {MAX_BATCH_LINES} lines per batch'}, 400
+
+    # All or nothing: every patient and drug must exist
+    patient_ids = {line['patient_id'] for line in lines}
+    found = set(db.session.scalars(db.select(Patient.patient_id).where(Patient.patient_id.in_(patient_ids))))
+    missing_patients = sorted(patient_ids - found)
+    missing_drugs = sorted({line['drug_id'] for line in lines if refdata.drugs().get(line['drug_id']) is None})
+    if missing_patients or missing_drugs:
+        return {'error': 'Unknown patients or drugs',
+                'patient_ids': missing_patients, 'drug_ids': missing_drugs}, 400
+
+    # Screened before anything is inserted; "override_allergies": true accepts the conflicts
+    screened = allergies.screen_many([(line['patient_id'], line['drug_id']) for line in lines])
+    conflicts = [
+        dict(line, conflicts=[match._asdict() for match in matches])
+        for line, matches in zip(lines, screened) if matches
+    ]
+    if conflicts and not (request.get_json(silent=True) or {}).get('override_allergies'):
+        return {'error': 'Allergy or contraindication conflicts', 'lines': conflicts}, 409
+
+    return {'prescriptions': create_prescriptions(lines, current_actor.person_id)}, 201
+
+@route('/search', methods=['GET'])
+@routing.replica_reads
+def search():
+    query = request.args.get('q', '').strip()
+    
+    if not query:
+        flash('Please enter a search term', 'warning')
+        return redirect(url_for('home'))
+
+    # Ranked, capped results per entity; ?type= pages through a single entity
+    entity = request.args.get('type')
+    page = max(request.args.get('page', 1, type=int), 1)
+    entities = [entity] if entity in search_index.ENTITIES else search_index.ENTITIES
+
+    ids = {}
+    totals = {}
+    for name in search_index.ENTITIES:
+        ids[name], totals[name] = search_index.search_ids(name, query, page) if name in entities else ([], 0)
+
+    patients = queries.search_patients_query(Patient.patient_id.in_(ids['patients'])).all() if ids['patients'] else []
+    # Doctors and drugs come from the reference-data snapshots, already in rank order
+    doctors = [doctor for doctor in map(refdata.doctors().get, ids['doctors']) if doctor]
+    doctor_patient_counts = queries.patient_counts(ids['doctors'])
+    drugs = [drug for drug in map(refdata.drugs().get, ids['drugs']) if drug]
+    prescriptions = queries.search_prescriptions_query(
+        Prescription.prescript_id.in_(ids['prescriptions'])
+    ).all() if ids['prescriptions'] else []
+
+    # Restore rank order after loading by id
+    patients.sort(key=lambda p: ids['patients'].index(p.patient_id))
+    prescriptions.sort(key=lambda p: ids['prescriptions'].index(p.prescript_id))
+    
+    return render_template('search_results.html',
+                         query=query,
+                         patients=patients,
+                         doctors=doctors,
+                         doctor_patient_counts=doctor_patient_counts,
+                         drugs=drugs,
+                         prescriptions=prescriptions,
+                         totals=totals,
+                         entity=entity,
+                         page=page,
+                         per_page=search_index.PER_PAGE)